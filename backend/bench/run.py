@@ -0,0 +1,274 @@
+"""
+End-to-end benchmarks for the Lambda handlers against a seeded database.
+
+Each scenario drives the real async handlers through backend/local's
+LocalHost (no HTTP in between) and reports throughput, p50/p95/p99 latency
+and database queries per request, each the median of --repeat timed runs.
+Results are compared against the committed baselines.json; the run exits
+non-zero when a budget is exceeded or there is no baseline to compare to.
+Latency and throughput budgets only hold on comparable hardware, so
+re-record the baseline (on the documented dataset) when the reference
+machine changes; query counts are deterministic and hold everywhere.
+
+    python backend/bench/seed.py --urls 1000000 --visits 100000000
+    python backend/bench/run.py                      # compare to baselines.json
+    python backend/bench/run.py --update-baseline    # record a new baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "local"))
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+os.environ.setdefault("SLUG_KEY", "bench-slug-key")
+
+from server import LocalHost  # noqa: E402
+from seed import BENCH_EMAIL, HOT_LINKS  # noqa: E402
+import utils.db  # noqa: E402
+from utils.db import run_query_fetchrow  # noqa: E402
+from utils.events import LocalSink  # noqa: E402
+from utils.slugs import slug_for_id  # noqa: E402
+from utils.tokens import sign_jwt_token  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines.json")
+
+
+class QueryCounter:
+    """Counts statements through asyncpg's query logger on every checkout."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, record):
+        self.count += 1
+
+    def install(self):
+        original = utils.db.connection
+
+        @asynccontextmanager
+        async def counted_connection():
+            async with original() as conn:
+                conn.add_query_logger(self)
+                try:
+                    yield conn
+                finally:
+                    conn.remove_query_logger(self)
+
+        utils.db.connection = counted_connection
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def run_scenario(make_request, requests, concurrency, counter, first_index=0):
+    latencies = []
+    next_index = iter(range(first_index, first_index + requests))
+
+    async def worker():
+        for index in next_index:
+            started = time.perf_counter()
+            await make_request(index)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    queries_before = counter.count
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "queries_per_request": round((counter.count - queries_before) / requests, 3),
+    }
+
+
+def median_result(runs):
+    """Per-metric median over repeated runs of one scenario."""
+    return {key: round(statistics.median(run[key] for run in runs), 3) for key in runs[0]}
+
+
+def expect(response, *statuses):
+    if response["statusCode"] not in statuses:
+        raise RuntimeError(f"Unexpected response {response['statusCode']}: {response.get('body')}")
+
+
+async def build_scenarios(host, args):
+    user = await run_query_fetchrow("SELECT id, email FROM users WHERE email = $1", BENCH_EMAIL)
+    if not user:
+        sys.exit("No benchmark user; run backend/bench/seed.py first")
+    # Only seeded links have slug_for_id(0..n-1) slugs; earlier runs of the
+    # create scenario add links with allocator ids past them.
+    url_count = (await run_query_fetchrow(
+        "SELECT COUNT(*) AS n FROM shortened_urls WHERE user_id = $1 AND url LIKE 'https://example.com/bench/%'",
+        user["id"]
+    ))["n"]
+    now = datetime.utcnow()
+    token = sign_jwt_token({
+        "sub": str(user["id"]), "email": user["email"], "iat": now, "exp": now + timedelta(hours=1)
+    })
+    auth = {"Authorization": f"Bearer {token}"}
+    rng = random.Random(args.seed)
+    # Click request ids must not repeat across runs, or analytics would skip
+    # them as already-recorded duplicates and do less work than a real batch.
+    run_id = uuid.uuid4().hex[:8]
+    hot = [slug_for_id(number) for number in range(min(HOT_LINKS, url_count))]
+
+    async def redirect_hot(index):
+        expect(await host.request("GET", f"/{rng.choice(hot)}"), 301)
+
+    async def redirect_cold(index):
+        expect(await host.request("GET", f"/{slug_for_id(rng.randrange(url_count))}"), 301)
+
+    async def redirect_missing(index):
+        expect(await host.request("GET", f"/missing{index}"), 404)
+
+    async def create(index):
+        expect(await host.request("POST", "/shorten", auth, body={"url": f"https://example.com/new/{index}"}), 201)
+
+    async def list_first_page(index):
+        expect(await host.request("GET", "/shorten", auth, {"limit": "100"}), 200)
+
+    async def visits_page(index):
+        expect(await host.request("GET", f"/shorten/visits/{rng.choice(hot)}", auth, {"limit": "100"}), 200)
+
+    async def visit_stats(index):
+        expect(await host.request("GET", f"/shorten/stats/{rng.choice(hot)}", auth, {"granularity": "day"}), 200)
+
+    async def analytics_batch(index):
+        records = [
+            {"messageId": f"{index}-{n}", "body": json.dumps({
+                "source": "public-lambda",
+                "detail-type": "public",
+                "detail": {"v": 1, "s": rng.choice(hot), "t": int(time.time() * 1000),
+                           "ip": "203.0.113.7", "ua": "bench", "rid": f"{run_id}-{index}-{n}"},
+            })}
+            for n in range(args.batch_size)
+        ]
+        result = await host.analytics.handle_sqs_batch(records)
+        if result["batchItemFailures"]:
+            raise RuntimeError("Analytics batch failed")
+
+    return {
+        "redirect_hot": redirect_hot,
+        "redirect_cold": redirect_cold,
+        "redirect_missing": redirect_missing,
+        "create": create,
+        "list_first_page": list_first_page,
+        "visits_page": visits_page,
+        "visit_stats": visit_stats,
+        "analytics_batch": analytics_batch,
+    }
+
+
+def compare(results, baseline, tolerance, slack_ms=0):
+    """
+    Returns a list of budget violations. Latencies may exceed the baseline
+    by `tolerance` plus `slack_ms`, so scheduler jitter on sub-millisecond
+    percentiles is not reported as a regression.
+    """
+    failures = []
+    for name, result in results.items():
+        budget = baseline.get(name)
+        if not budget:
+            failures.append(f"{name}: no budget in the baseline")
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            limit = budget[key] * (1 + tolerance) + slack_ms
+            if result[key] > limit:
+                failures.append(f"{name}: {key} {result[key]} > {limit:.3f}")
+        if result["throughput_rps"] < budget["throughput_rps"] * (1 - tolerance):
+            failures.append(f"{name}: throughput {result['throughput_rps']} < {budget['throughput_rps']}")
+        # Query counts are deterministic; any increase is a regression.
+        if result["queries_per_request"] > budget["queries_per_request"] + 0.01:
+            failures.append(f"{name}: queries/request {result['queries_per_request']} > {budget['queries_per_request']}")
+    return failures
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run handler benchmarks against a seeded database")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=100, help="Clicks per analytics batch")
+    parser.add_argument("--scenario", action="append", help="Run only these scenarios")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--slack-ms", type=float, default=1.0, help="Absolute latency slack on top of --tolerance")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per scenario; the median is reported")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="Also write results as JSON here")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    host = LocalHost(tempfile.mkdtemp(prefix="shorty-bench-"))
+    host.start()
+    # Redirect benchmarks measure the handler, not the analytics consumer.
+    host.public._click_emitter.sink = LocalSink()
+    counter = QueryCounter()
+    counter.install()
+
+    scenarios = await build_scenarios(host, args)
+    results = {}
+    print(f"{'scenario':<18} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8}")
+    for name, make_request in scenarios.items():
+        if args.scenario and name not in args.scenario:
+            continue
+        requests = max(1, args.requests // args.batch_size) if name == "analytics_batch" else args.requests
+        # One untimed pass warms the pool, caches and allocator blocks. Each
+        # pass gets its own request indices so none replays another's slugs.
+        warmup = min(requests, 50)
+        await run_scenario(make_request, warmup, args.concurrency, counter)
+        result = median_result([
+            await run_scenario(make_request, requests, args.concurrency, counter, warmup + run * requests)
+            for run in range(args.repeat)
+        ])
+        results[name] = result
+        print(f"{name:<18} {result['throughput_rps']:>9} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+              f"{result['p99_ms']:>9} {result['queries_per_request']:>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if args.scenario and os.path.exists(args.baseline):
+            # Re-recording some scenarios keeps the others' budgets.
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; rerun with --update-baseline to record one")
+        sys.exit(1)
+
+    with open(args.baseline) as f:
+        failures = compare(results, json.load(f), args.tolerance, args.slack_ms)
+    if failures:
+        print("\nBudget regressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll scenarios within budget")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,179 @@
+"""
+Seed a local database with synthetic links and visits for benchmarking.
+
+Links get the same slugs the allocator would hand out (slug_for_id over
+0..N-1) and the sequence is moved past them. Visits are skewed towards a
+small set of hot links, spread over the last --days days, and written with
+COPY in chunks while url_visits has no indexes; the indexes and the rollup
+tables are rebuilt from them afterwards.
+
+    python backend/bench/seed.py --urls 1000000 --visits 100000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "local"))
+# Must match run.py, which resolves the seeded links by slug_for_id.
+os.environ.setdefault("SLUG_KEY", "bench-slug-key")
+
+from migrate import connect, migrate  # noqa: E402
+from utils.passwords import hash_password  # noqa: E402
+from utils.slugs import slug_for_id  # noqa: E402
+
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "bench-password"
+CHUNK_SIZE = 100_000
+HOT_LINKS = 100
+
+
+def pick_link(rng, url_count, hot_share):
+    """`hot_share` of visits go to the first HOT_LINKS links."""
+    if rng.random() < hot_share:
+        return rng.randrange(min(HOT_LINKS, url_count))
+    return rng.randrange(url_count)
+
+
+async def seed_user(conn):
+    user_id = await conn.fetchval("SELECT id FROM users WHERE email = $1", BENCH_EMAIL)
+    if user_id:
+        return user_id
+    return await conn.fetchval(
+        """
+        INSERT INTO users (id, email, password_hash, salt, created_at)
+        VALUES ($1, $2, $3, '', NOW())
+        RETURNING id
+        """,
+        uuid.uuid4(), BENCH_EMAIL, hash_password(BENCH_PASSWORD)
+    )
+
+
+async def seed_urls(conn, user_id, count):
+    url_ids = []
+    started = datetime.utcnow() - timedelta(days=365)
+    for start in range(0, count, CHUNK_SIZE):
+        records = []
+        for number in range(start, min(start + CHUNK_SIZE, count)):
+            url_id = uuid.uuid4()
+            url_ids.append(url_id)
+            records.append((
+                url_id, user_id, f"https://example.com/bench/{number}", slug_for_id(number),
+                started + timedelta(seconds=number), started + timedelta(seconds=number)
+            ))
+        await conn.copy_records_to_table(
+            "shortened_urls", records=records,
+            columns=["id", "user_id", "url", "slug", "created_at", "updated_at"]
+        )
+    await conn.execute("SELECT setval('slug_id_seq', $1)", count + 100 - count % 100)
+    return url_ids
+
+
+async def drop_visit_indexes(conn):
+    """
+    Drop url_visits' indexes (primary key included) for the bulk load and
+    return the statements that recreate them. COPY through three btrees on
+    random keys slows to a crawl once they outgrow memory; building each one
+    once afterwards is a single sort.
+    """
+    rows = await conn.fetch(
+        """
+        SELECT con.conname, pg_get_constraintdef(con.oid) AS constraint_def,
+            index.relname, pg_get_indexdef(index.oid) AS index_def
+        FROM pg_index
+        JOIN pg_class AS index ON index.oid = pg_index.indexrelid
+        LEFT JOIN pg_constraint AS con ON con.conindid = pg_index.indexrelid AND con.conrelid = pg_index.indrelid
+        WHERE pg_index.indrelid = 'url_visits'::regclass
+        """
+    )
+    restore = []
+    for row in rows:
+        if row["conname"]:
+            await conn.execute(f'ALTER TABLE url_visits DROP CONSTRAINT "{row["conname"]}"')
+            restore.append(f'ALTER TABLE url_visits ADD CONSTRAINT "{row["conname"]}" {row["constraint_def"]}')
+        else:
+            await conn.execute(f'DROP INDEX "{row["relname"]}"')
+            # The definition of a partitioned index says ON ONLY, which would
+            # recreate it without building it on the partitions.
+            restore.append(row["index_def"].replace(" ON ONLY ", " ON ", 1))
+    return restore
+
+
+async def seed_visits(conn, user_id, url_ids, count, days, hot_share, seed):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    span = days * 86400
+    await conn.fetch("SELECT create_url_visit_partitions($1, 1)", (now - timedelta(days=days)).date())
+    for start in range(0, count, CHUNK_SIZE):
+        records = [
+            (uuid.uuid4(), url_ids[pick_link(rng, len(url_ids), hot_share)], user_id,
+             now - timedelta(seconds=rng.random() * span))
+            for _ in range(min(CHUNK_SIZE, count - start))
+        ]
+        await conn.copy_records_to_table(
+            "url_visits", records=records, columns=["id", "shortened_url_id", "user_id", "visit_time"]
+        )
+        print(f"  visits {start + len(records):,}/{count:,}", end="\r", flush=True)
+    print()
+
+
+async def rebuild_rollups(conn):
+    await conn.execute("TRUNCATE url_visit_counts_hourly, url_visit_counts_daily, url_visit_totals")
+    await conn.execute("""
+        INSERT INTO url_visit_counts_hourly (shortened_url_id, bucket, visits)
+        SELECT shortened_url_id, date_trunc('hour', visit_time), COUNT(*)
+        FROM url_visits GROUP BY 1, 2
+    """)
+    await conn.execute("""
+        INSERT INTO url_visit_counts_daily (shortened_url_id, bucket, visits)
+        SELECT shortened_url_id, bucket::date, SUM(visits)
+        FROM url_visit_counts_hourly GROUP BY 1, 2
+    """)
+    await conn.execute("""
+        INSERT INTO url_visit_totals (shortened_url_id, visits, last_visit_at)
+        SELECT shortened_url_id, SUM(visits), MAX(bucket) + INTERVAL '1 hour'
+        FROM url_visit_counts_hourly GROUP BY 1
+    """)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Seed synthetic benchmark data")
+    parser.add_argument("--urls", type=int, default=1_000_000)
+    parser.add_argument("--visits", type=int, default=100_000_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--hot-share", type=float, default=0.5,
+                        help=f"Share of visits going to the {HOT_LINKS} hottest links")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    conn = await connect()
+    try:
+        await migrate(conn)
+        if await conn.fetchval("SELECT EXISTS (SELECT 1 FROM shortened_urls)"):
+            sys.exit("Database already has links; seed into an empty database")
+
+        started = time.perf_counter()
+        user_id = await seed_user(conn)
+        url_ids = await seed_urls(conn, user_id, args.urls)
+        print(f"seeded {len(url_ids):,} links in {time.perf_counter() - started:.0f}s")
+        restore_indexes = await drop_visit_indexes(conn)
+        await seed_visits(conn, user_id, url_ids, args.visits, args.days, args.hot_share, args.seed)
+        await conn.execute("SET maintenance_work_mem = '1GB'")
+        for statement in restore_indexes:
+            await conn.execute(statement)
+        print(f"rebuilt {len(restore_indexes)} visit indexes in {time.perf_counter() - started:.0f}s")
+        await rebuild_rollups(conn)
+        await conn.execute("ANALYZE")
+        print(f"seeded {args.visits:,} visits in {time.perf_counter() - started:.0f}s")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
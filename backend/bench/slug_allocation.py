@@ -0,0 +1,120 @@
+"""
+Compare slug allocation strategies as the MIN_LENGTH keyspace fills up.
+
+Occupancy is modelled per slug length rather than materialised (the 4-char
+space alone is 14.7M slugs), and every database call is charged a fixed
+round-trip time. Run from the repo root:
+
+    python backend/bench/slug_allocation.py --rtt-ms 1.5 --samples 20000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("SLUG_KEY", "bench-slug-key")
+
+from utils.config import MIN_LENGTH, SLUG_MAX_ATTEMPTS  # noqa: E402
+from utils.slugs import BASE, SlugAllocator, slug_for_id  # noqa: E402
+
+FILL_LEVELS = [0.0, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99]
+BLOCK_SIZE = 100
+
+
+def random_retry(rng, fill):
+    """
+    The original loop: up to five SELECT probes with lengths 4, 4, 5, 6, 7,
+    then an INSERT. Longer lengths are assumed empty.
+    Returns (round_trips, succeeded).
+    """
+    lengths = [MIN_LENGTH, MIN_LENGTH, MIN_LENGTH + 1, MIN_LENGTH + 2, MIN_LENGTH + 3]
+    for attempt, length in enumerate(lengths, start=1):
+        occupied = fill if length == MIN_LENGTH else 0.0
+        if rng.random() >= occupied:
+            return attempt + 1, True
+    return len(lengths), False
+
+
+def sequence_allocator(rng, legacy_fill, reserved):
+    """
+    Block-reserved sequence ids with INSERT ... ON CONFLICT DO NOTHING. Only
+    slugs created before the migration (legacy_fill of the space) can
+    collide; the allocator never collides with itself.
+    """
+    round_trips = 0
+    for _ in range(SLUG_MAX_ATTEMPTS):
+        if reserved[0] % BLOCK_SIZE == 0:
+            round_trips += 1
+        reserved[0] += 1
+        round_trips += 1
+        if rng.random() >= legacy_fill:
+            return round_trips, True
+    return round_trips, False
+
+
+def summarise(samples, rtt_ms):
+    trips = [trips for trips, _ in samples]
+    latencies = sorted(trip * rtt_ms for trip in trips)
+    failures = sum(1 for _, ok in samples if not ok)
+    return {
+        "trips": statistics.mean(trips),
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[int(len(latencies) * 0.99)],
+        "failed": failures / len(samples),
+    }
+
+
+def allocator_cpu_cost(count):
+    async def reserve(needed):
+        blocks = []
+        while len(blocks) * BLOCK_SIZE < needed:
+            blocks.append((reserve.next_id, BLOCK_SIZE))
+            reserve.next_id += BLOCK_SIZE
+        return blocks
+    reserve.next_id = 0
+
+    allocator = SlugAllocator(reserve)
+    loop = asyncio.new_event_loop()
+    started = time.perf_counter()
+    loop.run_until_complete(allocator.next_slugs(count))
+    elapsed = time.perf_counter() - started
+    loop.close()
+    return elapsed / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rtt-ms", type=float, default=1.5)
+    parser.add_argument("--samples", type=int, default=20000)
+    parser.add_argument("--legacy-fill", type=float, default=0.01,
+                        help="Share of the MIN_LENGTH space taken by pre-migration slugs")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"keyspace {BASE}^{MIN_LENGTH} = {BASE ** MIN_LENGTH:,} slugs, rtt {args.rtt_ms} ms\n")
+    print(f"{'fill':>5} | {'strategy':<10} | {'trips':>6} | {'p50 ms':>7} | {'p99 ms':>7} | {'failed':>7}")
+    print("-" * 58)
+    for fill in FILL_LEVELS:
+        reserved = [0]
+        rows = {
+            "random": summarise([random_retry(rng, fill) for _ in range(args.samples)], args.rtt_ms),
+            "sequence": summarise(
+                [sequence_allocator(rng, min(fill, args.legacy_fill), reserved) for _ in range(args.samples)],
+                args.rtt_ms
+            ),
+        }
+        for name, row in rows.items():
+            print(f"{fill:>5.2f} | {name:<10} | {row['trips']:>6.2f} | {row['p50']:>7.2f} | "
+                  f"{row['p99']:>7.2f} | {row['failed']:>7.2%}")
+
+    print(f"\nslug_for_id + allocator overhead: {allocator_cpu_cost(100_000):.2f} us/slug")
+    print(f"first ids -> {[slug_for_id(i) for i in range(5)]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+CREATE TABLE slug_invalidations (
+    slug TEXT PRIMARY KEY,
+    invalidated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX slug_invalidations_invalidated_at_idx ON slug_invalidations (invalidated_at);
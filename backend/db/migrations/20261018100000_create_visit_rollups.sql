@@ -0,0 +1,36 @@
+CREATE TABLE url_visit_counts_hourly (
+    shortened_url_id UUID REFERENCES shortened_urls(id) ON DELETE CASCADE,
+    bucket TIMESTAMP NOT NULL,
+    visits BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (shortened_url_id, bucket)
+);
+
+CREATE TABLE url_visit_counts_daily (
+    shortened_url_id UUID REFERENCES shortened_urls(id) ON DELETE CASCADE,
+    bucket DATE NOT NULL,
+    visits BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (shortened_url_id, bucket)
+);
+
+CREATE TABLE url_visit_totals (
+    shortened_url_id UUID PRIMARY KEY REFERENCES shortened_urls(id) ON DELETE CASCADE,
+    visits BIGINT NOT NULL DEFAULT 0,
+    last_visit_at TIMESTAMP
+);
+
+INSERT INTO url_visit_counts_hourly (shortened_url_id, bucket, visits)
+SELECT shortened_url_id, date_trunc('hour', visit_time), COUNT(*)
+FROM url_visits
+WHERE shortened_url_id IS NOT NULL
+GROUP BY 1, 2;
+
+INSERT INTO url_visit_counts_daily (shortened_url_id, bucket, visits)
+SELECT shortened_url_id, bucket::date, SUM(visits)
+FROM url_visit_counts_hourly
+GROUP BY 1, 2;
+
+INSERT INTO url_visit_totals (shortened_url_id, visits, last_visit_at)
+SELECT shortened_url_id, COUNT(*), MAX(visit_time)
+FROM url_visits
+WHERE shortened_url_id IS NOT NULL
+GROUP BY 1;
@@ -0,0 +1,11 @@
+UPDATE shortened_urls SET created_at = NOW() WHERE created_at IS NULL;
+ALTER TABLE shortened_urls ALTER COLUMN created_at SET NOT NULL;
+
+UPDATE url_visits SET visit_time = NOW() WHERE visit_time IS NULL;
+ALTER TABLE url_visits ALTER COLUMN visit_time SET NOT NULL;
+
+-- Keyset pagination: WHERE user_id = $1 AND (created_at, id) > ($2, $3) ORDER BY created_at, id
+CREATE INDEX shortened_urls_user_id_created_at_id_idx ON shortened_urls (user_id, created_at, id);
+
+-- Keyset pagination: WHERE shortened_url_id = $1 AND (visit_time, id) > ($2, $3) ORDER BY visit_time, id
+CREATE INDEX url_visits_shortened_url_id_visit_time_id_idx ON url_visits (shortened_url_id, visit_time, id);
@@ -0,0 +1,80 @@
+-- shortened_urls.user_id and url_visits.shortened_url_id are already covered
+-- as leading columns of the keyset indexes added in 20261018110000.
+
+-- Long-URL lookups (get_short_url_record(long_url=...)) are pure equality, so
+-- a hash index serves them without the size cost of a btree over long TEXT.
+CREATE INDEX shortened_urls_url_hash_idx ON shortened_urls USING hash (url);
+
+-- Range-partition url_visits by month on visit_time so old months can be
+-- detached instead of deleted row by row.
+ALTER TABLE url_visits RENAME TO url_visits_unpartitioned;
+ALTER INDEX url_visits_shortened_url_id_visit_time_id_idx RENAME TO url_visits_unpartitioned_keyset_idx;
+
+CREATE TABLE url_visits (
+    id UUID NOT NULL,
+    shortened_url_id UUID REFERENCES shortened_urls(id),
+    visit_time TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, visit_time)
+) PARTITION BY RANGE (visit_time);
+
+CREATE INDEX url_visits_shortened_url_id_visit_time_id_idx ON url_visits (shortened_url_id, visit_time, id);
+
+-- Catches anything outside the monthly partitions, e.g. clicks with a bogus
+-- client timestamp.
+CREATE TABLE url_visits_default PARTITION OF url_visits DEFAULT;
+
+CREATE FUNCTION create_url_visit_partitions(start_month DATE, months_ahead INT)
+RETURNS SETOF TEXT AS $$
+DECLARE
+    current_month DATE := date_trunc('month', start_month);
+    last_month DATE := date_trunc('month', NOW() + make_interval(months => months_ahead));
+    partition_name TEXT;
+BEGIN
+    WHILE current_month <= last_month LOOP
+        partition_name := 'url_visits_' || to_char(current_month, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF url_visits FOR VALUES FROM (%L) TO (%L)',
+                partition_name, current_month, current_month + INTERVAL '1 month'
+            );
+            RETURN NEXT partition_name;
+        END IF;
+        current_month := current_month + INTERVAL '1 month';
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detaches (and optionally drops) monthly partitions that end before the
+-- cutoff. Returns the affected partition names.
+CREATE FUNCTION detach_url_visit_partitions(cutoff TIMESTAMP, drop_detached BOOLEAN DEFAULT FALSE)
+RETURNS SETOF TEXT AS $$
+DECLARE
+    expired RECORD;
+BEGIN
+    FOR expired IN
+        SELECT child.relname AS name
+        FROM pg_inherits
+        JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'url_visits'
+        AND child.relname ~ '^url_visits_[0-9]{4}_[0-9]{2}$'
+        AND to_date(substring(child.relname FROM 12), 'YYYY_MM') + INTERVAL '1 month' <= cutoff
+        ORDER BY child.relname
+    LOOP
+        EXECUTE format('ALTER TABLE url_visits DETACH PARTITION %I', expired.name);
+        IF drop_detached THEN
+            EXECUTE format('DROP TABLE %I', expired.name);
+        END IF;
+        RETURN NEXT expired.name;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_url_visit_partitions(
+    COALESCE((SELECT MIN(visit_time) FROM url_visits_unpartitioned), NOW())::date, 3
+);
+
+INSERT INTO url_visits (id, shortened_url_id, visit_time)
+SELECT id, shortened_url_id, visit_time FROM url_visits_unpartitioned;
+
+DROP TABLE url_visits_unpartitioned;
@@ -0,0 +1,3 @@
+-- Slugs are derived from ids handed out by this sequence (see utils/slugs.py).
+-- Each nextval() reserves a block of INCREMENT BY ids for one container.
+CREATE SEQUENCE slug_id_seq MINVALUE 0 START WITH 0 INCREMENT BY 100;
@@ -0,0 +1,9 @@
+ALTER TABLE users ADD COLUMN dedupe_urls BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- sha256 of the canonicalized URL (utils/urls.py). Only set for links created
+-- while the owner has dedupe_urls enabled, so users who never opted in keep
+-- their duplicate links and are unaffected by the unique index.
+ALTER TABLE shortened_urls ADD COLUMN url_hash BYTEA;
+
+CREATE UNIQUE INDEX shortened_urls_user_id_url_hash_key
+ON shortened_urls (user_id, url_hash) WHERE url_hash IS NOT NULL;
@@ -0,0 +1,14 @@
+DELETE FROM refresh_tokens WHERE expires_at IS NULL OR expires_at <= NOW();
+
+-- Store sha256(token) instead of the raw token. Digests of existing tokens
+-- match what the auth Lambda computes, so live sessions survive.
+ALTER TABLE refresh_tokens ADD COLUMN token_hash BYTEA;
+UPDATE refresh_tokens SET token_hash = sha256(convert_to(token, 'UTF8'));
+ALTER TABLE refresh_tokens DROP COLUMN token;
+ALTER TABLE refresh_tokens ADD PRIMARY KEY (token_hash);
+ALTER TABLE refresh_tokens ALTER COLUMN expires_at SET NOT NULL;
+
+-- "Log out all sessions" and per-user lookups.
+CREATE INDEX refresh_tokens_user_id_expires_at_idx ON refresh_tokens (user_id, expires_at);
+-- Expiry sweeper.
+CREATE INDEX refresh_tokens_expires_at_idx ON refresh_tokens (expires_at);
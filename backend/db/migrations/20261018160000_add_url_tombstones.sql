@@ -0,0 +1,6 @@
+-- Busy links are tombstoned on delete and removed by the maintenance job
+-- once their visits have been deleted in batches.
+ALTER TABLE shortened_urls ADD COLUMN deleted_at TIMESTAMP;
+
+CREATE INDEX shortened_urls_deleted_at_idx ON shortened_urls (deleted_at)
+WHERE deleted_at IS NOT NULL;
@@ -0,0 +1,21 @@
+-- Per-link, per-day HyperLogLog sketches of salted visitor hashes. Each
+-- sketch is a fixed-size array of one-byte registers (see utils/hll.py).
+CREATE TABLE url_visitor_sketches_daily (
+    shortened_url_id UUID REFERENCES shortened_urls(id) ON DELETE CASCADE,
+    bucket DATE NOT NULL,
+    sketch BYTEA NOT NULL,
+    PRIMARY KEY (shortened_url_id, bucket)
+);
+
+-- Union of two sketches: the byte-wise maximum of their registers.
+CREATE FUNCTION hll_merge(a BYTEA, b BYTEA) RETURNS BYTEA
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN a IS NULL THEN b
+        WHEN b IS NULL THEN a
+        ELSE (
+            SELECT string_agg(set_byte('\x00'::bytea, 0, GREATEST(get_byte(a, i), get_byte(b, i))), ''::bytea ORDER BY i)
+            FROM generate_series(0, length(a) - 1) AS i
+        )
+    END
+$$;
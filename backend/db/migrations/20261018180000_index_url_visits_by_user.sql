@@ -0,0 +1,12 @@
+-- Visits across all of a user's links, in keyset order:
+--   WHERE user_id = $1 AND (visit_time, id) > ($2, $3) ORDER BY visit_time, id
+-- The owner is copied onto each visit so that listing can walk one index
+-- instead of sorting every visit of every link the user has.
+ALTER TABLE url_visits ADD COLUMN user_id UUID;
+
+UPDATE url_visits AS visits
+SET user_id = urls.user_id
+FROM shortened_urls AS urls
+WHERE urls.id = visits.shortened_url_id;
+
+CREATE INDEX url_visits_user_id_visit_time_id_idx ON url_visits (user_id, visit_time, id);
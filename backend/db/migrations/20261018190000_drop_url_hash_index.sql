@@ -0,0 +1,3 @@
+-- Nothing looks links up by long URL any more: dedupe goes through
+-- url_hash, so the hash index on url only added write cost.
+DROP INDEX IF EXISTS shortened_urls_url_hash_idx;
@@ -0,0 +1,17 @@
+-- Visit exports run in the background: POST /shorten/export queues a job
+-- and the export Lambda writes the file, recording the outcome here.
+CREATE TABLE export_jobs (
+    id UUID PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    format TEXT NOT NULL,
+    slug TEXT,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    attempts INT NOT NULL DEFAULT 0,
+    object_key TEXT,
+    rows BIGINT,
+    error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX export_jobs_user_id_created_at_idx ON export_jobs (user_id, created_at);
@@ -0,0 +1,57 @@
+"""
+Apply backend/db/migrations/*.sql in filename order to the database named by
+the usual DB_* environment variables. Applied files are recorded in
+schema_migrations, so reruns only apply what is new.
+
+    python backend/local/migrate.py
+"""
+import asyncio
+import os
+import asyncpg
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "..", "db", "migrations")
+
+
+async def connect():
+    return await asyncpg.connect(
+        user=os.environ.get("DB_USER", "postgres"),
+        password=os.environ.get("DB_PASSWORD"),
+        database=os.environ.get("DB_NAME", "shortener"),
+        host=os.environ.get("DB_HOST", "localhost"),
+        port=os.environ.get("DB_PORT", "5432"),
+    )
+
+
+async def migrate(conn, migrations_dir=MIGRATIONS_DIR):
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            filename TEXT PRIMARY KEY,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    """)
+    applied = {row["filename"] for row in await conn.fetch("SELECT filename FROM schema_migrations")}
+
+    newly_applied = []
+    for filename in sorted(os.listdir(migrations_dir)):
+        if not filename.endswith(".sql") or filename in applied:
+            continue
+        with open(os.path.join(migrations_dir, filename)) as f:
+            sql = f.read()
+        async with conn.transaction():
+            await conn.execute(sql)
+            await conn.execute("INSERT INTO schema_migrations (filename) VALUES ($1)", filename)
+        newly_applied.append(filename)
+    return newly_applied
+
+
+async def main():
+    conn = await connect()
+    try:
+        for filename in await migrate(conn):
+            print(f"applied {filename}")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,195 @@
+"""
+Single-process host for the auth, shortener, public, analytics and export
+Lambdas.
+
+HTTP requests are translated into API Gateway v2 events and routed the way
+infra/api.tf does. Click events from the public Lambda go through an
+in-process bus straight into analytics.async_handler, and S3 is replaced by
+a directory on disk. Point the DB_* variables at a local Postgres and set
+JWT_SECRET and SLUG_KEY:
+
+    python backend/local/migrate.py
+    python backend/local/server.py --port 8000 --storage .local/storage
+"""
+import argparse
+import asyncio
+import base64
+import importlib.util
+import json
+import os
+import sys
+import time
+import uuid
+from urllib.parse import parse_qsl, urlencode
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC_DIR = os.path.join(BACKEND_DIR, "src")
+sys.path.insert(0, SRC_DIR)
+
+
+def load_lambda(name):
+    """Import lambda/<name>/index.py under a unique module name."""
+    path = os.path.join(SRC_DIR, "lambda", name, "index.py")
+    spec = importlib.util.spec_from_file_location(f"shorty_lambda_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_event(method, path, headers=None, query=None, body=None, source_ip="127.0.0.1"):
+    headers = {key.lower(): value for key, value in (headers or {}).items()}
+    query = dict(query or {})
+    now = time.time()
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": urlencode(query),
+        "headers": headers,
+        "queryStringParameters": query or None,
+        "requestContext": {
+            "http": {
+                "method": method,
+                "path": path,
+                "protocol": "HTTP/1.1",
+                "sourceIp": source_ip,
+                "userAgent": headers.get("user-agent", ""),
+            },
+            "requestId": str(uuid.uuid4()),
+            "time": time.strftime("%d/%b/%Y:%H:%M:%S +0000", time.gmtime(now)),
+            "timeEpoch": int(now * 1000),
+        },
+        "body": body,
+        "isBase64Encoded": False,
+    }
+
+
+class LocalEventBus:
+    """
+    Stands in for EventBridge + SQS. The click emitter calls publish() when
+    it flushes; delivery is scheduled onto the host's event loop.
+    """
+
+    def __init__(self, analytics):
+        self.analytics = analytics
+        self.loop = None
+        self.pending = []
+        self.delivered = 0
+
+    def publish(self, entry):
+        envelope = {
+            "source": entry["Source"],
+            "detail-type": entry["DetailType"],
+            "detail": json.loads(entry["Detail"]),
+        }
+        future = asyncio.run_coroutine_threadsafe(self._deliver(envelope), self.loop)
+        self.pending.append(future)
+
+    async def _deliver(self, envelope):
+        await self.analytics.async_handler(envelope, None)
+        self.delivered += 1
+
+    async def drain(self):
+        """Wait until every published event has been consumed."""
+        while self.pending:
+            pending, self.pending = self.pending, []
+            await asyncio.gather(*(asyncio.wrap_future(future) for future in pending))
+
+
+class LocalHost:
+    def __init__(self, storage_root):
+        os.environ["LOCAL_STORAGE_ROOT"] = os.path.abspath(storage_root)
+        os.environ.setdefault("EVENT_BUS_NAME", "local")
+
+        from utils.events import LocalSink
+        from utils.export import LocalQueue
+
+        self.auth = load_lambda("auth")
+        self.shortener = load_lambda("shortener")
+        self.public = load_lambda("public")
+        self.analytics = load_lambda("analytics")
+        self.export = load_lambda("export")
+        self.bus = LocalEventBus(self.analytics)
+        self.public._click_emitter.sink = LocalSink(on_event=self.bus.publish)
+        self.export_jobs = []
+        self.shortener._export_queue = LocalQueue(on_message=self._run_export)
+
+    def start(self):
+        self.bus.loop = asyncio.get_running_loop()
+
+    async def invoke(self, event):
+        path = event["requestContext"]["http"]["path"]
+        from utils.serialization import compress_response
+
+        if path == "/auth" or path.startswith("/auth/"):
+            return compress_response(await self.auth.async_handler(event, None), event)
+        if path == "/shorten" or path.startswith("/shorten/"):
+            return compress_response(await self._invoke_shortener(event), event)
+        return await self._invoke_public(event)
+
+    async def request(self, method, path, headers=None, query=None, body=None):
+        if body is not None and not isinstance(body, str):
+            body = json.dumps(body)
+        return await self.invoke(build_event(method, path, headers, query, body))
+
+    async def _invoke_shortener(self, event):
+        # Mirrors shortener.handler, which authenticates before the loop runs.
+        if event["requestContext"]["http"]["method"] == "OPTIONS":
+            return self.shortener.create_response(200, {})
+        event = self.shortener.middleware(event, None)
+        if "statusCode" in event:
+            return event
+        return await self.shortener.async_handler(event, None)
+
+    def _run_export(self, body):
+        # Stands in for the export queue's event source mapping. Called from
+        # the shortener on the host's loop; the job runs as its own task.
+        record = {"messageId": str(uuid.uuid4()), "body": body}
+        self.export_jobs.append(asyncio.ensure_future(self.export.async_handler({"Records": [record]}, None)))
+
+    async def _invoke_public(self, event):
+        response = await self.public.async_handler(event, None)
+        self.public._click_emitter.flush_due(timeout=self.public.CLICK_FLUSH_TIMEOUT)
+        return response
+
+
+def create_app(host):
+    from aiohttp import web
+
+    async def handle(request):
+        body = await request.read()
+        event = build_event(
+            request.method,
+            request.path,
+            headers=dict(request.headers),
+            query=dict(parse_qsl(request.query_string, keep_blank_values=True)),
+            body=body.decode("utf-8") if body else None,
+            source_ip=request.remote or "127.0.0.1",
+        )
+        response = await host.invoke(event)
+        payload = response.get("body") or ""
+        payload = base64.b64decode(payload) if response.get("isBase64Encoded") else payload.encode("utf-8")
+        return web.Response(status=response["statusCode"], headers=response.get("headers") or {}, body=payload)
+
+    async def on_startup(app):
+        host.start()
+
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", handle)
+    app.on_startup.append(on_startup)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run all Lambda handlers in one local process")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--storage", default=os.path.join(BACKEND_DIR, ".local", "storage"))
+    args = parser.parse_args()
+
+    from aiohttp import web
+    web.run_app(create_app(LocalHost(args.storage)), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
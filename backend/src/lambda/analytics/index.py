@@ -1,68 +1,206 @@
-import asyncio
-import boto3
 import json
-import os
-from utils.crud.url import (create_url_visit)
-
-def put_click_object(event):
-    client = boto3.client("s3")
-    bucket_name = os.environ.get("BUCKET_NAME")
-    if not bucket_name:
-        raise ValueError("BUCKET_NAME environment variable is not set")
-    
-    object_key = f"clicks/{event['slug']}/{event['timestamp']}.json"
-    object_data = {
-        "source_ip": event["source_ip"],
-        "long_url": event["long_url"],
-        "user_agent": event["user_agent"],
-        "timestamp": event["timestamp"]
-    }
- 
-    response = client.put_object(
-        Bucket=bucket_name,
-        Key=object_key,
-        Body=json.dumps(object_data),
-        ContentType="application/json"
-    )
-    if response["ResponseMetadata"]["HTTPStatusCode"] != 200:
-        raise Exception(f"Failed to put object to S3: {response}")
-    return response
+import time
+import uuid
+from datetime import datetime, timezone
+from utils.archive import write_click_partitions
+from utils.bots import is_bot
+from utils.cache import TTLCache
+from utils.clicks import decode_click
+from utils.config import (
+    BOT_FILTER,
+    CLICK_DEDUPE_MAX_SIZE,
+    CLICK_DEDUPE_TTL,
+    HOT_SET_PUBLISH_INTERVAL,
+    HOT_SET_SIZE,
+)
+from utils.crud.url import create_url_visits, get_short_url_ids, get_short_url_targets
+from utils.db import drain_loop, run_in_loop
+from utils.hll import HyperLogLog, visitor_hash
+from utils.hotset import SlidingHeavyHitters, publish_hot_set
+from utils.instrumentation import instrumented
+from utils.storage import get_object_store
+
+# Namespace for visit ids derived from click idempotency keys.
+CLICK_ID_NAMESPACE = uuid.UUID("6f1c1f5e-3a8e-4c55-9f0e-2b8d7f4c9a11")
+
+_click_store = None
+_recent_clicks = TTLCache(CLICK_DEDUPE_MAX_SIZE, CLICK_DEDUPE_TTL)
+_hot_slugs = SlidingHeavyHitters()
+_next_publish_at = time.monotonic() + HOT_SET_PUBLISH_INTERVAL
+
+def get_click_store():
+    global _click_store
+    if _click_store is None:
+        _click_store = get_object_store()
+    return _click_store
+
+def click_time(click):
+    if click.get("timestamp"):
+        return datetime.fromtimestamp(click["timestamp"] / 1000, tz=timezone.utc).replace(tzinfo=None)
+    return datetime.utcnow()
+
+def click_key(click):
+    """
+    Deterministic visit id from the click's idempotency key (API Gateway
+    request id + slug), or None for clicks that carry no request id.
+    """
+    if not click.get("request_id"):
+        return None
+    return uuid.uuid5(CLICK_ID_NAMESPACE, f"{click['request_id']}:{click['slug']}")
+
+def filter_clicks(clicks):
+    """
+    Drop duplicates (within the batch and recently seen by this container)
+    and apply BOT_FILTER. Returns the clicks to keep.
+    """
+    kept = []
+    batch_keys = set()
+    for click in clicks:
+        key = click_key(click)
+        if key is not None:
+            if key in batch_keys or key in _recent_clicks:
+                continue
+            batch_keys.add(key)
+        if BOT_FILTER != "off" and is_bot(click.get("user_agent")):
+            if BOT_FILTER == "drop":
+                continue
+            click["is_bot"] = True
+        kept.append(click)
+    return kept
+
+def build_visitor_sketches(visits, clicks):
+    """One HyperLogLog per (url id, day) over the batch's visitor hashes."""
+    sketches = {}
+    for (_, url_id, visit_time), click in zip(visits, clicks):
+        key = (url_id, visit_time.date())
+        if key not in sketches:
+            sketches[key] = HyperLogLog()
+        sketches[key].add(visitor_hash(click.get("source_ip"), click.get("user_agent")))
+    return {key: sketch.to_bytes() for key, sketch in sketches.items()}
+
+def track_hot_slugs(clicks):
+    for click in clicks:
+        _hot_slugs.offer(click["slug"])
+
+async def maybe_publish_hot_set():
+    """
+    Republish the hot-slug snapshot at most once per HOT_SET_PUBLISH_INTERVAL.
+    Targets are read from the database at publish time rather than taken
+    from the clicks, which may have been queued for a while. Failures are
+    logged, never raised: the snapshot only warms caches.
+    """
+    global _next_publish_at
+    if time.monotonic() < _next_publish_at:
+        return
+    _next_publish_at = time.monotonic() + HOT_SET_PUBLISH_INTERVAL
+    top = _hot_slugs.top(HOT_SET_SIZE)
+    if not top:
+        return
+    try:
+        records = await get_short_url_targets([slug for slug, _ in top])
+        publish_hot_set(get_click_store(), top, records)
+    except Exception as e:
+        print(f"Failed to publish hot set: {e}")
+
+async def process_clicks(clicks):
+    """
+    Record a batch of clicks: duplicates and bots are filtered before any
+    write, then one slug lookup, one statement for the visits and one
+    Parquet file per hour partition. Slugs are re-resolved even when the
+    click carries a url id so that links deleted in the meantime are
+    dropped, not retried.
+    """
+    clicks = filter_clicks(clicks)
+    if not clicks:
+        return 0
+    url_ids = await get_short_url_ids([click["slug"] for click in clicks])
+
+    visits = []
+    counted = []
+    recorded = []
+    for click in clicks:
+        url_id = url_ids.get(click["slug"])
+        if not url_id:
+            continue
+        click["url_id"] = str(url_id)
+        recorded.append(click)
+        if not click.get("is_bot"):
+            visits.append((click_key(click) or uuid.uuid4(), url_id, click_time(click)))
+            counted.append(click)
+
+    if recorded:
+        # Archive first: if the insert then fails the batch is redelivered
+        # and at worst duplicated in S3, never missing from it.
+        write_click_partitions(get_click_store(), recorded)
+    if visits:
+        await create_url_visits(visits, build_visitor_sketches(visits, counted))
+    for click in recorded:
+        key = click_key(click)
+        if key is not None:
+            _recent_clicks.set(key, True)
+    track_hot_slugs(counted)
+    await maybe_publish_hot_set()
+    return len(visits)
+
+def is_click_event(event):
+    return event.get("detail-type") == "public" and event.get("source") == "public-lambda"
+
+async def handle_sqs_batch(records):
+    """
+    SQS delivers EventBridge envelopes as message bodies. Messages that do
+    not parse are reported back on their own; the rest of the batch is
+    written as a unit, so either all of it succeeds or all of it is
+    reported back to SQS for redelivery.
+    """
+    clicks = []
+    parsed = []
+    failures = []
+    for record in records:
+        try:
+            envelope = json.loads(record["body"])
+            if not is_click_event(envelope):
+                print("Skipping invalid event: ", record.get("messageId"))
+                continue
+            clicks.append(decode_click(envelope.get("detail", {})))
+        except Exception as e:
+            print(f"Failed to parse message {record.get('messageId')}: {e}")
+            failures.append({"itemIdentifier": record["messageId"]})
+            continue
+        parsed.append(record)
+
+    try:
+        processed = await process_clicks(clicks) if clicks else 0
+    except Exception as e:
+        print(f"Failed to process click batch: {e}")
+        failures += [{"itemIdentifier": record["messageId"]} for record in parsed]
+        return {"batchItemFailures": failures}
+
+    print(f"Processed {processed} of {len(records)} click events")
+    return {"batchItemFailures": failures}
 
 async def async_handler(event, context):
     """
     AWS Lambda function to handle trigger events.
     """
-    detail_type = event.get("detail-type")
-    source = event.get("source")
+    if "Records" in event:
+        return await handle_sqs_batch(event["Records"])
 
-    if not detail_type or not source or detail_type != "public" or source != "public-lambda":
+    if not is_click_event(event):
         print("Invalid event: ", event)
         return {
             "statusCode": 400,
             "body": "Invalid event"
         }
 
-    slug = event.get("detail", {}).get("slug")
-    await create_url_visit(slug=slug)
-
-    source_ip = event.get("detail", {}).get("event", {}).get("requestContext", {}).get("http", {}).get("sourceIp")
-    long_url = event.get("detail", {}).get("long_url")
-    user_agent = event.get("detail", {}).get("event", {}).get("requestContext", {}).get("http", {}).get("userAgent")
-    timestamp = event.get("detail", {}).get("event", {}).get("requestContext", {}).get("timeEpoch")
-    response = put_click_object({
-        "slug": slug,
-        "source_ip": source_ip,
-        "long_url": long_url,
-        "user_agent": user_agent,
-        "timestamp": timestamp
-    })
+    await process_clicks([decode_click(event.get("detail", {}))])
     return {
         "statusCode": 200,
         "body": json.dumps({"message": "Click event processed successfully"})
     }
 
+@instrumented("analytics", flush=drain_loop)
 def handler(event, context):
     """
     AWS Lambda function handler.
     """
-    return asyncio.run(async_handler(event, context))
\ No newline at end of file
+    return run_in_loop(async_handler(event, context))
@@ -1,50 +1,78 @@
-import asyncio
-import jwt
+import hashlib
+import secrets
+import time
 from datetime import datetime, timedelta
-from utils.config import JWT_SECRET, JWT_ALGORITHM, JWT_EXPIRATION
-from utils.db import run_query_fetchrow, run_query_execute
-from utils.helper import create_response, parse_body, hash_password, verify_jwt_token
-from utils.crud.user import get_user_by_email, get_user_by_id, create_user
-import uuid
+from utils.config import JWT_EXPIRATION, USER_CLAIMS_MAX_AGE
+from utils.db import run_query_fetchrow, run_query_execute, run_in_loop, drain_loop
+from utils.instrumentation import instrumented
+from utils.helper import create_response, parse_body
+from utils.serialization import compress_response
+from utils.passwords import hash_password, verify_password
+from utils.tokens import sign_jwt_token, verify_jwt_token
+from utils.crud.user import get_user_by_email, get_user_by_id, create_user, update_password_hash
+
+REFRESH_TOKEN_TTL = timedelta(days=30)
+
+def refresh_token_digest(refresh_token):
+    # Only the digest is stored, so a leaked table cannot be replayed.
+    return hashlib.sha256(refresh_token.encode("utf-8")).digest()
 
 async def save_refresh_token(user_id, token, expires_at):
     await run_query_execute("""
-        INSERT INTO refresh_tokens (user_id, token, expires_at, created_at)
+        INSERT INTO refresh_tokens (user_id, token_hash, expires_at, created_at)
         VALUES ($1, $2, $3, NOW())
-    """, user_id, token, expires_at)
-
-async def validate_refresh_token(refresh_token):
-    row = await run_query_fetchrow("""
-        SELECT user_id FROM refresh_tokens
-        WHERE token = $1 AND expires_at > NOW()
-    """, refresh_token)
-    return row['user_id'] if row else None
+    """, user_id, refresh_token_digest(token), expires_at)
+
+async def rotate_refresh_token(refresh_token, new_token, expires_at):
+    """
+    Consume a refresh token and issue its replacement in one statement.
+    Returns the owning user, or None if the token was unknown or expired.
+    """
+    return await run_query_fetchrow("""
+        WITH consumed AS (
+            DELETE FROM refresh_tokens
+            WHERE token_hash = $1 AND expires_at > NOW()
+            RETURNING user_id
+        ), issued AS (
+            INSERT INTO refresh_tokens (user_id, token_hash, expires_at, created_at)
+            SELECT user_id, $2, $3, NOW() FROM consumed
+            RETURNING user_id
+        )
+        SELECT users.id, users.email
+        FROM issued JOIN users ON users.id = issued.user_id
+    """, refresh_token_digest(refresh_token), refresh_token_digest(new_token), expires_at)
 
 async def invalidate_refresh_token(refresh_token):
-    await run_query_execute("DELETE FROM refresh_tokens WHERE token = $1", refresh_token)
+    await run_query_execute(
+        "DELETE FROM refresh_tokens WHERE token_hash = $1", refresh_token_digest(refresh_token)
+    )
 
-async def generate_tokens(user):
-    now = datetime.now(tz=None)
+async def invalidate_user_refresh_tokens(user_id):
+    result = await run_query_execute("DELETE FROM refresh_tokens WHERE user_id = $1", user_id)
+    return int(result.split()[-1])
+
+def issue_access_token(user, now):
     payload = {
         'sub': str(user['id']),
         'email': user['email'],
         'iat': now,
         'exp': now + timedelta(hours=JWT_EXPIRATION)
     }
-
-    access_token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
-    refresh_token = str(uuid.uuid4())
-    refresh_expires = now + timedelta(days=30)
-
-    await save_refresh_token(user['id'], refresh_token, refresh_expires)
-
     return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
+        "access_token": sign_jwt_token(payload),
         "expires_in": JWT_EXPIRATION * 3600,
         "token_type": "Bearer"
     }
 
+async def generate_tokens(user):
+    now = datetime.now(tz=None)
+    refresh_token = secrets.token_urlsafe(32)
+    await save_refresh_token(user['id'], refresh_token, now + REFRESH_TOKEN_TTL)
+
+    tokens = issue_access_token(user, now)
+    tokens["refresh_token"] = refresh_token
+    return tokens
+
 async def handle_register(body):
     if not (body and body.get("email") and body.get("password") is not None):
         return create_response(400, {"message": "Email and password are required"})
@@ -53,12 +81,12 @@ async def handle_register(body):
     if existing_user:
         return create_response(409, {"message": "User already exists"})
 
-    hashed_password, salt = hash_password(body['password'])
-
     user_data = {
         "email": body['email'],
-        "password_hash": hashed_password,
-        "salt": salt,
+        "password_hash": hash_password(body['password']),
+        # The salt is embedded in password_hash; the column only matters for
+        # legacy SHA-256 hashes.
+        "salt": "",
         "created_at": datetime.now()
     }
 
@@ -77,10 +105,15 @@ async def handle_login(body):
     if not user:
         return create_response(401, {"message": "Invalid email or password"})
 
-    hashed_input, _ = hash_password(body['password'], user['salt'])
-    if hashed_input != user['password_hash']:
+    matches, needs_rehash = verify_password(body['password'], user['password_hash'], user['salt'])
+    if not matches:
         return create_response(401, {"message": "Invalid email or password"})
 
+    if needs_rehash:
+        # Upgrade legacy SHA-256 or outdated-cost hashes while we have the
+        # plaintext in hand.
+        await update_password_hash(user['id'], hash_password(body['password']))
+
     tokens = await generate_tokens(user)
     tokens["message"] = "Login successful"
 
@@ -91,15 +124,14 @@ async def handle_refresh_token(body):
     if not refresh_token:
         return create_response(400, {"message": "Refresh token is required"})
 
-    user_id = await validate_refresh_token(refresh_token)
-    if not user_id:
-        return create_response(401, {"message": "Invalid or expired refresh token"})
-
-    user = await get_user_by_id(user_id)
+    now = datetime.now(tz=None)
+    new_refresh_token = secrets.token_urlsafe(32)
+    user = await rotate_refresh_token(refresh_token, new_refresh_token, now + REFRESH_TOKEN_TTL)
     if not user:
-        return create_response(401, {"message": "User not found"})
+        return create_response(401, {"message": "Invalid or expired refresh token"})
 
-    tokens = await generate_tokens(user)
+    tokens = issue_access_token(user, now)
+    tokens["refresh_token"] = new_refresh_token
     return create_response(200, tokens)
 
 async def handle_logout(body):
@@ -109,6 +141,22 @@ async def handle_logout(body):
 
     return create_response(200, {"message": "Logout successful"})
 
+async def handle_logout_all(headers):
+    """
+    Revoke every refresh token of the caller. Access tokens already issued
+    stay valid until they expire.
+    """
+    auth_header = headers.get("authorization") or headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return create_response(401, {"message": "Missing or invalid Authorization header"})
+
+    payload, error = verify_jwt_token(auth_header.split(" ")[1])
+    if error:
+        return create_response(401, {"message": error})
+
+    revoked = await invalidate_user_refresh_tokens(payload['sub'])
+    return create_response(200, {"message": "Logged out of all sessions", "revoked_sessions": revoked})
+
 async def handle_verify_token(headers):
     auth_header = headers.get("authorization") or headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
@@ -140,6 +188,12 @@ async def handle_get_user(headers):
     if error:
         return create_response(401, {"message": error})
 
+    # The token already carries id and email; only go to the database when
+    # the claims are old enough that the account may have changed.
+    issued_at = payload.get("iat", 0)
+    if payload.get("email") and time.time() - issued_at < USER_CLAIMS_MAX_AGE:
+        return create_response(200, {"user": {"id": payload["sub"], "email": payload["email"]}})
+
     user = await get_user_by_id(payload['sub'])
     if not user:
         return create_response(404, {"message": "User not found"})
@@ -172,6 +226,8 @@ async def async_handler(event, context):
             return await handle_refresh_token(body)
         elif path == "/logout":
             return await handle_logout(body)
+        elif path == "/logout-all":
+            return await handle_logout_all(event.get("headers", {}))
         elif path == "/verify-token":
             return await handle_verify_token(event.get("headers", {}))
 
@@ -181,5 +237,6 @@ async def async_handler(event, context):
 
     return create_response(400, {"message": "Invalid request"})
 
+@instrumented("auth", flush=drain_loop)
 def handler(event, context):
-    return asyncio.run(async_handler(event, context))
+    return compress_response(run_in_loop(async_handler(event, context)), event)
@@ -0,0 +1,38 @@
+import argparse
+import json
+import os
+from utils.archive import compact_clicks
+from utils.storage import LocalObjectStore, get_object_store
+
+# Stop reading sources with this much time left, so the last chunk can
+# still be written and its sources deleted before the Lambda times out.
+TIME_RESERVE_MS = int(os.environ.get("COMPACTION_TIME_RESERVE_MS", "120000"))
+
+def handler(event, context):
+    """
+    Scheduled job that folds small click objects into the partitioned
+    Parquet archive. Each run stops short of the Lambda deadline; the next
+    scheduled run continues where it left off.
+    """
+    stats = compact_clicks(
+        get_object_store(),
+        delete_sources=event.get("delete_sources", os.environ.get("DELETE_SOURCES") == "true"),
+        max_rows=int(event.get("max_rows", 100_000)),
+        out_of_time=lambda: context.get_remaining_time_in_millis() < TIME_RESERVE_MS,
+    )
+    print(f"Compaction finished: {stats}")
+    return {
+        "statusCode": 200,
+        "body": json.dumps(stats)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact click objects into Parquet partitions")
+    parser.add_argument("--bucket", help="S3 bucket (defaults to BUCKET_NAME)")
+    parser.add_argument("--local-root", help="Compact a local directory instead of S3")
+    parser.add_argument("--delete-sources", action="store_true")
+    parser.add_argument("--max-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    store = LocalObjectStore(args.local_root) if args.local_root else get_object_store(args.bucket)
+    print(compact_clicks(store, delete_sources=args.delete_sources, max_rows=args.max_rows))
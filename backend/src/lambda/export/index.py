@@ -0,0 +1,61 @@
+import json
+from utils.config import EXPORT_MAX_ATTEMPTS
+from utils.crud.export import fail_export_job, finish_export_job, start_export_job
+from utils.db import drain_loop, run_in_loop
+from utils.export import export_visits
+from utils.instrumentation import instrumented
+from utils.storage import get_object_store
+
+_export_store = None
+
+def get_export_store():
+    global _export_store
+    if _export_store is None:
+        _export_store = get_object_store()
+    return _export_store
+
+async def run_export_job(job_id):
+    """
+    Write one queued export to the bucket and record the outcome on the job.
+    A run that dies without recording anything (timeout, crash) leaves the
+    job 'running'; SQS redelivers it and it is retried until
+    EXPORT_MAX_ATTEMPTS, then failed.
+    """
+    job = await start_export_job(job_id)
+    if not job:
+        print(f"Export job {job_id} is already finished")
+        return None
+    if job["attempts"] > EXPORT_MAX_ATTEMPTS:
+        return await fail_export_job(job_id, "Export did not finish after several attempts")
+
+    try:
+        export = await export_visits(get_export_store(), job["user_id"], job["format"], slug=job["slug"])
+    except Exception as e:
+        print(f"Export job {job_id} failed: {e}")
+        return await fail_export_job(job_id, "Export failed")
+    return await finish_export_job(job_id, export["key"], export["rows"])
+
+async def async_handler(event, context):
+    """
+    SQS delivers one {"job_id"} message per invocation (batch size 1).
+    Messages that do not parse are reported back as batch item failures.
+    """
+    failures = []
+    for record in event.get("Records", []):
+        try:
+            job_id = json.loads(record["body"])["job_id"]
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Invalid export message {record.get('messageId')}: {e}")
+            failures.append({"itemIdentifier": record["messageId"]})
+            continue
+        job = await run_export_job(job_id)
+        if job:
+            print(f"Export job {job_id}: {job['status']} ({job['rows']} rows)")
+    return {"batchItemFailures": failures}
+
+@instrumented("export", flush=drain_loop)
+def handler(event, context):
+    """
+    AWS Lambda function handler.
+    """
+    return run_in_loop(async_handler(event, context))
@@ -0,0 +1,155 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from utils.archive import write_visit_archive
+from utils.config import (
+    VISIT_PARTITIONS_AHEAD,
+    VISIT_RETENTION_MONTHS,
+    VISIT_ARCHIVE_AFTER_DAYS,
+    VISIT_DELETE_BATCH_SIZE,
+    VISIT_DELETE_PAUSE,
+)
+from utils.crud.maintenance import (
+    delete_link_visits,
+    delete_tombstoned_link,
+    delete_visits,
+    detach_expired_visit_partitions,
+    ensure_visit_partitions,
+    get_tombstoned_links,
+    get_visits_before,
+    purge_slug_invalidations,
+    sweep_expired_refresh_tokens,
+)
+from utils.db import drain_loop, run_in_loop
+from utils.instrumentation import instrumented
+from utils.storage import get_object_store
+
+# Stop starting new batches this long before the Lambda would time out.
+DEADLINE_MARGIN = 15
+
+def retention_cutoff(months, now=None):
+    """First instant of the month `months` months before now."""
+    now = now or datetime.utcnow()
+    month_index = now.year * 12 + now.month - 1 - months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+async def maintain_visit_partitions(months_ahead, retention_months, drop_detached):
+    result = {"created": await ensure_visit_partitions(months_ahead), "detached": []}
+    if retention_months > 0:
+        result["detached"] = await detach_expired_visit_partitions(
+            retention_cutoff(retention_months), drop_detached=drop_detached
+        )
+    return result
+
+def get_deadline(context, default_seconds=600):
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        return time.monotonic() + context.get_remaining_time_in_millis() / 1000 - DEADLINE_MARGIN
+    return time.monotonic() + default_seconds
+
+async def archive_old_visits(store, cutoff, batch_size, pause, deadline):
+    """
+    Copy visits older than `cutoff` to the bucket and delete them, one
+    primary-key-ordered batch at a time, pausing between batches. A batch is
+    only deleted after its archive object has been written.
+    """
+    result = {"archived": 0, "objects": 0}
+    after = None
+    while time.monotonic() < deadline:
+        visits = await get_visits_before(cutoff, batch_size, after)
+        if not visits:
+            break
+        write_visit_archive(store, visits, cutoff)
+        result["objects"] += 1
+        result["archived"] += await delete_visits(visits)
+        after = (visits[-1]["id"], visits[-1]["visit_time"])
+        if len(visits) < batch_size:
+            break
+        await asyncio.sleep(pause)
+    return result
+
+async def purge_tombstoned_links(batch_size, pause, deadline):
+    """
+    Finish deletes of busy links: drop their visits in bounded batches, then
+    the link itself (its rollups follow via ON DELETE CASCADE).
+    """
+    result = {"visits_deleted": 0, "links_deleted": 0}
+    for link in await get_tombstoned_links():
+        while time.monotonic() < deadline:
+            deleted = await delete_link_visits(link["id"], batch_size)
+            result["visits_deleted"] += deleted
+            if deleted < batch_size:
+                break
+            await asyncio.sleep(pause)
+        else:
+            break
+        if await delete_tombstoned_link(link["id"]):
+            result["links_deleted"] += 1
+    return result
+
+async def run_maintenance(months_ahead, retention_months, drop_detached,
+                          archive_days, batch_size, pause, deadline):
+    """
+    Keeps future url_visits partitions created, detaches the ones past the
+    retention horizon, sweeps expired refresh tokens and purges stale slug
+    invalidation stamps. Then, until `deadline`, removes tombstoned links
+    and archives visits older than `archive_days` (0 disables archiving).
+    Shared by the scheduled handler and the command line.
+    """
+    result = await maintain_visit_partitions(
+        months_ahead=months_ahead,
+        retention_months=retention_months,
+        drop_detached=drop_detached,
+    )
+    result["refresh_tokens_deleted"] = await sweep_expired_refresh_tokens()
+    result["slug_invalidations_purged"] = await purge_slug_invalidations()
+    result["tombstones"] = await purge_tombstoned_links(batch_size, pause, deadline)
+    if archive_days > 0:
+        result["archive"] = await archive_old_visits(
+            get_object_store(), datetime.utcnow() - timedelta(days=archive_days), batch_size, pause, deadline
+        )
+    return result
+
+async def async_handler(event, context):
+    """Scheduled database maintenance; see run_maintenance."""
+    result = await run_maintenance(
+        months_ahead=int(event.get("months_ahead", VISIT_PARTITIONS_AHEAD)),
+        retention_months=int(event.get("retention_months", VISIT_RETENTION_MONTHS)),
+        drop_detached=event.get("drop_detached", os.environ.get("DROP_DETACHED_PARTITIONS") == "true"),
+        archive_days=int(event.get("archive_after_days", VISIT_ARCHIVE_AFTER_DAYS)),
+        batch_size=int(event.get("batch_size", VISIT_DELETE_BATCH_SIZE)),
+        pause=float(event.get("pause", VISIT_DELETE_PAUSE)),
+        deadline=get_deadline(context),
+    )
+    print(f"Maintenance finished: {result}")
+    return {
+        "statusCode": 200,
+        "body": json.dumps(result)
+    }
+
+@instrumented("maintenance", flush=drain_loop)
+def handler(event, context):
+    return run_in_loop(async_handler(event or {}, context))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run database maintenance tasks")
+    parser.add_argument("--months-ahead", type=int, default=VISIT_PARTITIONS_AHEAD)
+    parser.add_argument("--retention-months", type=int, default=VISIT_RETENTION_MONTHS)
+    parser.add_argument("--drop-detached", action="store_true")
+    parser.add_argument("--archive-after-days", type=int, default=VISIT_ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=VISIT_DELETE_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=VISIT_DELETE_PAUSE)
+    parser.add_argument("--max-seconds", type=int, default=600)
+    args = parser.parse_args()
+
+    print(run_in_loop(run_maintenance(
+        months_ahead=args.months_ahead,
+        retention_months=args.retention_months,
+        drop_detached=args.drop_detached,
+        archive_days=args.archive_after_days,
+        batch_size=args.batch_size,
+        pause=args.pause,
+        deadline=time.monotonic() + args.max_seconds,
+    )))
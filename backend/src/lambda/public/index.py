@@ -1,73 +1,99 @@
-import asyncio
-import asyncpg
-import boto3
-
 import os
 import json
-from typing import Dict, Optional
+import time
+from datetime import datetime, timedelta
+from utils.cache import TTLCache, MISSING
+from utils.clicks import build_click_record, encode_click
+from utils.config import (
+    SLUG_CACHE_MAX_SIZE,
+    SLUG_CACHE_TTL,
+    SLUG_CACHE_NEGATIVE_TTL,
+    SLUG_CACHE_SYNC_INTERVAL,
+    HOT_SET_PREFILL,
+    HOT_SET_WINDOW,
+    CLICK_FLUSH_TIMEOUT,
+    CLICK_PUT_TIMEOUT,
+)
+from utils.crud.url import get_short_url_record, get_slug_invalidations
+from utils.db import drain_loop, run_in_loop
+from utils.instrumentation import instrumented, set_field
+from utils.events import ClickEmitter, EventBridgeSink
+from utils.hotset import load_hot_set
+from utils.storage import get_object_store
 
 EVENT_BUS_NAME = os.environ.get("EVENT_BUS_NAME")
-_eventbridge_client: Optional[boto3.client] = None
-
-async def get_db_conn():
-    return await asyncpg.connect(
-        user=os.environ.get('DB_USER'),
-        password=os.environ.get('DB_PASSWORD'),
-        database=os.environ.get('DB_NAME'),
-        host=os.environ.get('DB_HOST'),
-        port=os.environ.get('DB_PORT')
-    )
 
-async def run_query_fetchrow(query, *args):
-    conn = await get_db_conn()
-    try:
-        row = await conn.fetchrow(query, *args)
-        return dict(row) if row else None
-    finally:
-        await conn.close()
+_click_emitter = ClickEmitter(
+    sink=EventBridgeSink(timeout=min(CLICK_PUT_TIMEOUT, CLICK_FLUSH_TIMEOUT)),
+    event_bus_name=EVENT_BUS_NAME,
+    source="public-lambda",
+    detail_type="public",
+)
 
-async def get_short_url_record(slug=None):
-    if slug:
-        return await run_query_fetchrow(
-            """
-            SELECT id, slug, url, user_id
-            FROM shortened_urls
-            WHERE slug = $1
-            """,
-            slug
-        )
+_slug_cache = TTLCache(SLUG_CACHE_MAX_SIZE, SLUG_CACHE_TTL)
+_invalidation_cursor = None
+_next_sync_at = 0.0
 
-def put_event_to_eventbus(detail: Dict, detail_type: str, source: str):
-    def get_eventbridge_client():
-        global _eventbridge_client
-        if _eventbridge_client is None:
-            _eventbridge_client = boto3.client(
-                service_name="events",
-            )
-        return _eventbridge_client
-
-
-    client = get_eventbridge_client()
-    response = client.put_events(
-        Entries=[{
-            "Source": source,
-            "DetailType": detail_type,
-            "Detail": json.dumps(detail),
-            "EventBusName": EVENT_BUS_NAME
-        }]
+def prefill_slug_cache():
+    """
+    Seed the cache of a new container with the hot-slug snapshot published
+    by analytics, so viral links resolve without a query. An entry's URL
+    comes from a click up to HOT_SET_WINDOW before its seen_at, so the
+    invalidation cursor starts that far before the oldest entry: links
+    changed since then are dropped again on the first sync.
+    """
+    global _invalidation_cursor
+    try:
+        snapshot = load_hot_set(get_object_store())
+    except ValueError:
+        return 0
+    if not snapshot:
+        return 0
+    for entry in snapshot["slugs"]:
+        _slug_cache.set(entry["slug"], {"id": entry["id"], "url": entry["url"]})
+    oldest = min(
+        [datetime.fromisoformat(entry["seen_at"]) for entry in snapshot["slugs"]],
+        default=datetime.fromisoformat(snapshot["generated_at"]),
     )
+    _invalidation_cursor = oldest - timedelta(seconds=snapshot.get("window", HOT_SET_WINDOW))
+    return len(snapshot["slugs"])
 
-    if response.get("FailedEntryCount", 0) > 0:
-        raise Exception(f"Failed to put event: {response['Entries']}")
+if HOT_SET_PREFILL:
+    prefill_slug_cache()
 
-    return response
+async def sync_slug_cache():
+    """
+    Drop cache entries for slugs the shortener changed since the last sync.
+    Runs at most once per SLUG_CACHE_SYNC_INTERVAL seconds per container.
+    """
+    global _invalidation_cursor, _next_sync_at
+    if time.monotonic() < _next_sync_at:
+        return
+    result = await get_slug_invalidations(since=_invalidation_cursor)
+    for slug in result["slugs"]:
+        _slug_cache.invalidate(slug)
+    _invalidation_cursor = result["now"]
+    _next_sync_at = time.monotonic() + SLUG_CACHE_SYNC_INTERVAL
+
+async def resolve_slug(slug):
+    await sync_slug_cache()
+    record = _slug_cache.get(slug)
+    set_field("cache_hit", record is not MISSING)
+    if record is not MISSING:
+        return record
+
+    record = await get_short_url_record(slug=slug)
+    if record:
+        record = {"id": record["id"], "url": record["url"]}
+        _slug_cache.set(slug, record)
+    else:
+        _slug_cache.set(slug, None, ttl=SLUG_CACHE_NEGATIVE_TTL)
+    return record
 
 async def async_handler(event, context):
     """
     AWS Lambda function to handle public events.
     """
-    print(f"Received event: {event}")
-
     method = event.get("requestContext", {}).get("http", {}).get("method")
     path = event.get("requestContext", {}).get("http", {}).get("path")
     path = path[:-1] if path.endswith("/") else path
@@ -79,14 +105,10 @@ async def async_handler(event, context):
             "body": json.dumps({"message": "Invalid request"})
         }
 
-    existing_record = await get_short_url_record(slug=slug)
+    existing_record = await resolve_slug(slug)
 
     if existing_record:
-        put_event_to_eventbus(
-            detail={"slug": slug, "event": event, "long_url": existing_record["url"] if existing_record else None},
-            detail_type="public",
-            source="public-lambda",
-        )
+        _click_emitter.emit(encode_click(build_click_record(event, slug, existing_record)))
         return {
             "statusCode": 301,
             "headers": { "Location": existing_record["url"] },
@@ -98,5 +120,11 @@ async def async_handler(event, context):
         "body": json.dumps({"message": "URL not found"})
     }
 
+@instrumented("public", flush=drain_loop)
 def handler(event, context):
-    return asyncio.run(async_handler(event, context))
+    response = run_in_loop(async_handler(event, context))
+    # The container is frozen once this returns, so nothing is sent in the
+    # background. Most redirects just queue their click; only the one that
+    # completes a batch, or finds an old click waiting, publishes.
+    _click_emitter.flush_due(timeout=CLICK_FLUSH_TIMEOUT)
+    return response
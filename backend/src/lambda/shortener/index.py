@@ -1,22 +1,49 @@
 import json
-import random
+import uuid
 import boto3
-import asyncio
 
-from utils.config import VALID_CHARS, MIN_LENGTH
-from utils.helper import create_response, parse_body, verify_jwt_token
+from utils.cache import TTLCache, MISSING
+from utils.config import (
+    SLUG_MAX_ATTEMPTS,
+    BATCH_MAX_URLS,
+    EXPORT_LINK_TTL,
+    USER_SETTINGS_CACHE_SIZE,
+    USER_SETTINGS_CACHE_TTL,
+)
+from utils.db import drain_loop, run_in_loop
+from utils.instrumentation import instrumented
+from utils.helper import create_response, parse_body
+from utils.tokens import verify_jwt_token
+from utils.serialization import compress_response
+from utils.pagination import paginate, parse_page_params
+from utils.slugs import SlugAllocator
+from utils.export import EXPORT_FORMATS, create_export_queue
+from utils.storage import get_object_store
+from utils.urls import url_hash
+from utils.hll import merge_sketches
+from utils.crud.user import get_user_settings, update_user_settings
+from utils.crud.export import create_export_job, fail_export_job, get_export_job
 from utils.crud.url import (
     create_short_url_record,
     delete_short_url,
-    get_short_url_record,
     list_short_urls,
-    update_long_url,
+    reserve_slug_ids,
+    create_short_url_records,
+    update_short_url,
     get_url_visits,
-    get_url_visits_by_user
+    get_url_visits_by_user,
+    get_url_visit_counts,
+    get_url_visitor_sketches,
+    get_url_visit_totals,
+    VISIT_ROLLUP_TABLES
 )
+from datetime import datetime, timedelta, timezone
 from typing import Dict, Optional
 
 _eventbridge_client: Optional[boto3.client] = None
+_slug_allocator = SlugAllocator(reserve_slug_ids)
+_export_queue = None
+_dedupe_settings = TTLCache(USER_SETTINGS_CACHE_SIZE, USER_SETTINGS_CACHE_TTL)
 
 def put_event_to_eventbus(detail: Dict, detail_type: str, source: str, event_bus_name: str):
     def get_eventbridge_client():
@@ -41,29 +68,288 @@ def put_event_to_eventbus(detail: Dict, detail_type: str, source: str, event_bus
     return response
 
 
+async def wants_dedupe(user_id):
+    """
+    The user's dedupe_urls setting, cached per container for
+    USER_SETTINGS_CACHE_TTL seconds so creates do not pay a lookup each.
+    """
+    dedupe = _dedupe_settings.get(user_id)
+    if dedupe is MISSING:
+        settings = await get_user_settings(user_id)
+        dedupe = bool(settings and settings["dedupe_urls"])
+        _dedupe_settings.set(user_id, dedupe)
+    return dedupe
+
+
+def dedupe_hash(url):
+    try:
+        return url_hash(url)
+    except ValueError:
+        # urlsplit rejects malformed netlocs, e.g. an out-of-range port.
+        raise ValueError("Invalid URL")
+
+
 async def handle_create_short_url(body, user_id):
     if not body or not isinstance(body, dict):
         raise ValueError("Invalid request body")
 
     url = body.get("url")
-    if not url:
+    if not url or not isinstance(url, str):
         raise ValueError("Missing URL in request body")
 
-    attempts = 5
-    minimum_length = MIN_LENGTH
-    while attempts > 0:
-        attempts -= 1
-        if attempts < 3:
-            minimum_length += 1
-
-        slug = "".join(random.choices(VALID_CHARS, k=minimum_length))
-        existing_record = await get_short_url_record(slug=slug)
-        if not existing_record or len(existing_record) == 0:
+    canonical_hash = dedupe_hash(url) if await wants_dedupe(user_id) else None
+    for _ in range(SLUG_MAX_ATTEMPTS):
+        # A conflict only happens against legacy random or custom slugs, or
+        # a concurrent create of the same URL (found on the next attempt).
+        record = await create_short_url_record(
+            await _slug_allocator.next_slug(), url, user_id, url_hash=canonical_hash
+        )
+        if record:
+            return record
+
+    raise RuntimeError("Failed to generate a unique slug after multiple attempts")
+
+
+async def handle_create_short_urls_batch(body, user_id):
+    """
+    Shorten many URLs in one request. Slugs for the whole batch are
+    allocated up front and rows are inserted with multi-row statements in a
+    single transaction. Items that fail validation or cannot get a slug are
+    reported individually while the rest are still created. With dedupe_urls
+    on, URLs the user already shortened resolve to the existing link, as on
+    the single-create path. Results carry only the index, id, slug and
+    `existed`; the caller already has the URLs.
+    """
+    urls = body.get("urls") if isinstance(body, dict) else None
+    if not isinstance(urls, list) or not urls:
+        return create_response(400, {"error": "Expected a non-empty 'urls' list"})
+    if len(urls) > BATCH_MAX_URLS:
+        return create_response(413, {"error": f"At most {BATCH_MAX_URLS} URLs per batch"})
+
+    dedupe = await wants_dedupe(user_id)
+    results = [None] * len(urls)
+    hashes = {}
+    # Items repeating an earlier item's canonical URL share its result.
+    repeats = {}
+    first_by_hash = {}
+    pending = []
+    for index, url in enumerate(urls):
+        if not (isinstance(url, str) and url.strip()):
+            results[index] = {"index": index, "error": "Invalid URL"}
+            continue
+        if dedupe:
+            try:
+                hashes[index] = dedupe_hash(url)
+            except ValueError as e:
+                results[index] = {"index": index, "error": str(e)}
+                continue
+            if hashes[index] in first_by_hash:
+                repeats[index] = first_by_hash[hashes[index]]
+                continue
+            first_by_hash[hashes[index]] = index
+        pending.append(index)
+
+    for _ in range(SLUG_MAX_ATTEMPTS):
+        if not pending:
             break
+        slugs = await _slug_allocator.next_slugs(len(pending))
+        by_slug = dict(zip(slugs, pending))
+        created = await create_short_url_records(
+            [(slug, urls[index], hashes.get(index)) for slug, index in by_slug.items()], user_id
+        )
+        for record in created:
+            index = by_slug.pop(record.pop("requested_slug"))
+            results[index] = {"index": index, **record}
+        # Whatever is left collided with an existing slug, or with a link
+        # created concurrently for the same URL; retry with new ids.
+        pending = list(by_slug.values())
+
+    for index in pending:
+        results[index] = {"index": index, "error": "Failed to generate a unique slug"}
+    for index, first in repeats.items():
+        results[index] = dict(results[first], index=index)
+        if "error" not in results[index]:
+            results[index]["existed"] = True
+
+    failed = sum(1 for result in results if "error" in result)
+    return create_response(201 if not failed else 207, {
+        "message": f"Created {len(results) - failed} of {len(results)} short URLs",
+        "created": len(results) - failed,
+        "failed": failed,
+        "results": results
+    })
+
+
+async def handle_user_settings(method, body, user_id):
+    if method == "PUT":
+        dedupe_urls = body.get("dedupe_urls") if isinstance(body, dict) else None
+        if not isinstance(dedupe_urls, bool):
+            return create_response(400, {"error": "'dedupe_urls' must be a boolean"})
+        settings = await update_user_settings(user_id, dedupe_urls)
+        if settings:
+            _dedupe_settings.set(user_id, settings["dedupe_urls"])
     else:
-        raise ValueError("Failed to generate a unique slug after multiple attempts")
-
-    return await create_short_url_record(slug, url, user_id)
+        settings = await get_user_settings(user_id)
+
+    if not settings:
+        return create_response(404, {"error": "User not found"})
+    return create_response(200, {"settings": settings})
+
+
+def get_export_queue():
+    global _export_queue
+    if _export_queue is None:
+        _export_queue = create_export_queue()
+    return _export_queue
+
+
+def export_job_response(job):
+    body = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "format": job["format"],
+        "slug": job["slug"],
+        "rows": job["rows"],
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+    }
+    if job["status"] == "done":
+        body["url"] = get_object_store().presign(job["object_key"], EXPORT_LINK_TTL)
+        body["expires_in"] = EXPORT_LINK_TTL
+    elif job["status"] == "failed":
+        body["error"] = job["error"]
+    return body
+
+
+async def handle_export_visits(body, user_id):
+    """
+    Queues an export of the user's visits (or one link's, with `slug`) as
+    CSV or NDJSON. The export Lambda writes the file; the caller polls
+    GET /shorten/export/{job_id} for its status and download link.
+    """
+    fmt = body.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return create_response(400, {"error": f"'format' must be one of: {', '.join(EXPORT_FORMATS)}"})
+
+    job = await create_export_job(user_id, fmt, slug=body.get("slug"))
+    try:
+        get_export_queue().send({"job_id": str(job["id"])})
+    except Exception as e:
+        print(f"Failed to queue export job {job['id']}: {e}")
+        await fail_export_job(job["id"], "Could not queue the export")
+        return create_response(503, {"error": "Could not queue the export, try again later"})
+    return create_response(202, dict(
+        export_job_response(job), status_url=f"/shorten/export/{job['id']}"
+    ))
+
+
+async def handle_get_export_job(user_id, job_id):
+    try:
+        job = await get_export_job(uuid.UUID(job_id), user_id)
+    except ValueError:
+        job = None
+    if not job:
+        return create_response(404, {"error": "Export not found"})
+    return create_response(200, export_job_response(job))
+
+
+def parse_utc_timestamp(value):
+    """ISO timestamp as naive UTC; values without an offset are taken as UTC."""
+    # fromisoformat() only accepts a "Z" suffix from Python 3.11 on.
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def parse_time_range(params, granularity):
+    """
+    Reads `from`/`to` ISO timestamps from the query string. Defaults to the
+    last 48 hours for hourly buckets and the last 30 days for daily ones.
+    """
+    end = parse_utc_timestamp(params["to"]) if params.get("to") else datetime.utcnow()
+    default_span = timedelta(hours=48) if granularity == "hour" else timedelta(days=30)
+    start = parse_utc_timestamp(params["from"]) if params.get("from") else end - default_span
+    if start >= end:
+        raise ValueError("'from' must be before 'to'")
+    return start, end
+
+
+async def handle_get_visit_stats(user_id, slug, params):
+    if not slug:
+        totals = await get_url_visit_totals(user_id)
+        return create_response(200, {"stats": totals})
+
+    granularity = params.get("granularity", "day")
+    if granularity not in VISIT_ROLLUP_TABLES:
+        return create_response(400, {"error": "granularity must be 'hour' or 'day'"})
+    try:
+        start, end = parse_time_range(params, granularity)
+    except ValueError as e:
+        return create_response(400, {"error": str(e)})
+
+    totals = await get_url_visit_totals(user_id, slug=slug)
+    if not totals:
+        return create_response(404, {"error": "Shortened URL not found"})
+
+    buckets = await get_url_visit_counts(slug, user_id, granularity, start, end)
+    return create_response(200, {
+        "slug": slug,
+        "total": totals[0]["visits"],
+        "last_visit_at": totals[0]["last_visit_at"],
+        "granularity": granularity,
+        "from": start,
+        "to": end,
+        "buckets": buckets
+    })
+
+
+UNIQUE_GRANULARITIES = ("day", "week", "month", "total")
+
+def unique_bucket(day, granularity):
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+async def handle_get_unique_visitors(user_id, slug, params):
+    """
+    Estimated unique visitors per day, ISO week or month (or for the whole
+    range with `total`), by merging the stored daily HyperLogLog sketches.
+    """
+    granularity = params.get("granularity", "day")
+    if granularity not in UNIQUE_GRANULARITIES:
+        return create_response(400, {"error": f"granularity must be one of: {', '.join(UNIQUE_GRANULARITIES)}"})
+    try:
+        start, end = parse_time_range(params, "day")
+    except ValueError as e:
+        return create_response(400, {"error": str(e)})
+
+    totals = await get_url_visit_totals(user_id, slug=slug)
+    if not totals:
+        return create_response(404, {"error": "Shortened URL not found"})
+
+    rows = await get_url_visitor_sketches(slug, user_id, start.date(), end.date() + timedelta(days=1))
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(unique_bucket(row["bucket"], granularity), []).append(row["sketch"])
+
+    overall = merge_sketches(row["sketch"] for row in rows)
+    return create_response(200, {
+        "slug": slug,
+        "granularity": granularity,
+        "from": start,
+        "to": end,
+        "unique_visitors": overall.count() if overall else 0,
+        "buckets": [] if granularity == "total" else [
+            {"bucket": bucket, "unique_visitors": merge_sketches(sketches).count()}
+            for bucket, sketches in grouped.items()
+        ],
+    })
 
 
 def middleware(event, context):
@@ -91,66 +377,102 @@ async def async_handler(event, context):
         return create_response(401, {"message": "Missing user ID in token payload"})
 
     if method == "GET":
+        params = event.get("queryStringParameters") or {}
+
+        if clean_path.startswith("/shorten/export/"):
+            return await handle_get_export_job(user_id, clean_path[len("/shorten/export/"):])
+
+        if clean_path.startswith("/shorten/uniques/"):
+            slug_part = clean_path[len("/shorten/uniques"):].strip("/")
+            return await handle_get_unique_visitors(user_id, slug_part, params)
+
+        if clean_path.startswith("/shorten/stats"):
+            slug_part = clean_path[len("/shorten/stats"):].strip("/")
+            return await handle_get_visit_stats(user_id, slug_part, params)
+
+        try:
+            limit, after = parse_page_params(params)
+        except ValueError as e:
+            return create_response(400, {"error": str(e)})
+
         if clean_path == "/shorten":
-            urls = await list_short_urls(user_id)
-            return create_response(200, {"short_urls": urls})
+            rows = await list_short_urls(user_id, limit=limit + 1, after=after)
+            urls, next_cursor = paginate(rows, limit, "created_at")
+            return create_response(200, {"short_urls": urls, "next_cursor": next_cursor})
 
         if clean_path.startswith("/shorten/visits"):
             slug_part = clean_path[len("/shorten/visits"):].strip("/")
 
             if not slug_part:
-                all_visits = await get_url_visits_by_user(user_id)
-                return create_response(200, {"visits": all_visits})
+                rows = await get_url_visits_by_user(user_id, limit=limit + 1, after=after)
             else:
                 slug = slug_part
                 try:
-                    slug_visits = await get_url_visits(slug=slug)
+                    rows = await get_url_visits(slug, user_id, limit=limit + 1, after=after)
                 except ValueError as e:
                     print(e)
                     if str(e) == "Shortened URL not found":
                         return create_response(404, {"error": "Shortened URL not found"})
 
-                return create_response(200, {"visits": slug_visits})
+            visits, next_cursor = paginate(rows, limit, "visit_time")
+            return create_response(200, {"visits": visits, "next_cursor": next_cursor})
 
     if method == "PUT" and clean_path == "/shorten":
         body = parse_body(event)
-
-        existing_record = await get_short_url_record(slug=body.get("slug"))
-        if not existing_record or len(existing_record.keys()) == 0:
-            return create_response(404, {"error": "Short URL not found"})
-
         new_url = body.get("updated_url")
-        new_slug = body.get("updated_slug")
-
-        if new_slug:
-            conflict_check = await get_short_url_record(slug=new_slug)
-            if conflict_check and conflict_check["slug"] != body.get("slug"):
-                return create_response(400, {"error": "Slug already in use"})
 
-        if existing_record["url"] == new_url and not new_slug:
-            return create_response(200, {"message": "Short URL already exists!", "data": existing_record})
+        new_url_hash = None
+        if isinstance(new_url, str) and new_url and await wants_dedupe(user_id):
+            try:
+                new_url_hash = dedupe_hash(new_url)
+            except ValueError as e:
+                return create_response(400, {"error": str(e)})
 
-        updated_record = await update_long_url(
-            slug=existing_record["slug"],
+        result = await update_short_url(
+            body.get("slug"),
+            user_id,
             new_url=new_url,
-            new_slug=new_slug
+            new_slug=body.get("updated_slug"),
+            new_url_hash=new_url_hash
         )
 
-        return create_response(200, {"message": "Short URL updated successfully!", "data": updated_record})
+        if result["status"] == "not_found":
+            return create_response(404, {"error": "Short URL not found"})
+        if result["status"] == "conflict":
+            return create_response(400, {"error": "Slug already in use"})
+        if result["status"] == "unchanged":
+            return create_response(200, {"message": "Short URL already exists!", "data": result["record"]})
+        return create_response(200, {"message": "Short URL updated successfully!", "data": result["record"]})
 
     if method == "DELETE" and clean_path == "/shorten":
         body = parse_body(event)
-        await delete_short_url(body.get("slug"))
+        if not await delete_short_url(body.get("slug"), user_id):
+            return create_response(404, {"error": "Short URL not found"})
         return create_response(200, {"message": "Short URL deleted successfully!"})
 
+    if method == "POST" and clean_path == "/shorten/export":
+        return await handle_export_visits(parse_body(event), user_id)
+
+    if method == "POST" and clean_path == "/shorten/batch":
+        return await handle_create_short_urls_batch(parse_body(event), user_id)
+
     if method == "POST" and clean_path == "/shorten":
         body = parse_body(event)
-        result = await handle_create_short_url(body, user_id)
+        try:
+            result = await handle_create_short_url(body, user_id)
+        except ValueError as e:
+            return create_response(400, {"error": str(e)})
+        if result.pop("existed", False):
+            return create_response(200, {"message": "Short URL already exists!", "data": result})
         return create_response(201, {"message": "Short URL created successfully!", "data": result})
 
+    if clean_path == "/shorten/settings" and method in ("GET", "PUT"):
+        return await handle_user_settings(method, parse_body(event), user_id)
+
     return create_response(404, {"error": "Page Not found"})
 
 
+@instrumented("shortener", flush=drain_loop)
 def handler(event, context):
     method = event.get("requestContext", {}).get("http", {}).get("method")
     if method == "OPTIONS":
@@ -159,4 +481,4 @@ def handler(event, context):
     event = middleware(event, context)
     if isinstance(event, dict) and "statusCode" in event:
         return event
-    return asyncio.run(async_handler(event, context))
+    return compress_response(run_in_loop(async_handler(event, context)), event)
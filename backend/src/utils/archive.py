@@ -0,0 +1,144 @@
+import gzip
+import io
+import json
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+CLICK_PREFIX = "clicks/"
+PARTITION_PREFIX = "clicks/dt="
+
+CLICK_SCHEMA = pa.schema([
+    ("slug", pa.string()),
+    ("url_id", pa.string()),
+    ("long_url", pa.string()),
+    ("timestamp", pa.timestamp("ms", tz="UTC")),
+    ("source_ip", pa.string()),
+    ("user_agent", pa.string()),
+    ("referer", pa.string()),
+    ("country", pa.string()),
+    ("request_id", pa.string()),
+    ("is_bot", pa.bool_()),
+])
+# Low-cardinality columns that repeat heavily within a partition.
+DICTIONARY_COLUMNS = ["slug", "url_id", "long_url", "user_agent", "country"]
+
+VISIT_ARCHIVE_PREFIX = "visits/archive/"
+# Raw url_visits rows past the retention horizon; ids as 16-byte UUIDs.
+VISIT_SCHEMA = pa.schema([
+    ("id", pa.binary(16)),
+    ("shortened_url_id", pa.binary(16)),
+    ("visit_time", pa.timestamp("us")),
+])
+
+
+def partition_prefix(timestamp_ms):
+    moment = datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
+    return f"{PARTITION_PREFIX}{moment:%Y-%m-%d}/hour={moment:%H}/"
+
+
+def to_parquet(clicks):
+    columns = {field.name: [click.get(field.name) for click in clicks] for field in CLICK_SCHEMA}
+    table = pa.Table.from_pydict(columns, schema=CLICK_SCHEMA)
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression="zstd", use_dictionary=DICTIONARY_COLUMNS)
+    return buffer.getvalue()
+
+
+def read_parquet(body):
+    return pq.read_table(io.BytesIO(body)).to_pylist()
+
+
+def write_click_partitions(store, clicks):
+    """
+    Group clicks by `dt=YYYY-MM-DD/hour=HH/` and write one Parquet file per
+    partition. Returns the keys written.
+    """
+    now_ms = int(time.time() * 1000)
+    partitions = defaultdict(list)
+    for click in clicks:
+        if not click.get("timestamp"):
+            click = dict(click, timestamp=now_ms)
+        partitions[partition_prefix(click["timestamp"])].append(click)
+
+    return [
+        store.put(f"{prefix}part-{uuid.uuid4().hex}.parquet", to_parquet(rows))
+        for prefix, rows in partitions.items()
+    ]
+
+
+def write_visit_archive(store, visits, cutoff):
+    """
+    Write one batch of url_visits rows as a Parquet object under
+    `visits/archive/before=YYYY-MM-DD/`. Returns the key.
+    """
+    table = pa.Table.from_pydict({
+        "id": [visit["id"].bytes for visit in visits],
+        "shortened_url_id": [visit["shortened_url_id"].bytes for visit in visits],
+        "visit_time": [visit["visit_time"] for visit in visits],
+    }, schema=VISIT_SCHEMA)
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression="zstd", use_dictionary=["shortened_url_id"])
+    key = f"{VISIT_ARCHIVE_PREFIX}before={cutoff:%Y-%m-%d}/part-{uuid.uuid4().hex}.parquet"
+    return store.put(key, buffer.getvalue())
+
+
+def read_legacy_object(key, body):
+    """
+    Decode the click objects written before the Parquet archive: one JSON
+    file per click under `clicks/{slug}/`, or gzipped NDJSON batches under
+    `clicks/batches/`.
+    """
+    if key.endswith(".ndjson.gz"):
+        lines = gzip.decompress(body).decode("utf-8").splitlines()
+        return [json.loads(line) for line in lines if line]
+    if key.endswith(".json"):
+        click = json.loads(body)
+        click["slug"] = key.split("/")[1]
+        return [click]
+    return []
+
+
+def compact_clicks(store, delete_sources=False, max_rows=100_000, out_of_time=None):
+    """
+    Fold legacy small click objects into the partitioned Parquet layout.
+    Rows are written out in chunks of about `max_rows`, and each chunk's
+    sources are deleted as soon as its write succeeds. A run that stops
+    early, or crashes, therefore loses no progress, and re-copies at most
+    the chunk in flight. `out_of_time()` is checked before each source is
+    read; once it returns True the pending chunk is flushed and the run
+    stops with `complete` False, and the next run picks up from there.
+    """
+    stats = {"sources": 0, "rows": 0, "files": 0, "complete": True}
+    buffered = []
+    consumed = []
+
+    def flush():
+        if buffered:
+            stats["files"] += len(write_click_partitions(store, buffered))
+            stats["rows"] += len(buffered)
+        if delete_sources and consumed:
+            store.delete(consumed)
+        stats["sources"] += len(consumed)
+        buffered.clear()
+        consumed.clear()
+
+    for key in store.list(CLICK_PREFIX):
+        if key.startswith(PARTITION_PREFIX):
+            continue
+        if out_of_time is not None and out_of_time():
+            stats["complete"] = False
+            break
+        clicks = read_legacy_object(key, store.get(key))
+        if not clicks:
+            continue
+        buffered.extend(clicks)
+        consumed.append(key)
+        if len(buffered) >= max_rows:
+            flush()
+
+    flush()
+    return stats
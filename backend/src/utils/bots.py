@@ -0,0 +1,25 @@
+import re
+from functools import lru_cache
+
+# Substrings (case-insensitive) of user agents that are not people clicking:
+# link-preview fetchers, search crawlers, uptime checks and HTTP libraries.
+BOT_USER_AGENT_PATTERNS = (
+    "bot", "crawler", "spider", "slurp", "preview", "fetcher",
+    "facebookexternalhit", "facebookcatalog", "whatsapp", "skypeuripreview",
+    "embedly", "vkshare", "outbrain", "nuzzel", "qwantify", "mastodon",
+    "google-inspectiontool", "googleother", "feedfetcher", "apis-google", "mediapartners-google",
+    "headlesschrome", "phantomjs", "lighthouse", "pingdom", "uptimerobot", "statuscake",
+    "curl/", "wget/", "python-requests", "python-urllib", "aiohttp", "httpx", "go-http-client",
+    "okhttp", "java/", "libwww-perl", "node-fetch", "axios/", "postmanruntime", "scrapy",
+)
+
+# Built once per container; matching is a single regex scan.
+_BOT_RE = re.compile("|".join(re.escape(pattern) for pattern in BOT_USER_AGENT_PATTERNS), re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def is_bot(user_agent):
+    """Empty user agents count as bots; no browser sends one."""
+    if not user_agent:
+        return True
+    return _BOT_RE.search(user_agent) is not None
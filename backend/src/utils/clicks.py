@@ -0,0 +1,74 @@
+import json
+
+# Bump when the wire format changes; decode_click keeps reading older versions
+# so events already in flight during a deploy are not lost.
+CLICK_SCHEMA_VERSION = 1
+
+# Wire key -> record key. Short keys keep the EventBridge detail small.
+_FIELDS = {
+    "s": "slug",
+    "i": "url_id",
+    "u": "long_url",
+    "t": "timestamp",
+    "ip": "source_ip",
+    "ua": "user_agent",
+    "r": "referer",
+    "c": "country",
+    "rid": "request_id",
+}
+_KEYS = {name: key for key, name in _FIELDS.items()}
+
+
+def _header(headers, name):
+    return headers.get(name) or headers.get(name.title())
+
+
+def build_click_record(event, slug, url_record):
+    """Extract the fields analytics needs from an API Gateway v2 event."""
+    request_context = event.get("requestContext", {})
+    http = request_context.get("http", {})
+    headers = event.get("headers") or {}
+    return {
+        "slug": slug,
+        "url_id": str(url_record["id"]) if url_record.get("id") else None,
+        "long_url": url_record["url"],
+        "timestamp": request_context.get("timeEpoch"),
+        "source_ip": http.get("sourceIp"),
+        "user_agent": http.get("userAgent"),
+        "referer": _header(headers, "referer"),
+        "country": _header(headers, "cloudfront-viewer-country"),
+        "request_id": request_context.get("requestId"),
+    }
+
+
+def encode_click(record):
+    payload = {"v": CLICK_SCHEMA_VERSION}
+    for name, value in record.items():
+        if value is not None:
+            payload[_KEYS[name]] = value
+    return json.dumps(payload, separators=(",", ":"))
+
+
+def decode_click(detail):
+    """
+    Accepts the EventBridge `detail` (already parsed or still a string) and
+    returns a click record with every field present.
+    """
+    if isinstance(detail, (str, bytes)):
+        detail = json.loads(detail)
+
+    if "v" not in detail:
+        return _decode_legacy(detail)
+
+    record = dict.fromkeys(_FIELDS.values())
+    for key, value in detail.items():
+        if key in _FIELDS:
+            record[_FIELDS[key]] = value
+    return record
+
+
+def _decode_legacy(detail):
+    # Version 0: the public Lambda forwarded the raw API Gateway event.
+    return build_click_record(
+        detail.get("event", {}), detail.get("slug"), {"id": None, "url": detail.get("long_url")}
+    )
@@ -1,10 +1,109 @@
 import os
 
 JWT_SECRET = os.environ.get("JWT_SECRET")
-JWT_ALGORITHM = "HS256"
+JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM", "HS256")
 JWT_EXPIRATION = 24
+# Only used for asymmetric algorithms (RS256, EdDSA, ...).
+JWT_KEY_ID = os.environ.get("JWT_KEY_ID")
+JWT_PRIVATE_KEY_FILE = os.environ.get("JWT_PRIVATE_KEY_FILE")
+JWT_JWKS_FILE = os.environ.get("JWT_JWKS_FILE")
+JWT_CACHE_SIZE = int(os.environ.get("JWT_CACHE_SIZE", "1024"))
+# /auth/user answers from token claims when the token is younger than this.
+USER_CLAIMS_MAX_AGE = int(os.environ.get("USER_CLAIMS_MAX_AGE", "900"))
 VALID_CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
 MIN_LENGTH = 4
 MAX_LENGTH = 8
 
-EVENT_BUS_NAME = os.environ.get("EVENT_BUS_NAME")
\ No newline at end of file
+EVENT_BUS_NAME = os.environ.get("EVENT_BUS_NAME")
+# Public handlers only flush queued clicks once a full PutEvents batch is
+# waiting or the oldest click is CLICK_FLUSH_AGE seconds old, and then for at
+# most CLICK_FLUSH_TIMEOUT; clicks older than CLICK_MAX_AGE are dropped.
+CLICK_FLUSH_AGE = float(os.environ.get("CLICK_FLUSH_AGE", "10"))
+CLICK_FLUSH_TIMEOUT = float(os.environ.get("CLICK_FLUSH_TIMEOUT", "0.2"))
+CLICK_PUT_TIMEOUT = float(os.environ.get("CLICK_PUT_TIMEOUT", "1"))
+CLICK_MAX_AGE = float(os.environ.get("CLICK_MAX_AGE", "300"))
+
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "4"))
+DB_POOL_MAX_IDLE = float(os.environ.get("DB_POOL_MAX_IDLE", "300"))
+DB_PING_AFTER = float(os.environ.get("DB_PING_AFTER", "30"))
+
+SLUG_CACHE_MAX_SIZE = int(os.environ.get("SLUG_CACHE_MAX_SIZE", "10000"))
+SLUG_CACHE_TTL = float(os.environ.get("SLUG_CACHE_TTL", "300"))
+SLUG_CACHE_NEGATIVE_TTL = float(os.environ.get("SLUG_CACHE_NEGATIVE_TTL", "30"))
+SLUG_CACHE_SYNC_INTERVAL = float(os.environ.get("SLUG_CACHE_SYNC_INTERVAL", "5"))
+
+VISIT_PARTITIONS_AHEAD = int(os.environ.get("VISIT_PARTITIONS_AHEAD", "3"))
+VISIT_RETENTION_MONTHS = int(os.environ.get("VISIT_RETENTION_MONTHS", "0"))
+
+# Secret key for the permutation from sequence ids to slugs. There is no
+# default: anyone holding the key can enumerate slugs in allocation order.
+SLUG_KEY = os.environ.get("SLUG_KEY")
+SLUG_MAX_ATTEMPTS = 5
+# Lambda caps request and response payloads at 6 MB; 1000 URLs of a few KB
+# each, and their slugs back, stay well under that.
+BATCH_MAX_URLS = int(os.environ.get("BATCH_MAX_URLS", "1000"))
+# How long a shortener container trusts its copy of a user's dedupe_urls
+# setting; a change made through another container applies after this.
+USER_SETTINGS_CACHE_SIZE = int(os.environ.get("USER_SETTINGS_CACHE_SIZE", "1024"))
+USER_SETTINGS_CACHE_TTL = float(os.environ.get("USER_SETTINGS_CACHE_TTL", "60"))
+
+# "scrypt", "pbkdf2_sha256" or "argon2" (needs argon2-cffi). Tune the cost
+# with `python -m utils.passwords --target-ms ...` on the target memory size.
+PASSWORD_HASHER = os.environ.get("PASSWORD_HASHER", "scrypt")
+PASSWORD_SCRYPT_N = int(os.environ.get("PASSWORD_SCRYPT_N", "16384"))
+PASSWORD_SCRYPT_R = int(os.environ.get("PASSWORD_SCRYPT_R", "8"))
+PASSWORD_SCRYPT_P = int(os.environ.get("PASSWORD_SCRYPT_P", "1"))
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get("PASSWORD_PBKDF2_ITERATIONS", "600000"))
+
+# "off", "json" (one structured log line per invocation) or "emf" (the same
+# line in CloudWatch Embedded Metric Format).
+INSTRUMENTATION = os.environ.get("INSTRUMENTATION", "off").lower()
+INSTRUMENTATION_NAMESPACE = os.environ.get("INSTRUMENTATION_NAMESPACE", "Shorty")
+
+# Pretty-printed (indented, sorted) JSON responses; compact otherwise.
+DEBUG = os.environ.get("DEBUG", "false").lower() == "true"
+# Response bodies smaller than this are never compressed.
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+
+# Visit exports: rows per server-side cursor round trip, S3 multipart part
+# size (S3 requires at least 5 MiB for all but the last part) and how long
+# the returned download link stays valid.
+EXPORT_FETCH_SIZE = int(os.environ.get("EXPORT_FETCH_SIZE", "2000"))
+EXPORT_PART_SIZE = int(os.environ.get("EXPORT_PART_SIZE", str(8 * 1024 * 1024)))
+EXPORT_LINK_TTL = int(os.environ.get("EXPORT_LINK_TTL", "3600"))
+EXPORT_QUEUE_URL = os.environ.get("EXPORT_QUEUE_URL")
+# Runs of one job (redeliveries after a crash or timeout) before it is failed.
+EXPORT_MAX_ATTEMPTS = int(os.environ.get("EXPORT_MAX_ATTEMPTS", "3"))
+
+# Deleting a link with more visits than this only tombstones it; the
+# maintenance job then removes its visits in batches.
+URL_SYNC_DELETE_MAX_VISITS = int(os.environ.get("URL_SYNC_DELETE_MAX_VISITS", "1000"))
+# Raw visits older than this many days are archived to the bucket and
+# deleted (0 disables). Rollups are kept.
+VISIT_ARCHIVE_AFTER_DAYS = int(os.environ.get("VISIT_ARCHIVE_AFTER_DAYS", "0"))
+VISIT_DELETE_BATCH_SIZE = int(os.environ.get("VISIT_DELETE_BATCH_SIZE", "5000"))
+# Pause between delete batches, to leave room for foreground queries.
+VISIT_DELETE_PAUSE = float(os.environ.get("VISIT_DELETE_PAUSE", "0.1"))
+
+# Unique visitors are counted with per-link, per-day HyperLogLog sketches of
+# 2**HLL_PRECISION bytes. Changing the precision invalidates stored sketches.
+HLL_PRECISION = int(os.environ.get("HLL_PRECISION", "11"))
+VISITOR_HASH_SALT = os.environ.get("VISITOR_HASH_SALT", "")
+
+# Analytics filtering. BOT_FILTER is "drop" (bot clicks are discarded),
+# "tag" (archived with is_bot set but not counted as visits) or "off".
+BOT_FILTER = os.environ.get("BOT_FILTER", "drop").lower()
+# Idempotency keys of recently processed clicks kept per container; the
+# url_visits primary key catches whatever falls outside this window.
+CLICK_DEDUPE_TTL = float(os.environ.get("CLICK_DEDUPE_TTL", "3600"))
+CLICK_DEDUPE_MAX_SIZE = int(os.environ.get("CLICK_DEDUPE_MAX_SIZE", "100000"))
+
+# Hot-link snapshot: analytics tracks the most clicked slugs over the last
+# HOT_SET_WINDOW seconds and republishes the top HOT_SET_SIZE every
+# HOT_SET_PUBLISH_INTERVAL seconds; new public containers prefill from it.
+HOT_SET_CAPACITY = int(os.environ.get("HOT_SET_CAPACITY", "1000"))
+HOT_SET_SIZE = int(os.environ.get("HOT_SET_SIZE", "500"))
+HOT_SET_WINDOW = float(os.environ.get("HOT_SET_WINDOW", "900"))
+HOT_SET_PUBLISH_INTERVAL = float(os.environ.get("HOT_SET_PUBLISH_INTERVAL", "60"))
+HOT_SET_PREFILL = os.environ.get("HOT_SET_PREFILL", "true").lower() == "true"
@@ -0,0 +1,62 @@
+import uuid
+from utils.db import run_query_fetchrow
+
+JOB_COLUMNS = "id, user_id, format, slug, status, attempts, object_key, rows, error, created_at, finished_at"
+
+
+async def create_export_job(user_id, fmt, slug=None):
+    return await run_query_fetchrow(
+        f"""
+        INSERT INTO export_jobs (id, user_id, format, slug)
+        VALUES ($1, $2, $3, $4)
+        RETURNING {JOB_COLUMNS}
+        """,
+        uuid.uuid4(), user_id, fmt, slug
+    )
+
+
+async def get_export_job(job_id, user_id):
+    return await run_query_fetchrow(
+        f"SELECT {JOB_COLUMNS} FROM export_jobs WHERE id = $1 AND user_id = $2",
+        job_id, user_id
+    )
+
+
+async def start_export_job(job_id):
+    """
+    Claim a queued job, or one whose previous run died mid-way (the message
+    was redelivered), and count the attempt. Returns None for finished jobs.
+    """
+    return await run_query_fetchrow(
+        f"""
+        UPDATE export_jobs
+        SET status = 'running', attempts = attempts + 1
+        WHERE id = $1 AND status IN ('queued', 'running')
+        RETURNING {JOB_COLUMNS}
+        """,
+        job_id
+    )
+
+
+async def finish_export_job(job_id, object_key, rows):
+    return await run_query_fetchrow(
+        f"""
+        UPDATE export_jobs
+        SET status = 'done', object_key = $2, rows = $3, error = NULL, finished_at = NOW()
+        WHERE id = $1
+        RETURNING {JOB_COLUMNS}
+        """,
+        job_id, object_key, rows
+    )
+
+
+async def fail_export_job(job_id, error):
+    return await run_query_fetchrow(
+        f"""
+        UPDATE export_jobs
+        SET status = 'failed', error = $2, finished_at = NOW()
+        WHERE id = $1
+        RETURNING {JOB_COLUMNS}
+        """,
+        job_id, error
+    )
@@ -0,0 +1,137 @@
+from datetime import date
+from utils.db import run_query_fetch, run_query_fetchrow, run_query_execute
+
+
+async def ensure_visit_partitions(months_ahead=3):
+    """Create any missing monthly url_visits partitions up to months_ahead."""
+    rows = await run_query_fetch(
+        "SELECT create_url_visit_partitions($1, $2) AS name",
+        date.today(), months_ahead
+    )
+    return [row["name"] for row in rows]
+
+
+async def detach_expired_visit_partitions(cutoff, drop_detached=False):
+    """Detach (and optionally drop) url_visits partitions ending before cutoff."""
+    rows = await run_query_fetch(
+        "SELECT detach_url_visit_partitions($1, $2) AS name",
+        cutoff, drop_detached
+    )
+    return [row["name"] for row in rows]
+
+
+async def get_visits_before(cutoff, batch_size, after=None):
+    """
+    One batch of visits older than `cutoff` in primary key order, starting
+    after the (id, visit_time) key `after`.
+    """
+    after_id, after_time = after or (None, None)
+    return await run_query_fetch(
+        """
+        SELECT id, shortened_url_id, visit_time
+        FROM url_visits
+        WHERE visit_time < $1
+        AND ($2::uuid IS NULL OR (id, visit_time) > ($2::uuid, $3::timestamp))
+        ORDER BY id, visit_time
+        LIMIT $4
+        """,
+        cutoff, after_id, after_time, batch_size
+    )
+
+
+async def delete_visits(visits):
+    """Delete url_visits rows by primary key. Returns the number deleted."""
+    result = await run_query_execute(
+        """
+        DELETE FROM url_visits
+        WHERE (id, visit_time) IN (
+            SELECT * FROM unnest($1::uuid[], $2::timestamp[])
+        )
+        """,
+        [visit["id"] for visit in visits], [visit["visit_time"] for visit in visits]
+    )
+    return int(result.split()[-1])
+
+
+async def get_tombstoned_links(limit=100):
+    return await run_query_fetch(
+        """
+        SELECT id, slug
+        FROM shortened_urls
+        WHERE deleted_at IS NOT NULL
+        ORDER BY deleted_at
+        LIMIT $1
+        """,
+        limit
+    )
+
+
+async def delete_link_visits(url_id, batch_size):
+    """Delete up to `batch_size` of a link's visits. Returns the number deleted."""
+    result = await run_query_execute(
+        """
+        DELETE FROM url_visits
+        WHERE (id, visit_time) IN (
+            SELECT id, visit_time FROM url_visits
+            WHERE shortened_url_id = $1
+            ORDER BY visit_time, id
+            LIMIT $2
+        )
+        """,
+        url_id, batch_size
+    )
+    return int(result.split()[-1])
+
+
+async def delete_tombstoned_link(url_id):
+    """Remove a tombstoned link once it has no visits left."""
+    return await run_query_fetchrow(
+        """
+        DELETE FROM shortened_urls
+        WHERE id = $1 AND deleted_at IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM url_visits WHERE shortened_url_id = $1)
+        RETURNING id, slug
+        """,
+        url_id
+    )
+
+
+async def purge_slug_invalidations(max_age_hours=24):
+    """
+    Drop slug invalidation stamps older than any public cache entry can be.
+    Returns the number of rows deleted.
+    """
+    result = await run_query_execute(
+        """
+        DELETE FROM slug_invalidations
+        WHERE invalidated_at < NOW() - make_interval(hours => $1)
+        """,
+        max_age_hours
+    )
+    return int(result.split()[-1])
+
+
+async def sweep_expired_refresh_tokens(batch_size=1000, max_batches=100):
+    """
+    Delete expired refresh tokens in bounded chunks so no single statement
+    holds locks for long. Returns the number of rows deleted.
+    """
+    deleted = 0
+    for _ in range(max_batches):
+        result = await run_query_execute(
+            """
+            DELETE FROM refresh_tokens
+            WHERE token_hash IN (
+                SELECT token_hash FROM refresh_tokens
+                WHERE expires_at <= NOW()
+                LIMIT $1
+                FOR UPDATE SKIP LOCKED
+            )
+            """,
+            batch_size
+        )
+        count = int(result.split()[-1])
+        deleted += count
+        if count < batch_size:
+            break
+    return deleted
@@ -1,128 +1,514 @@
+import asyncpg
 import uuid
-from utils.db import run_query_fetch, run_query_fetchrow, run_query_execute
+from datetime import datetime
+from utils.config import URL_SYNC_DELETE_MAX_VISITS
+from utils.db import run_query_fetch, run_query_fetchrow, transaction
 
 
-async def create_short_url_record(slug, url, user_id):
+async def create_short_url_record(slug, url, user_id, url_hash=None):
+    """
+    Returns None instead of raising when the slug is already taken.
+
+    With `url_hash`, a link the user already has for the same canonical URL
+    is returned instead (flagged `existed`) when the user has dedupe_urls
+    enabled; lookup and insert happen in one statement.
+    """
     short_id = str(uuid.uuid4())
+    if url_hash is None:
+        return await run_query_fetchrow(
+            """
+            INSERT INTO shortened_urls (id, slug, url, user_id)
+            VALUES ($1, $2, $3, $4)
+            ON CONFLICT (slug) DO NOTHING
+            RETURNING id, slug, url, user_id
+            """,
+            short_id, slug, url, user_id
+        )
+
     return await run_query_fetchrow(
         """
-        INSERT INTO shortened_urls (id, slug, url, user_id)
-        VALUES ($1, $2, $3, $4)
-        RETURNING id, slug, url, user_id
+        WITH owner AS (
+            SELECT dedupe_urls FROM users WHERE id = $4
+        ), existing AS (
+            SELECT id, slug, url, user_id
+            FROM shortened_urls
+            WHERE user_id = $4 AND url_hash = $5 AND (SELECT dedupe_urls FROM owner)
+        ), inserted AS (
+            INSERT INTO shortened_urls (id, slug, url, user_id, url_hash)
+            SELECT $1, $2, $3, $4, CASE WHEN (SELECT dedupe_urls FROM owner) THEN $5::bytea END
+            WHERE NOT EXISTS (SELECT 1 FROM existing)
+            ON CONFLICT DO NOTHING
+            RETURNING id, slug, url, user_id
+        )
+        SELECT *, TRUE AS existed FROM existing
+        UNION ALL
+        SELECT *, FALSE AS existed FROM inserted
         """,
-        short_id, slug, url, user_id
+        short_id, slug, url, user_id, url_hash
     )
 
+async def reserve_slug_ids(count=1):
+    """Reserve enough slug_id_seq blocks for `count` ids in one round trip."""
+    rows = await run_query_fetch(
+        """
+        SELECT nextval('slug_id_seq') AS first_id, seq.increment_by AS block_size
+        FROM pg_sequences AS seq,
+        generate_series(1, CEIL($1::numeric / seq.increment_by)::int)
+        WHERE seq.schemaname = current_schema() AND seq.sequencename = 'slug_id_seq'
+        """,
+        count
+    )
+    return [(row["first_id"], row["block_size"]) for row in rows]
+
+async def create_short_url_records(items, user_id, chunk_size=5000):
+    """
+    Insert many (slug, url, url_hash) items in one transaction with
+    multi-row statements. Slugs that are already taken are skipped. As in
+    create_short_url_record, an item whose url_hash matches one of the
+    user's links is answered with that link instead when the user has
+    dedupe_urls enabled; items should carry distinct hashes.
+
+    Returns one row per resolved item: the `requested_slug` it was sent
+    with, the link's id and slug, and an `existed` flag.
+    """
+    created = []
+    async with transaction() as conn:
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            rows = await conn.fetch(
+                """
+                WITH input AS (
+                    SELECT * FROM unnest($1::uuid[], $2::text[], $3::text[], $5::bytea[])
+                    AS t(id, slug, url, url_hash)
+                ), owner AS (
+                    SELECT dedupe_urls FROM users WHERE id = $4
+                ), existing AS (
+                    SELECT input.slug AS requested_slug, urls.id, urls.slug
+                    FROM input
+                    JOIN shortened_urls AS urls ON urls.user_id = $4 AND urls.url_hash = input.url_hash
+                    WHERE (SELECT dedupe_urls FROM owner)
+                ), inserted AS (
+                    INSERT INTO shortened_urls (id, slug, url, user_id, url_hash)
+                    SELECT input.id, input.slug, input.url, $4,
+                        CASE WHEN (SELECT dedupe_urls FROM owner) THEN input.url_hash END
+                    FROM input
+                    WHERE input.slug NOT IN (SELECT requested_slug FROM existing)
+                    ON CONFLICT DO NOTHING
+                    RETURNING id, slug
+                )
+                SELECT slug AS requested_slug, id, slug, FALSE AS existed FROM inserted
+                UNION ALL
+                SELECT requested_slug, id, slug, TRUE AS existed FROM existing
+                """,
+                [uuid.uuid4() for _ in chunk],
+                [slug for slug, _, _ in chunk],
+                [url for _, url, _ in chunk],
+                user_id,
+                [url_hash for _, _, url_hash in chunk],
+            )
+            created.extend(dict(row) for row in rows)
+    return created
 
-async def list_short_urls(user_id):
+# Keyset listings run the first page and later pages as two statements. A
+# single "$n IS NULL OR (...) > (...)" predicate gets a generic plan once
+# the statement is cached, and that plan cannot seek the index to the
+# cursor. The keyset arguments are always the last two placeholders, after
+# the statement's own parameters.
+
+def keyset_args(after):
+    return tuple(after) if after[0] is not None else ()
+
+async def list_short_urls(user_id, limit=None, after=(None, None)):
+    """Keyset page of the user's links ordered by (created_at, id)."""
     return await run_query_fetch(
+        f"""
+        SELECT id, slug, url, user_id, created_at
+        FROM shortened_urls
+        WHERE user_id = $1 AND deleted_at IS NULL
+        {"AND (created_at, id) > ($3::timestamp, $4::uuid)" if after[0] is not None else ""}
+        ORDER BY created_at, id
+        LIMIT $2
+        """,
+        user_id, limit, *keyset_args(after)
+    )
+
+async def get_short_url_record(slug):
+    return await run_query_fetchrow(
         """
         SELECT id, slug, url, user_id
         FROM shortened_urls
-        WHERE user_id = $1
+        WHERE slug = $1 AND deleted_at IS NULL
         """,
-        user_id
+        slug
     )
 
-async def get_short_url_record(long_url=None, slug=None):
-    if slug:
-        return await run_query_fetchrow(
-            """
-            SELECT id, slug, url, user_id
-            FROM shortened_urls
-            WHERE slug = $1
-            """,
-            slug
-        )
-    
-    if long_url:
-        return await run_query_fetchrow(
+async def update_short_url(slug, user_id, new_url=None, new_slug=None, new_url_hash=None):
+    """
+    Point the user's link at `new_url` and/or rename it to `new_slug` in one
+    statement: the ownership check, the slug conflict check, the update and
+    the cache invalidation stamp all happen together.
+
+    When the URL changes, `new_url_hash` replaces the link's url_hash so it
+    keeps deduplicating, unless another of the user's links already holds
+    that hash; a rename alone keeps the current hash.
+
+    Returns {"status": "updated" | "unchanged" | "conflict" | "not_found",
+    "record": {...} | None}.
+    """
+    try:
+        row = await run_query_fetchrow(
             """
-            SELECT id, slug, url, user_id
-            FROM shortened_urls
-            WHERE url = $1
+            WITH target AS (
+                SELECT id, slug, url, user_id
+                FROM shortened_urls
+                WHERE slug = $1 AND user_id = $2 AND deleted_at IS NULL
+                FOR UPDATE
+            ), conflict AS (
+                SELECT 1 FROM shortened_urls
+                WHERE $4::text IS NOT NULL AND slug = $4 AND slug <> $1
+            ), updated AS (
+                UPDATE shortened_urls AS urls
+                SET url = COALESCE($3, urls.url),
+                    slug = COALESCE($4, urls.slug),
+                    url_hash = CASE
+                        WHEN urls.url IS NOT DISTINCT FROM COALESCE($3, urls.url) THEN urls.url_hash
+                        WHEN NOT EXISTS (
+                            SELECT 1 FROM shortened_urls AS other
+                            WHERE other.user_id = $2 AND other.url_hash = $5 AND other.id <> urls.id
+                        ) THEN $5::bytea
+                    END
+                FROM target
+                WHERE urls.id = target.id
+                AND NOT EXISTS (SELECT 1 FROM conflict)
+                AND (urls.url IS DISTINCT FROM COALESCE($3, urls.url) OR urls.slug <> COALESCE($4, urls.slug))
+                RETURNING urls.id, urls.slug, urls.url, urls.user_id
+            ), stamped AS (
+                INSERT INTO slug_invalidations (slug, invalidated_at)
+                SELECT DISTINCT changed.slug, clock_timestamp()
+                FROM updated, unnest(ARRAY[$1::text, updated.slug]) AS changed(slug)
+                ON CONFLICT (slug) DO UPDATE SET invalidated_at = EXCLUDED.invalidated_at
+            )
+            SELECT
+                CASE
+                    WHEN target.id IS NULL THEN 'not_found'
+                    WHEN EXISTS (SELECT 1 FROM conflict) THEN 'conflict'
+                    WHEN updated.id IS NULL THEN 'unchanged'
+                    ELSE 'updated'
+                END AS status,
+                COALESCE(updated.id, target.id) AS id,
+                COALESCE(updated.slug, target.slug) AS slug,
+                COALESCE(updated.url, target.url) AS url,
+                COALESCE(updated.user_id, target.user_id) AS user_id
+            FROM (SELECT 1) AS one
+            LEFT JOIN target ON TRUE
+            LEFT JOIN updated ON TRUE
             """,
-            long_url
+            slug, user_id, new_url, new_slug, new_url_hash
         )
+    except asyncpg.UniqueViolationError as e:
+        if new_url_hash is not None and e.constraint_name == "shortened_urls_user_id_url_hash_key":
+            # A concurrent create took the hash; the other link keeps it.
+            return await update_short_url(slug, user_id, new_url, new_slug)
+        # Another request took new_slug between our check and the update.
+        return {"status": "conflict", "record": None}
 
-async def update_long_url(slug, new_url, new_slug=None):
-    if new_slug:
-        return await run_query_fetchrow(
-            """
+    status = row.pop("status")
+    return {"status": status, "record": row if row["id"] else None}
+
+async def delete_short_url(slug, user_id, max_sync_visits=URL_SYNC_DELETE_MAX_VISITS):
+    """
+    Delete the user's link and stamp the slug for cache invalidation, in one
+    statement. Links with at most `max_sync_visits` visits are removed on
+    the spot, raw visits included (rollups follow via ON DELETE CASCADE).
+    Busier links are only tombstoned (deleted_at set) and their visits are
+    removed in bounded batches by the maintenance job.
+
+    Returns the link with a `tombstoned` flag, or None.
+    """
+    return await run_query_fetchrow(
+        """
+        WITH target AS (
+            SELECT urls.id, COALESCE(totals.visits, 0) > $3 AS busy
+            FROM shortened_urls AS urls
+            LEFT JOIN url_visit_totals AS totals ON totals.shortened_url_id = urls.id
+            WHERE urls.slug = $1 AND urls.user_id = $2 AND urls.deleted_at IS NULL
+            FOR UPDATE OF urls
+        ), tombstoned AS (
             UPDATE shortened_urls
-            SET url = $1, slug = $2
-            WHERE slug = $3
+            SET deleted_at = NOW(), url_hash = NULL
+            WHERE id IN (SELECT id FROM target WHERE busy)
             RETURNING id, slug, url, user_id
-            """,
-            new_url, new_slug, slug
-        )
-    else:
-        return await run_query_fetchrow(
-            """
-            UPDATE shortened_urls
-            SET url = $1
-            WHERE slug = $2
+        ), deleted AS (
+            DELETE FROM shortened_urls
+            WHERE id IN (SELECT id FROM target WHERE NOT busy)
             RETURNING id, slug, url, user_id
-            """,
-            new_url, slug
+        ), visits AS (
+            DELETE FROM url_visits
+            WHERE shortened_url_id IN (SELECT id FROM deleted)
+        ), removed AS (
+            SELECT *, TRUE AS tombstoned FROM tombstoned
+            UNION ALL
+            SELECT *, FALSE AS tombstoned FROM deleted
+        ), stamped AS (
+            INSERT INTO slug_invalidations (slug, invalidated_at)
+            SELECT slug, clock_timestamp() FROM removed
+            ON CONFLICT (slug) DO UPDATE SET invalidated_at = EXCLUDED.invalidated_at
         )
+        SELECT id, slug, url, user_id, tombstoned FROM removed
+        """,
+        slug, user_id, max_sync_visits
+    )
 
-async def delete_short_url(slug):
-    short_url = await get_short_url_record(slug=slug)
-    if not short_url:
-        return None
-    
-    await run_query_execute(
+async def create_url_visit(slug, visit_time=None):
+    """Record one visit by slug, rollups included, in a single statement."""
+    row = await run_query_fetchrow(
         """
-        DELETE FROM url_visits
-        WHERE shortened_url_id = $1
+        WITH visit AS (
+            INSERT INTO url_visits (id, shortened_url_id, user_id, visit_time)
+            SELECT $2, id, user_id, $3 FROM shortened_urls WHERE slug = $1 AND deleted_at IS NULL
+            RETURNING shortened_url_id, visit_time
+        ), hourly AS (
+            INSERT INTO url_visit_counts_hourly (shortened_url_id, bucket, visits)
+            SELECT shortened_url_id, date_trunc('hour', visit_time), 1 FROM visit
+            ON CONFLICT (shortened_url_id, bucket)
+            DO UPDATE SET visits = url_visit_counts_hourly.visits + 1
+        ), daily AS (
+            INSERT INTO url_visit_counts_daily (shortened_url_id, bucket, visits)
+            SELECT shortened_url_id, visit_time::date, 1 FROM visit
+            ON CONFLICT (shortened_url_id, bucket)
+            DO UPDATE SET visits = url_visit_counts_daily.visits + 1
+        ), totals AS (
+            INSERT INTO url_visit_totals (shortened_url_id, visits, last_visit_at)
+            SELECT shortened_url_id, 1, visit_time FROM visit
+            ON CONFLICT (shortened_url_id) DO UPDATE
+            SET visits = url_visit_totals.visits + 1,
+                last_visit_at = GREATEST(url_visit_totals.last_visit_at, EXCLUDED.last_visit_at)
+        )
+        SELECT shortened_url_id FROM visit
         """,
-        short_url["id"]
+        slug, uuid.uuid4(), visit_time or datetime.utcnow()
     )
-    
-    deleted_url = await run_query_fetchrow(
+    if not row:
+        raise ValueError("Shortened URL not found")
+    return row
+
+async def get_short_url_ids(slugs):
+    rows = await run_query_fetch(
         """
-        DELETE FROM shortened_urls
-        WHERE slug = $1
-        RETURNING id, slug, url, user_id
+        SELECT id, slug
+        FROM shortened_urls
+        WHERE slug = ANY($1::text[]) AND deleted_at IS NULL
         """,
-        slug
+        list(set(slugs))
     )
-    return deleted_url
+    return {row["slug"]: row["id"] for row in rows}
 
-async def create_url_visit(slug):
-    shortened_url = await get_short_url_record(slug=slug)
-    if not shortened_url:
-        raise ValueError("Shortened URL not found")
-    
-    return await run_query_execute(
+async def get_short_url_targets(slugs):
+    """Current {"id", "url"} of each live slug, keyed by slug."""
+    rows = await run_query_fetch(
         """
-        INSERT INTO url_visits (id, shortened_url_id, visit_time)
-        VALUES ($1, $2, NOW())
+        SELECT id, slug, url
+        FROM shortened_urls
+        WHERE slug = ANY($1::text[]) AND deleted_at IS NULL
         """,
-        str(uuid.uuid4()), shortened_url["id"]
+        list(set(slugs))
     )
+    return {row["slug"]: {"id": str(row["id"]), "url": row["url"]} for row in rows}
+
+async def create_url_visits(visits, sketches=None):
+    """
+    Insert (id, shortened_url_id, visit_time) visits, stamped with the link
+    owner's user_id, and bump the hourly, daily and total rollups from the
+    rows actually inserted, in one statement. Ids derived from the click's
+    idempotency key make redelivered clicks collide on the primary key and
+    get skipped, so they are neither stored nor counted twice. Rollup rows
+    are upserted in key order so concurrent batches lock them in the same
+    order instead of deadlocking. Returns the number of visits inserted.
+
+    `sketches` maps (shortened_url_id, date) to a serialized HyperLogLog of
+    the batch's visitors; each is merged into the stored daily sketch in
+    the same transaction, also in key order.
+    """
+    async with transaction() as conn:
+        inserted = await conn.fetchval(
+            """
+            WITH inserted AS (
+                INSERT INTO url_visits (id, shortened_url_id, user_id, visit_time)
+                SELECT batch.id, batch.shortened_url_id, urls.user_id, batch.visit_time
+                FROM unnest($1::uuid[], $2::uuid[], $3::timestamp[]) AS batch (id, shortened_url_id, visit_time)
+                JOIN shortened_urls AS urls ON urls.id = batch.shortened_url_id
+                ON CONFLICT DO NOTHING
+                RETURNING shortened_url_id, visit_time
+            ), increments AS (
+                SELECT shortened_url_id, date_trunc('hour', visit_time) AS bucket,
+                    COUNT(*) AS visits, MAX(visit_time) AS last_visit_at
+                FROM inserted
+                GROUP BY 1, 2
+            ), hourly AS (
+                INSERT INTO url_visit_counts_hourly (shortened_url_id, bucket, visits)
+                SELECT shortened_url_id, bucket, visits FROM increments
+                ORDER BY shortened_url_id, bucket
+                ON CONFLICT (shortened_url_id, bucket)
+                DO UPDATE SET visits = url_visit_counts_hourly.visits + EXCLUDED.visits
+            ), daily AS (
+                INSERT INTO url_visit_counts_daily (shortened_url_id, bucket, visits)
+                SELECT shortened_url_id, bucket::date, SUM(visits) FROM increments
+                GROUP BY 1, 2
+                ORDER BY 1, 2
+                ON CONFLICT (shortened_url_id, bucket)
+                DO UPDATE SET visits = url_visit_counts_daily.visits + EXCLUDED.visits
+            ), totals AS (
+                INSERT INTO url_visit_totals (shortened_url_id, visits, last_visit_at)
+                SELECT shortened_url_id, SUM(visits), MAX(last_visit_at) FROM increments
+                GROUP BY 1
+                ORDER BY 1
+                ON CONFLICT (shortened_url_id) DO UPDATE
+                SET visits = url_visit_totals.visits + EXCLUDED.visits,
+                    last_visit_at = GREATEST(url_visit_totals.last_visit_at, EXCLUDED.last_visit_at)
+            )
+            SELECT COUNT(*) FROM inserted
+            """,
+            [visit_id for visit_id, _, _ in visits],
+            [url_id for _, url_id, _ in visits],
+            [visit_time for _, _, visit_time in visits]
+        )
+        if sketches:
+            keys = sorted(sketches)
+            await conn.execute(
+                """
+                INSERT INTO url_visitor_sketches_daily (shortened_url_id, bucket, sketch)
+                SELECT * FROM unnest($1::uuid[], $2::date[], $3::bytea[])
+                ON CONFLICT (shortened_url_id, bucket)
+                DO UPDATE SET sketch = hll_merge(url_visitor_sketches_daily.sketch, EXCLUDED.sketch)
+                """,
+                [url_id for url_id, _ in keys], [day for _, day in keys], [sketches[key] for key in keys]
+            )
+    return inserted
 
-async def get_url_visits(slug):
-    shortened_url = await get_short_url_record(slug=slug)
-    if not shortened_url:
+async def get_url_visits(slug, user_id, limit=None, after=(None, None)):
+    """
+    Keyset page of visits for one of the user's links. The link lookup and
+    ownership check ride along in the same query; raises ValueError when
+    the user has no such link.
+    """
+    rows = await run_query_fetch(
+        f"""
+        SELECT urls.id AS url_id, visits.id, visits.shortened_url_id, visits.visit_time
+        FROM shortened_urls AS urls
+        LEFT JOIN LATERAL (
+            SELECT id, shortened_url_id, visit_time
+            FROM url_visits
+            WHERE shortened_url_id = urls.id
+            {"AND (visit_time, id) > ($4::timestamp, $5::uuid)" if after[0] is not None else ""}
+            ORDER BY visit_time, id
+            LIMIT $3
+        ) AS visits ON TRUE
+        WHERE urls.slug = $1 AND urls.user_id = $2 AND urls.deleted_at IS NULL
+        """,
+        slug, user_id, limit, *keyset_args(after)
+    )
+    if not rows:
         raise ValueError("Shortened URL not found")
-    
+    for row in rows:
+        del row["url_id"]
+    return [row for row in rows if row["id"] is not None]
+
+async def get_url_visits_by_user(user_id, limit=None, after=(None, None)):
+    """
+    Keyset page of visits across all of the user's links, served in order
+    by the (user_id, visit_time, id) index on url_visits.
+    """
+    return await run_query_fetch(
+        f"""
+        SELECT visits.id, visits.shortened_url_id, visits.visit_time
+        FROM url_visits AS visits
+        JOIN shortened_urls AS urls ON visits.shortened_url_id = urls.id
+        WHERE visits.user_id = $1 AND urls.deleted_at IS NULL
+        {"AND (visits.visit_time, visits.id) > ($3::timestamp, $4::uuid)" if after[0] is not None else ""}
+        ORDER BY visits.visit_time, visits.id
+        LIMIT $2
+        """,
+        user_id, limit, *keyset_args(after)
+    )
+
+async def stream_url_visits(user_id, slug=None, prefetch=1000):
+    """
+    Yield the user's visits (optionally for one slug) oldest first through a
+    server-side cursor, fetching `prefetch` rows per round trip. The
+    connection stays checked out until the generator is exhausted or closed.
+    """
+    async with transaction() as conn:
+        async for record in conn.cursor(
+            """
+            SELECT visits.id, urls.slug, visits.shortened_url_id, visits.visit_time
+            FROM url_visits AS visits
+            JOIN shortened_urls AS urls ON visits.shortened_url_id = urls.id
+            WHERE visits.user_id = $1 AND urls.deleted_at IS NULL AND ($2::text IS NULL OR urls.slug = $2)
+            ORDER BY visits.visit_time, visits.id
+            """,
+            user_id, slug, prefetch=prefetch
+        ):
+            yield record
+
+async def get_slug_invalidations(since=None):
+    """
+    Returns the database clock and the slugs stamped after `since`. The
+    window overlaps by a few seconds so stamps from transactions that
+    committed late are not missed.
+    """
+    return await run_query_fetchrow(
+        """
+        SELECT LOCALTIMESTAMP AS now, ARRAY(
+            SELECT slug FROM slug_invalidations
+            WHERE $1::timestamp IS NOT NULL
+            AND invalidated_at > $1::timestamp - INTERVAL '5 seconds'
+        ) AS slugs
+        """,
+        since
+    )
+
+VISIT_ROLLUP_TABLES = {
+    "hour": "url_visit_counts_hourly",
+    "day": "url_visit_counts_daily",
+}
+
+async def get_url_visit_counts(slug, user_id, granularity, start, end):
+    """Time-bucketed visit counts for one of the user's links, [start, end)."""
+    table = VISIT_ROLLUP_TABLES[granularity]
+    return await run_query_fetch(
+        f"""
+        SELECT counts.bucket, counts.visits
+        FROM {table} AS counts
+        JOIN shortened_urls AS urls ON urls.id = counts.shortened_url_id
+        WHERE urls.slug = $1 AND urls.user_id = $2 AND urls.deleted_at IS NULL
+        AND counts.bucket >= $3::timestamp AND counts.bucket < $4::timestamp
+        ORDER BY counts.bucket
+        """,
+        slug, user_id, start, end
+    )
+
+async def get_url_visitor_sketches(slug, user_id, start, end):
+    """Daily visitor sketches for one of the user's links, [start, end)."""
     return await run_query_fetch(
         """
-        SELECT id, shortened_url_id, visit_time
-        FROM url_visits
-        WHERE shortened_url_id = $1
+        SELECT sketches.bucket, sketches.sketch
+        FROM url_visitor_sketches_daily AS sketches
+        JOIN shortened_urls AS urls ON urls.id = sketches.shortened_url_id
+        WHERE urls.slug = $1 AND urls.user_id = $2 AND urls.deleted_at IS NULL
+        AND sketches.bucket >= $3::date AND sketches.bucket < $4::date
+        ORDER BY sketches.bucket
         """,
-        shortened_url["id"]
+        slug, user_id, start, end
     )
 
-async def get_url_visits_by_user(user_id):
+async def get_url_visit_totals(user_id, slug=None):
     return await run_query_fetch(
         """
-        SELECT visits.* FROM url_visits AS visits LEFT JOIN shortened_urls AS urls
-        ON visits.shortened_url_id = urls.id
-        WHERE urls.user_id = $1
+        SELECT urls.id, urls.slug, COALESCE(totals.visits, 0) AS visits, totals.last_visit_at
+        FROM shortened_urls AS urls
+        LEFT JOIN url_visit_totals AS totals ON totals.shortened_url_id = urls.id
+        WHERE urls.user_id = $1 AND urls.deleted_at IS NULL AND ($2::text IS NULL OR urls.slug = $2)
         """,
-        user_id
-    )
\ No newline at end of file
+        user_id, slug
+    )
+
@@ -1,4 +1,4 @@
-from ..db import run_query_fetchrow
+from ..db import run_query_fetchrow, run_query_execute
 
 import uuid
 
@@ -21,3 +21,20 @@ async def create_user(user_data):
     """, unique_id, user_data['email'], user_data['password_hash'],
          user_data['salt'], user_data['created_at'])
     return row['id']
+
+async def get_user_settings(user_id):
+    return await run_query_fetchrow(
+        "SELECT dedupe_urls FROM users WHERE id = $1", user_id
+    )
+
+async def update_user_settings(user_id, dedupe_urls):
+    return await run_query_fetchrow(
+        "UPDATE users SET dedupe_urls = $2 WHERE id = $1 RETURNING dedupe_urls",
+        user_id, dedupe_urls
+    )
+
+async def update_password_hash(user_id, password_hash):
+    return await run_query_execute(
+        "UPDATE users SET password_hash = $2, salt = '' WHERE id = $1",
+        user_id, password_hash
+    )
@@ -1,35 +1,122 @@
+import asyncio
 import asyncpg
 import os
+import time
+from contextlib import asynccontextmanager
+from utils import instrumentation
+from utils.config import (
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MAX_IDLE,
+    DB_PING_AFTER,
+)
 
+# One event loop and one pool per warm Lambda container. Both are created
+# lazily and survive between invocations as long as the container does.
+_loop = None
+_pool = None
+_last_used = 0.0
 
-async def get_db_conn():
-    return await asyncpg.connect(
-        user=os.environ.get('DB_USER'),
-        password=os.environ.get('DB_PASSWORD'),
-        database=os.environ.get('DB_NAME'),
-        host=os.environ.get('DB_HOST'),
-        port=os.environ.get('DB_PORT')
-    )
 
-async def run_query_fetch(query, *args):
-    conn = await get_db_conn()
+def get_event_loop():
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def run_in_loop(coro):
+    """
+    Drop-in replacement for asyncio.run() that keeps the loop (and with it
+    the connection pool) alive for the next invocation.
+    """
+    return get_event_loop().run_until_complete(coro)
+
+
+def drain_loop():
+    """Run callbacks still queued on the loop (e.g. asyncpg query loggers)."""
+    run_in_loop(asyncio.sleep(0))
+
+
+async def get_pool():
+    global _pool
+    if _pool is None:
+        with instrumentation.span("pool_create"):
+            _pool = await asyncpg.create_pool(
+                user=os.environ.get('DB_USER'),
+                password=os.environ.get('DB_PASSWORD'),
+                database=os.environ.get('DB_NAME'),
+                host=os.environ.get('DB_HOST'),
+                port=os.environ.get('DB_PORT'),
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=DB_POOL_MAX_IDLE,
+            )
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+async def _is_alive(conn):
     try:
+        await conn.execute("SELECT 1")
+        return True
+    except (asyncpg.PostgresConnectionError, asyncpg.InterfaceError, OSError):
+        return False
+
+
+@asynccontextmanager
+async def connection():
+    """
+    Acquire a pooled connection. If the container sat frozen for longer than
+    DB_PING_AFTER seconds the server may have dropped our sockets, so the
+    connection is pinged first and the pool is recycled when it is dead.
+    """
+    global _last_used
+    pool = await get_pool()
+    with instrumentation.span("connect"):
+        conn = await pool.acquire()
+        if time.monotonic() - _last_used > DB_PING_AFTER and not await _is_alive(conn):
+            await pool.release(conn)
+            await pool.expire_connections()
+            conn = await pool.acquire()
+    logged = instrumentation.ENABLED
+    if logged:
+        conn.add_query_logger(instrumentation.query_logger)
+    try:
+        yield conn
+    finally:
+        _last_used = time.monotonic()
+        if logged:
+            conn.remove_query_logger(instrumentation.query_logger)
+        await pool.release(conn)
+
+
+@asynccontextmanager
+async def transaction():
+    async with connection() as conn:
+        async with conn.transaction():
+            yield conn
+
+
+async def run_query_fetch(query, *args):
+    async with connection() as conn:
         rows = await conn.fetch(query, *args)
+        instrumentation.add_rows(query, len(rows))
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 async def run_query_fetchrow(query, *args):
-    conn = await get_db_conn()
-    try:
+    async with connection() as conn:
         row = await conn.fetchrow(query, *args)
+        instrumentation.add_rows(query, 1 if row else 0)
         return dict(row) if row else None
-    finally:
-        await conn.close()
 
 async def run_query_execute(query, *args):
-    conn = await get_db_conn()
-    try:
+    async with connection() as conn:
         return await conn.execute(query, *args)
-    finally:
-        await conn.close()
@@ -0,0 +1,179 @@
+import boto3
+import json
+import time
+import uuid
+from botocore.config import Config
+from collections import deque
+from utils.config import CLICK_FLUSH_AGE, CLICK_MAX_AGE, CLICK_PUT_TIMEOUT
+
+# EventBridge rejects PutEvents calls with more than ten entries.
+MAX_BATCH_SIZE = 10
+
+
+class EventBridgeSink:
+    """
+    PutEvents with a single attempt bounded by `timeout` seconds: half for
+    the connect and half for the response. A stalled call must not hold the
+    redirect; the emitter keeps the entries and retries on a later flush.
+    """
+
+    def __init__(self, client=None, timeout=CLICK_PUT_TIMEOUT):
+        self._client = client
+        self.timeout = timeout
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client("events", config=Config(
+                connect_timeout=self.timeout / 2,
+                read_timeout=self.timeout / 2,
+                retries={"total_max_attempts": 1},
+            ))
+        return self._client
+
+    def put_events(self, entries):
+        return self.client.put_events(Entries=entries)
+
+
+class LocalSink:
+    """
+    In-memory stand-in for EventBridge. Mirrors the PutEvents response shape
+    and can be told to fail the next N entries to exercise retries.
+    """
+
+    def __init__(self, fail_next=0, on_event=None):
+        self.events = []
+        self.calls = 0
+        self.fail_next = fail_next
+        self.on_event = on_event
+
+    def put_events(self, entries):
+        self.calls += 1
+        results = []
+        for entry in entries:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                results.append({"ErrorCode": "InternalFailure", "ErrorMessage": "injected failure"})
+                continue
+            self.events.append(entry)
+            if self.on_event:
+                self.on_event(entry)
+            results.append({"EventId": str(uuid.uuid4())})
+        failed = sum(1 for result in results if "ErrorCode" in result)
+        return {"FailedEntryCount": failed, "Entries": results}
+
+
+class ClickEmitter:
+    """
+    Buffers events in memory and publishes them in PutEvents batches.
+    Lambda freezes the container as soon as the handler returns, so nothing
+    can be sent in the background; instead the handler calls flush_due(),
+    which only touches the network once a full batch is queued or the
+    oldest entry is `flush_age` seconds old, so most invocations never wait
+    on EventBridge. A flush is bounded by a short `timeout`, and whatever it
+    did not get to stays queued for a later one. Entries that fail are
+    retried individually up to `max_attempts`, and entries older than
+    `max_age` seconds are dropped rather than reported late.
+
+    Events still queued when the container is reclaimed are lost, which is
+    the trade-off for keeping EventBridge off the redirect path's tail.
+    """
+
+    def __init__(self, sink, event_bus_name, source, detail_type,
+                 batch_size=MAX_BATCH_SIZE, max_queue=1000, max_attempts=3,
+                 max_age=CLICK_MAX_AGE, flush_age=CLICK_FLUSH_AGE, clock=time.monotonic):
+        self.sink = sink
+        self.event_bus_name = event_bus_name
+        self.source = source
+        self.detail_type = detail_type
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.max_attempts = max_attempts
+        self.max_age = max_age
+        self.flush_age = flush_age
+        self._clock = clock
+        self._queue = deque(maxlen=max_queue)
+        self.sent = 0
+        self.dropped = 0
+        self.retried = 0
+        self.expired = 0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def emit(self, detail):
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append((self._entry(detail), 1, self._clock()))
+
+    def due(self):
+        """True once a full batch is queued or the oldest entry is flush_age old."""
+        if len(self._queue) >= self.batch_size:
+            return True
+        return bool(self._queue) and self._queue[0][2] <= self._clock() - self.flush_age
+
+    def flush_due(self, timeout=None):
+        """flush() when due(); otherwise leaves the queue alone."""
+        return self.flush(timeout) if self.due() else len(self._queue)
+
+    def flush(self, timeout=None):
+        """
+        Send queued events until the queue is empty, a batch fails entirely,
+        or `timeout` seconds have passed. A batch is only started when the
+        sink's own timeout fits in what is left, so the deadline holds even
+        for a call that stalls. Returns the number left queued.
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        call_timeout = getattr(self.sink, "timeout", 0)
+        self._expire()
+        while self._queue:
+            if deadline is not None:
+                left = deadline - self._clock()
+                if left <= 0 or left < call_timeout:
+                    break
+            if not self._send(self._next_batch()):
+                # Nothing got through; back off until the next flush.
+                break
+        return len(self._queue)
+
+    def _entry(self, detail):
+        return {
+            "Source": self.source,
+            "DetailType": self.detail_type,
+            "Detail": detail if isinstance(detail, str) else json.dumps(detail),
+            "EventBusName": self.event_bus_name,
+        }
+
+    def _expire(self):
+        horizon = self._clock() - self.max_age
+        while self._queue and self._queue[0][2] < horizon:
+            self._queue.popleft()
+            self.expired += 1
+
+    def _next_batch(self):
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        return batch
+
+    def _send(self, batch):
+        """Publish one batch; returns False when every entry failed."""
+        try:
+            response = self.sink.put_events([entry for entry, _, _ in batch])
+            results = response.get("Entries", [])
+        except Exception as e:
+            print(f"Failed to put events: {e}")
+            results = [{"ErrorCode": type(e).__name__}] * len(batch)
+
+        failed = []
+        for (entry, attempts, queued_at), result in zip(batch, results):
+            if "ErrorCode" not in result:
+                self.sent += 1
+            elif attempts < self.max_attempts:
+                failed.append((entry, attempts + 1, queued_at))
+            else:
+                self.dropped += 1
+
+        if failed:
+            self.retried += len(failed)
+            self._queue.extendleft(reversed(failed))
+        return len(failed) < len(batch)
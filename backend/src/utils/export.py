@@ -0,0 +1,104 @@
+import boto3
+import csv
+import io
+import uuid
+from utils.config import EXPORT_FETCH_SIZE, EXPORT_QUEUE_URL
+from utils.crud.url import stream_url_visits
+from utils.serialization import encode
+
+EXPORT_COLUMNS = ("id", "slug", "shortened_url_id", "visit_time")
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+# Encoded rows are handed to the upload in chunks of about this size.
+CHUNK_SIZE = 256 * 1024
+
+
+def export_key(user_id, fmt):
+    return f"exports/{user_id}/{uuid.uuid4()}.{fmt}"
+
+
+def _row(record):
+    return (
+        str(record["id"]), record["slug"], str(record["shortened_url_id"]),
+        record["visit_time"].isoformat(),
+    )
+
+
+async def write_visits(upload, rows, fmt):
+    """Encode `rows` as CSV or NDJSON into `upload` chunk by chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(EXPORT_COLUMNS)
+
+    count = 0
+    async for record in rows:
+        if writer:
+            writer.writerow(_row(record))
+        else:
+            buffer.write(encode(dict(zip(EXPORT_COLUMNS, _row(record)))))
+            buffer.write("\n")
+        count += 1
+        if buffer.tell() >= CHUNK_SIZE:
+            upload.write(buffer.getvalue().encode("utf-8"))
+            buffer.seek(0)
+            buffer.truncate()
+    upload.write(buffer.getvalue().encode("utf-8"))
+    return count
+
+
+async def export_visits(store, user_id, fmt, slug=None):
+    """
+    Stream the user's visit history into a new object in `store`. Memory use
+    is bounded by the cursor prefetch plus one upload part, independent of
+    the number of rows. Returns {"key", "rows"}.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    key = export_key(user_id, fmt)
+    upload = store.open_upload(key, EXPORT_FORMATS[fmt])
+    try:
+        rows = await write_visits(upload, stream_url_visits(user_id, slug, prefetch=EXPORT_FETCH_SIZE), fmt)
+    except BaseException:
+        upload.abort()
+        raise
+    upload.close()
+    return {"key": key, "rows": rows}
+
+
+class SqsQueue:
+    """Queues export jobs for the export Lambda."""
+
+    def __init__(self, queue_url, client=None):
+        self.queue_url = queue_url
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client("sqs")
+        return self._client
+
+    def send(self, body):
+        return self.client.send_message(QueueUrl=self.queue_url, MessageBody=encode(body))
+
+
+class LocalQueue:
+    """In-memory stand-in for SqsQueue; hands each message to `on_message`."""
+
+    def __init__(self, on_message=None):
+        self.messages = []
+        self.on_message = on_message
+
+    def send(self, body):
+        self.messages.append(body)
+        if self.on_message:
+            self.on_message(encode(body))
+
+
+def create_export_queue():
+    if not EXPORT_QUEUE_URL:
+        raise ValueError("EXPORT_QUEUE_URL environment variable is not set")
+    return SqsQueue(EXPORT_QUEUE_URL)
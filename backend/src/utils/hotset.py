@@ -0,0 +1,108 @@
+import json
+import time
+from datetime import datetime, timedelta
+from utils.config import HOT_SET_CAPACITY, HOT_SET_SIZE, HOT_SET_WINDOW
+
+HOT_SET_KEY = "hot/slugs.json"
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-k counter: at most `capacity` keys are tracked; a new
+    key evicts the current minimum and inherits its count as error bound.
+    Counts are overestimates by at most the key's error.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+
+    def offer(self, key, count=1):
+        if key in self.counts:
+            self.counts[key] += count
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0
+            return
+        victim = min(self.counts, key=self.counts.get)
+        floor = self.counts.pop(victim)
+        del self.errors[victim]
+        self.counts[key] = floor + count
+        self.errors[key] = floor
+
+
+class SlidingHeavyHitters:
+    """
+    Heavy hitters over the last `window` seconds, kept as `slots` Space-Saving
+    counters that each cover window / slots seconds and expire in turn.
+    """
+
+    def __init__(self, capacity=HOT_SET_CAPACITY, window=HOT_SET_WINDOW, slots=6, clock=time.time):
+        self.capacity = capacity
+        self.slot_length = window / slots
+        self.slots = slots
+        self._clock = clock
+        self._counters = {}
+
+    def _current_slot(self):
+        slot = int(self._clock() // self.slot_length)
+        for expired in [key for key in self._counters if key <= slot - self.slots]:
+            del self._counters[expired]
+        if slot not in self._counters:
+            self._counters[slot] = SpaceSaving(self.capacity)
+        return self._counters[slot]
+
+    def offer(self, key, count=1):
+        self._current_slot().offer(key, count)
+
+    def top(self, n):
+        """The `n` keys with the highest count over the window, as (key, count)."""
+        self._current_slot()
+        totals = {}
+        for counter in self._counters.values():
+            for key, count in counter.counts.items():
+                totals[key] = totals.get(key, 0) + count
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:n]
+
+
+def load_hot_set(store):
+    """The published snapshot, or None when there is none yet."""
+    try:
+        return json.loads(store.get(HOT_SET_KEY))
+    except Exception:
+        return None
+
+
+def publish_hot_set(store, top, records, now=None):
+    """
+    Merge this container's top slugs into the shared snapshot and write it
+    back. `records` maps slug to its current {"id", "url"}, read from the
+    database just before publishing. Entries other containers published
+    stay while they are younger than the window; each slug keeps its
+    highest count. Concurrent publishers race, last write wins; the
+    snapshot only warms caches, so that is acceptable.
+    """
+    now = now or datetime.utcnow()
+    horizon = now - timedelta(seconds=HOT_SET_WINDOW)
+    entries = {}
+    previous = load_hot_set(store) or {}
+    for entry in previous.get("slugs", []):
+        if datetime.fromisoformat(entry["seen_at"]) >= horizon:
+            entries[entry["slug"]] = entry
+    for slug, count in top:
+        record = records.get(slug)
+        if not record:
+            continue
+        if slug in entries and entries[slug]["count"] > count:
+            count = entries[slug]["count"]
+        entries[slug] = {
+            "slug": slug, "id": record["id"], "url": record["url"],
+            "count": count, "seen_at": now.isoformat(),
+        }
+
+    slugs = sorted(entries.values(), key=lambda entry: entry["count"], reverse=True)[:HOT_SET_SIZE]
+    snapshot = {"generated_at": now.isoformat(), "window": HOT_SET_WINDOW, "slugs": slugs}
+    store.put(HOT_SET_KEY, json.dumps(snapshot, separators=(",", ":")), content_type="application/json")
+    return snapshot
@@ -0,0 +1,156 @@
+import contextvars
+import functools
+import hashlib
+import json
+import re
+import time
+from contextlib import nullcontext
+from utils.config import INSTRUMENTATION, INSTRUMENTATION_NAMESPACE
+
+# "off" (default), "json" for one structured line per invocation, or "emf"
+# for the same line in CloudWatch Embedded Metric Format. When off, every
+# hook below is a constant-time no-op and handlers are not wrapped at all.
+ENABLED = INSTRUMENTATION in ("json", "emf")
+
+_current = contextvars.ContextVar("shorty_invocation", default=None)
+_NULL_SPAN = nullcontext()
+_cold_start = True
+
+
+def fingerprint(query):
+    statement = re.sub(r"\s+", " ", query).strip()
+    return hashlib.sha1(statement.encode("utf-8")).hexdigest()[:10], statement[:80]
+
+
+class Invocation:
+    def __init__(self, name, request_id):
+        self.name = name
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.totals = {}
+        self.queries = {}
+        self.fields = {}
+
+    def add(self, kind, elapsed_ms):
+        count, total = self.totals.get(kind, (0, 0.0))
+        self.totals[kind] = (count + 1, total + elapsed_ms)
+
+    def add_query(self, query, elapsed_ms=None, rows=None):
+        key, statement = fingerprint(query)
+        entry = self.queries.setdefault(key, {"statement": statement, "count": 0, "ms": 0.0, "rows": 0})
+        if elapsed_ms is not None:
+            entry["count"] += 1
+            entry["ms"] += elapsed_ms
+            self.add("query", elapsed_ms)
+        if rows is not None:
+            entry["rows"] += rows
+
+    def summary(self):
+        line = {
+            "function": self.name,
+            "request_id": self.request_id,
+            "cold_start": self.fields.pop("cold_start", False),
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+        }
+        for kind, (count, total) in self.totals.items():
+            line[f"{kind}_count"] = count
+            line[f"{kind}_ms"] = round(total, 3)
+        line["rows"] = sum(entry["rows"] for entry in self.queries.values())
+        line["queries"] = {
+            key: dict(entry, ms=round(entry["ms"], 3)) for key, entry in self.queries.items()
+        }
+        line.update(self.fields)
+        return line
+
+
+class _Span:
+    __slots__ = ("invocation", "kind", "started")
+
+    def __init__(self, invocation, kind):
+        self.invocation = invocation
+        self.kind = kind
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.invocation.add(self.kind, (time.perf_counter() - self.started) * 1000)
+        return False
+
+
+def span(kind):
+    """Time a block as `kind` (connect, s3, serialize, ...)."""
+    if not ENABLED:
+        return _NULL_SPAN
+    invocation = _current.get()
+    return _Span(invocation, kind) if invocation else _NULL_SPAN
+
+
+def query_logger(record):
+    """asyncpg query logger; attached to pooled connections while enabled."""
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.add_query(record.query, elapsed_ms=record.elapsed * 1000)
+
+
+def add_rows(query, rows):
+    invocation = _current.get() if ENABLED else None
+    if invocation is not None:
+        invocation.add_query(query, rows=rows)
+
+
+def set_field(key, value):
+    invocation = _current.get() if ENABLED else None
+    if invocation is not None:
+        invocation.fields[key] = value
+
+
+def emit(line):
+    if INSTRUMENTATION == "emf":
+        metrics = [
+            {"Name": key, "Unit": "Milliseconds" if key.endswith("_ms") else "Count"}
+            for key in line
+            if key.endswith(("_ms", "_count")) or key == "rows"
+        ]
+        line = dict(line, _aws={
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": INSTRUMENTATION_NAMESPACE,
+                "Dimensions": [["function"]],
+                "Metrics": metrics,
+            }],
+        })
+    print(json.dumps(line, separators=(",", ":"), default=str))
+
+
+def instrumented(name, flush=None):
+    """
+    Wrap a Lambda `handler(event, context)` so each invocation emits one
+    structured line. `flush` is called before emitting so callbacks queued
+    on the handler's event loop (asyncpg query loggers) are counted.
+    Returns the handler untouched when instrumentation is off.
+    """
+    def decorator(handler):
+        if not ENABLED:
+            return handler
+
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            global _cold_start
+            invocation = Invocation(name, getattr(context, "aws_request_id", None))
+            invocation.fields["cold_start"] = _cold_start
+            _cold_start = False
+            token = _current.set(invocation)
+            try:
+                response = handler(event, context)
+                if isinstance(response, dict) and "statusCode" in response:
+                    invocation.fields["status"] = response["statusCode"]
+                return response
+            finally:
+                if flush:
+                    flush()
+                _current.reset(token)
+                emit(invocation.summary())
+        return wrapper
+    return decorator
@@ -0,0 +1,57 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(position):
+    """Opaque cursor for a keyset position of (timestamp, id)."""
+    timestamp, row_id = position
+    raw = json.dumps([timestamp.isoformat(), str(row_id)])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Inverse of encode_cursor. Anything that is not a [timestamp, id] pair of
+    strings raises ValueError; a null member must not fall back to page one.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not (isinstance(position, list) and len(position) == 2
+            and all(isinstance(member, str) for member in position)):
+        raise ValueError("Invalid cursor")
+    try:
+        return datetime.fromisoformat(position[0]), uuid.UUID(position[1])
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+
+def parse_page_params(params):
+    """Returns (limit, position) from `?limit=&cursor=`; raises ValueError."""
+    params = params or {}
+    try:
+        limit = int(params.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    cursor = params.get("cursor")
+    return limit, decode_cursor(cursor) if cursor else (None, None)
+
+
+def paginate(rows, limit, time_key):
+    """
+    Queries fetch limit + 1 rows; the extra row only tells us whether there
+    is another page. Returns (page, next_cursor).
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor((page[-1][time_key], page[-1]["id"]))
@@ -0,0 +1,167 @@
+"""
+Password hashing with tunable cost.
+
+Hashes are stored in a self-describing format so parameters can change
+without a migration:
+
+    scrypt$n=16384,r=8,p=1$<salt>$<hash>
+    pbkdf2_sha256$i=600000$<salt>$<hash>
+    $argon2id$v=19$m=...            (argon2-cffi's own format, if installed)
+
+Anything else is a legacy salted SHA-256 hex digest with the salt in the
+users.salt column; verify_password reports those as needing a rehash.
+
+Cost parameters come from the environment so every container hashes the
+same way. Use `python -m utils.passwords --target-ms 100` to calibrate
+them for the Lambda's CPU and memory size.
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import time
+from utils.config import (
+    PASSWORD_HASHER,
+    PASSWORD_SCRYPT_N,
+    PASSWORD_SCRYPT_R,
+    PASSWORD_SCRYPT_P,
+    PASSWORD_PBKDF2_ITERATIONS,
+)
+
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import VerificationError, InvalidHashError
+except ImportError:
+    PasswordHasher = None
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password, salt, n, r, p):
+    # OpenSSL refuses anything over maxmem; give it exactly what n and r need.
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+        maxmem=129 * n * r * p + 1024 * 1024, dklen=KEY_BYTES
+    )
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations, dklen=KEY_BYTES)
+
+
+def _parse_params(text):
+    return {key: int(value) for key, value in (item.split("=") for item in text.split(","))}
+
+
+def _argon2():
+    if PasswordHasher is None:
+        raise RuntimeError("argon2-cffi is not installed")
+    return PasswordHasher()
+
+
+def hash_password(password, hasher=None):
+    hasher = hasher or PASSWORD_HASHER
+    salt = os.urandom(SALT_BYTES)
+    if hasher == "scrypt":
+        n, r, p = PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P
+        return f"scrypt$n={n},r={r},p={p}${_b64(salt)}${_b64(_scrypt(password, salt, n, r, p))}"
+    if hasher == "pbkdf2_sha256":
+        iterations = PASSWORD_PBKDF2_ITERATIONS
+        return f"pbkdf2_sha256$i={iterations}${_b64(salt)}${_b64(_pbkdf2(password, salt, iterations))}"
+    if hasher == "argon2":
+        return _argon2().hash(password)
+    raise ValueError(f"Unknown password hasher: {hasher}")
+
+
+def needs_rehash(stored_hash):
+    if stored_hash.startswith("$argon2"):
+        return PASSWORD_HASHER != "argon2" or _argon2().check_needs_rehash(stored_hash)
+    scheme, _, rest = stored_hash.partition("$")
+    if scheme != PASSWORD_HASHER:
+        return True
+    params = _parse_params(rest.split("$", 1)[0])
+    if scheme == "scrypt":
+        return params != {"n": PASSWORD_SCRYPT_N, "r": PASSWORD_SCRYPT_R, "p": PASSWORD_SCRYPT_P}
+    return params != {"i": PASSWORD_PBKDF2_ITERATIONS}
+
+
+def verify_password(password, stored_hash, legacy_salt=None):
+    """Returns (matches, needs_rehash)."""
+    if stored_hash.startswith("$argon2"):
+        try:
+            _argon2().verify(stored_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False, False
+        return True, needs_rehash(stored_hash)
+
+    scheme, _, rest = stored_hash.partition("$")
+    if scheme == "scrypt":
+        params, salt, expected = rest.split("$")
+        params = _parse_params(params)
+        actual = _scrypt(password, _unb64(salt), params["n"], params["r"], params["p"])
+    elif scheme == "pbkdf2_sha256":
+        params, salt, expected = rest.split("$")
+        actual = _pbkdf2(password, _unb64(salt), _parse_params(params)["i"])
+    else:
+        # Legacy: sha256(password + salt) as hex.
+        actual = hashlib.sha256((password + (legacy_salt or "")).encode()).hexdigest()
+        return hmac.compare_digest(actual, stored_hash), True
+
+    if not hmac.compare_digest(actual, _unb64(expected)):
+        return False, False
+    return True, needs_rehash(stored_hash)
+
+
+def _time_ms(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def calibrate(target_ms, max_memory_mb=32, r=8, p=1):
+    """
+    Pick parameters that take about target_ms on this CPU: the largest
+    power-of-two scrypt N under both the time target and the memory cap
+    (128 * N * r bytes), and PBKDF2 iterations scaled from a timed sample.
+    """
+    salt = os.urandom(SALT_BYTES)
+    n = 1024
+    while True:
+        candidate = n * 2
+        if 128 * candidate * r * p > max_memory_mb * 1024 * 1024:
+            break
+        if _time_ms(lambda: _scrypt("calibration", salt, candidate, r, p)) > target_ms:
+            break
+        n = candidate
+    sample = 100_000
+    per_iteration = _time_ms(lambda: _pbkdf2("calibration", salt, sample)) / sample
+    return {
+        "PASSWORD_SCRYPT_N": n,
+        "PASSWORD_SCRYPT_R": r,
+        "PASSWORD_SCRYPT_P": p,
+        "scrypt_ms": round(_time_ms(lambda: _scrypt("calibration", salt, n, r, p)), 1),
+        "scrypt_memory_mb": round(128 * n * r * p / 1024 / 1024, 1),
+        "PASSWORD_PBKDF2_ITERATIONS": int(target_ms / per_iteration) // 1000 * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate password hashing cost for this CPU")
+    parser.add_argument("--target-ms", type=float, default=100)
+    parser.add_argument("--max-memory-mb", type=int, default=32)
+    args = parser.parse_args()
+    for key, value in calibrate(args.target_ms, args.max_memory_mb).items():
+        print(f"{key}={value}")
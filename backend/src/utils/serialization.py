@@ -0,0 +1,96 @@
+import base64
+import gzip
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+from utils.config import DEBUG, COMPRESS_MIN_BYTES
+from utils.instrumentation import span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _default(value):
+    # orjson already handles UUID and datetime natively; this covers the
+    # rest, and everything for the stdlib fallback.
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode(body, pretty=False):
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+        return orjson.dumps(body, default=_default, option=option).decode("utf-8")
+    if pretty:
+        return json.dumps(body, indent=2, sort_keys=True, default=_default)
+    return json.dumps(body, separators=(",", ":"), ensure_ascii=False, default=_default)
+
+
+def dumps(body, pretty=DEBUG):
+    """Serialize a response body to a str, compact unless `pretty`."""
+    with span("serialize"):
+        return encode(body, pretty)
+
+
+def accepted_encodings(header):
+    """Parse Accept-Encoding into the set of codings with a non-zero q."""
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    return accepted
+
+
+def compress_response(response, event):
+    """
+    Compress a Lambda proxy response body with br or gzip when the client
+    accepts it and the body is worth compressing. Returns the response.
+    """
+    body = response.get("body")
+    if not isinstance(body, str) or len(body) < COMPRESS_MIN_BYTES or response.get("isBase64Encoded"):
+        return response
+    headers = {key.lower(): value for key, value in (event.get("headers") or {}).items()}
+    accepted = accepted_encodings(headers.get("accept-encoding"))
+
+    with span("compress"):
+        if brotli is not None and ("br" in accepted or "*" in accepted):
+            encoding, payload = "br", brotli.compress(body.encode("utf-8"), quality=4)
+        elif "gzip" in accepted or "*" in accepted:
+            encoding, payload = "gzip", gzip.compress(body.encode("utf-8"), compresslevel=5)
+        else:
+            return response
+
+    response["body"] = base64.b64encode(payload).decode("ascii")
+    response["isBase64Encoded"] = True
+    response["headers"] = dict(response.get("headers") or {}, **{
+        "Content-Encoding": encoding,
+        "Vary": "Accept-Encoding",
+    })
+    return response
@@ -0,0 +1,113 @@
+import hashlib
+from collections import deque
+from functools import lru_cache
+from utils.config import VALID_CHARS, MIN_LENGTH, MAX_LENGTH, SLUG_KEY
+
+BASE = len(VALID_CHARS)
+FEISTEL_ROUNDS = 6
+
+_key = None
+
+
+def encode_base62(number, length):
+    chars = []
+    for _ in range(length):
+        number, remainder = divmod(number, BASE)
+        chars.append(VALID_CHARS[remainder])
+    return "".join(reversed(chars))
+
+
+def slug_key():
+    """The permutation key, derived from the SLUG_KEY secret."""
+    global _key
+    if _key is None:
+        if not SLUG_KEY:
+            raise ValueError("SLUG_KEY environment variable is not set")
+        _key = hashlib.blake2b(SLUG_KEY.encode("utf-8"), digest_size=32).digest()
+    return _key
+
+
+@lru_cache(maxsize=32)
+def _round_hashes(space, key):
+    # Keyed hashes primed with the domain size, so each slug length gets an
+    # independent permutation; copied per round input.
+    return tuple(
+        hashlib.blake2b(f"{space}:{round_index}".encode("ascii"), digest_size=8, key=key)
+        for round_index in range(FEISTEL_ROUNDS)
+    )
+
+
+def _feistel(number, half_bits, rounds):
+    mask = (1 << half_bits) - 1
+    left, right = number >> half_bits, number & mask
+    for round_hash in rounds:
+        mixed = round_hash.copy()
+        mixed.update(right.to_bytes(8, "big"))
+        left, right = right, left ^ (int.from_bytes(mixed.digest(), "big") & mask)
+    return (left << half_bits) | right
+
+
+def permute(number, space, key=None):
+    """
+    Keyed bijection on [0, space): a balanced Feistel network over the
+    smallest even bit width that covers `space`, cycle-walked until the
+    result falls back inside it. Without the key the order of slugs cannot
+    be predicted from the ones already seen.
+    """
+    half_bits = ((space - 1).bit_length() + 1) // 2
+    rounds = _round_hashes(space, key or slug_key())
+    value = _feistel(number, half_bits, rounds)
+    while value >= space:
+        value = _feistel(value, half_bits, rounds)
+    return value
+
+
+def slug_for_id(number):
+    """
+    Map a sequence id to a slug. Ids fill every MIN_LENGTH slug first, then
+    every MIN_LENGTH + 1 slug and so on, so two ids never share a slug.
+    """
+    length = MIN_LENGTH
+    while number >= BASE ** length:
+        number -= BASE ** length
+        length += 1
+        if length > MAX_LENGTH:
+            raise ValueError("Slug keyspace exhausted")
+    return encode_base62(permute(number, BASE ** length), length)
+
+
+class SlugAllocator:
+    """
+    Hands out slugs from id blocks reserved with nextval(), so most creates
+    need no round trip at all. `reserve_ids(count)` is an async callable that
+    reserves enough blocks for at least `count` ids in one round trip and
+    returns them as (first_id, block_size) tuples.
+    """
+
+    def __init__(self, reserve_ids):
+        self._reserve_ids = reserve_ids
+        self._ranges = deque()
+
+    def _available(self):
+        return sum(end - start for start, end in self._ranges)
+
+    async def next_slugs(self, count):
+        """Allocate `count` slugs, reserving any missing ids in one go."""
+        available = self._available()
+        if available < count:
+            blocks = await self._reserve_ids(count - available)
+            self._ranges.extend((first_id, first_id + size) for first_id, size in blocks)
+
+        slugs = []
+        while len(slugs) < count:
+            start, end = self._ranges[0]
+            take = min(end - start, count - len(slugs))
+            slugs.extend(slug_for_id(number) for number in range(start, start + take))
+            if start + take == end:
+                self._ranges.popleft()
+            else:
+                self._ranges[0] = (start + take, end)
+        return slugs
+
+    async def next_slug(self):
+        return (await self.next_slugs(1))[0]
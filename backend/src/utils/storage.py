@@ -0,0 +1,171 @@
+import boto3
+import os
+from utils.config import EXPORT_PART_SIZE
+from utils.instrumentation import span
+
+
+class S3MultipartUpload:
+    """
+    File-like writer that buffers up to `part_size` bytes and ships each
+    full buffer as one part of a multipart upload, so memory stays bounded
+    however large the object gets.
+    """
+
+    def __init__(self, client, bucket, key, content_type, part_size=EXPORT_PART_SIZE):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.parts = []
+        with span("s3"):
+            self.upload_id = client.create_multipart_upload(
+                Bucket=bucket, Key=key, ContentType=content_type
+            )["UploadId"]
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= self.part_size:
+            self._upload_part()
+
+    def _upload_part(self):
+        number = len(self.parts) + 1
+        with span("s3"):
+            response = self.client.upload_part(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                PartNumber=number, Body=bytes(self.buffer)
+            )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": number})
+        self.buffer.clear()
+
+    def close(self):
+        if self.buffer or not self.parts:
+            self._upload_part()
+        with span("s3"):
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                MultipartUpload={"Parts": self.parts}
+            )
+
+    def abort(self):
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+
+class LocalUpload:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.file = open(path, "wb")
+
+    def write(self, data):
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.path)
+
+
+class S3ObjectStore:
+    def __init__(self, bucket, client=None):
+        self.bucket = bucket
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client("s3")
+        return self._client
+
+    def put(self, key, body, content_type="application/octet-stream", **extra):
+        with span("s3"):
+            response = self.client.put_object(
+                Bucket=self.bucket, Key=key, Body=body, ContentType=content_type, **extra
+            )
+        if response["ResponseMetadata"]["HTTPStatusCode"] != 200:
+            raise Exception(f"Failed to put object to S3: {response}")
+        return key
+
+    def get(self, key):
+        with span("s3"):
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def list(self, prefix=""):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for item in page.get("Contents", []):
+                yield item["Key"]
+
+    def open_upload(self, key, content_type="application/octet-stream"):
+        return S3MultipartUpload(self.client, self.bucket, key, content_type)
+
+    def presign(self, key, expires_in):
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=expires_in
+        )
+
+    def delete(self, keys):
+        keys = list(keys)
+        # DeleteObjects accepts at most 1000 keys per call.
+        for start in range(0, len(keys), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": key} for key in keys[start:start + 1000]], "Quiet": True}
+            )
+
+
+class LocalObjectStore:
+    """Filesystem stand-in for S3ObjectStore; keys map to paths under root."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def put(self, key, body, content_type=None, **extra):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(body if isinstance(body, bytes) else body.encode("utf-8"))
+        return key
+
+    def get(self, key):
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def list(self, prefix=""):
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                key = os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    yield key
+
+    def open_upload(self, key, content_type=None):
+        return LocalUpload(self._path(key))
+
+    def presign(self, key, expires_in):
+        return "file://" + os.path.abspath(self._path(key))
+
+    def delete(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+def get_object_store(bucket=None):
+    """
+    S3 by default; LOCAL_STORAGE_ROOT switches to the filesystem for local
+    runs and tests.
+    """
+    local_root = os.environ.get("LOCAL_STORAGE_ROOT")
+    if local_root:
+        return LocalObjectStore(local_root)
+    bucket = bucket or os.environ.get("BUCKET_NAME")
+    if not bucket:
+        raise ValueError("BUCKET_NAME environment variable is not set")
+    return S3ObjectStore(bucket)
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import time
+import jwt
+from utils.cache import TTLCache, MISSING
+from utils.config import (
+    JWT_SECRET,
+    JWT_ALGORITHM,
+    JWT_KEY_ID,
+    JWT_PRIVATE_KEY_FILE,
+    JWT_JWKS_FILE,
+    JWT_CACHE_SIZE,
+)
+
+# Verified payloads keyed by sha256(token), each kept until the token's exp.
+_verified_tokens = TTLCache(JWT_CACHE_SIZE, ttl=0)
+_signing_key = None
+_verification_keys = None
+
+
+def is_asymmetric():
+    return not JWT_ALGORITHM.startswith("HS")
+
+
+def get_signing_key():
+    """
+    The HMAC secret, or for RS256/EdDSA the private key parsed once from
+    JWT_PRIVATE_KEY_FILE and reused for every token signed by the container.
+    """
+    global _signing_key
+    if _signing_key is None:
+        if is_asymmetric():
+            with open(JWT_PRIVATE_KEY_FILE) as f:
+                algorithm = jwt.algorithms.get_default_algorithms()[JWT_ALGORITHM]
+                _signing_key = algorithm.prepare_key(f.read())
+        else:
+            _signing_key = JWT_SECRET
+    return _signing_key
+
+
+def get_verification_keys():
+    """
+    Maps kid -> key object. Asymmetric keys come from a local JWKS file so
+    services can verify tokens without holding the signing secret.
+    """
+    global _verification_keys
+    if _verification_keys is None:
+        if is_asymmetric():
+            with open(JWT_JWKS_FILE) as f:
+                jwks = jwt.PyJWKSet.from_dict(json.load(f))
+            _verification_keys = {key.key_id: key.key for key in jwks.keys}
+        else:
+            _verification_keys = {None: JWT_SECRET}
+    return _verification_keys
+
+
+def sign_jwt_token(payload):
+    headers = {"kid": JWT_KEY_ID} if is_asymmetric() and JWT_KEY_ID else None
+    return jwt.encode(payload, get_signing_key(), algorithm=JWT_ALGORITHM, headers=headers)
+
+
+def _verification_key(token):
+    keys = get_verification_keys()
+    if len(keys) == 1:
+        return next(iter(keys.values()))
+    kid = jwt.get_unverified_header(token).get("kid")
+    if kid not in keys:
+        raise jwt.InvalidTokenError("Unknown signing key")
+    return keys[kid]
+
+
+def verify_jwt_token(token):
+    """
+    Returns (payload, None) or (None, error). Successful verifications are
+    cached until the token expires, so repeat calls with the same token skip
+    parsing and signature checks.
+    """
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    cached = _verified_tokens.get(digest)
+    if cached is not MISSING:
+        return dict(cached), None
+
+    try:
+        payload = jwt.decode(token, _verification_key(token), algorithms=[JWT_ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        return None, "Token has expired"
+    except jwt.InvalidTokenError:
+        return None, "Invalid token"
+    except Exception as e:
+        return None, str(e)
+
+    remaining = payload.get("exp", 0) - time.time()
+    if remaining > 0:
+        _verified_tokens.set(digest, payload, ttl=remaining)
+    return dict(payload), None
@@ -0,0 +1,93 @@
+import json
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from utils.archive import PARTITION_PREFIX, compact_clicks, read_parquet
+from utils.storage import LocalObjectStore
+
+
+def legacy_click(i):
+    return {"url_id": "u", "long_url": "https://example.com", "timestamp": 1760000000000 + i}
+
+
+def seed_legacy(store, count):
+    for i in range(count):
+        store.put(f"clicks/slug{i % 3}/{i:04d}.json", json.dumps(legacy_click(i)))
+
+
+def archived_rows(store):
+    rows = []
+    for key in store.list(PARTITION_PREFIX):
+        rows.extend(read_parquet(store.get(key)))
+    return rows
+
+
+def legacy_keys(store):
+    return [key for key in store.list("clicks/") if not key.startswith(PARTITION_PREFIX)]
+
+
+def test_writes_chunks_and_deletes_their_sources(tmp_path):
+    store = LocalObjectStore(str(tmp_path))
+    seed_legacy(store, 10)
+
+    stats = compact_clicks(store, delete_sources=True, max_rows=4)
+
+    assert stats == {"sources": 10, "rows": 10, "files": 3, "complete": True}
+    assert legacy_keys(store) == []
+    rows = archived_rows(store)
+    assert sorted(row["slug"] for row in rows) == sorted(f"slug{i % 3}" for i in range(10))
+
+
+def test_keeps_sources_unless_asked(tmp_path):
+    store = LocalObjectStore(str(tmp_path))
+    seed_legacy(store, 3)
+
+    stats = compact_clicks(store)
+
+    assert stats["rows"] == 3
+    assert len(legacy_keys(store)) == 3
+
+
+def test_stops_when_out_of_time_and_resumes(tmp_path):
+    store = LocalObjectStore(str(tmp_path))
+    seed_legacy(store, 10)
+    reads = []
+
+    def out_of_time():
+        reads.append(1)
+        return len(reads) > 6
+
+    first = compact_clicks(store, delete_sources=True, max_rows=4, out_of_time=out_of_time)
+
+    # Sources 1-4 went out as a full chunk, 5-6 in the final flush.
+    assert first == {"sources": 6, "rows": 6, "files": 2, "complete": False}
+    assert len(legacy_keys(store)) == 4
+
+    second = compact_clicks(store, delete_sources=True, max_rows=4)
+
+    assert second["complete"] and second["sources"] == 4
+    assert legacy_keys(store) == []
+    assert len(archived_rows(store)) == 10
+
+
+def test_failed_write_keeps_unwritten_sources(tmp_path):
+    store = LocalObjectStore(str(tmp_path))
+    seed_legacy(store, 8)
+
+    class FailingStore(LocalObjectStore):
+        writes = 0
+
+        def put(self, key, body, content_type=None, **extra):
+            if key.startswith(PARTITION_PREFIX):
+                FailingStore.writes += 1
+                if FailingStore.writes > 1:
+                    raise OSError("disk full")
+            return super().put(key, body, content_type, **extra)
+
+    with pytest.raises(OSError):
+        compact_clicks(FailingStore(str(tmp_path)), delete_sources=True, max_rows=4)
+
+    # The first chunk was written and its sources removed; the second was not.
+    assert len(legacy_keys(store)) == 4
+    assert len(archived_rows(store)) == 4
@@ -0,0 +1,71 @@
+import importlib.util
+import os
+
+import pytest
+
+from utils.bots import is_bot
+
+
+@pytest.mark.parametrize("user_agent", [
+    None,
+    "",
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+    "facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)",
+    "Slackbot-LinkExpanding 1.0 (+https://api.slack.com/robots)",
+    "WhatsApp/2.23.20.0",
+    "curl/8.4.0",
+    "python-requests/2.31.0",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) HeadlessChrome/120.0 Safari/537.36",
+])
+def test_bots(user_agent):
+    assert is_bot(user_agent)
+
+
+@pytest.mark.parametrize("user_agent", [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0",
+])
+def test_browsers(user_agent):
+    assert not is_bot(user_agent)
+
+
+BROWSER = "Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0"
+
+
+@pytest.fixture
+def analytics():
+    pytest.importorskip("boto3")
+    pytest.importorskip("asyncpg")
+    path = os.path.join(os.path.dirname(__file__), "..", "src", "lambda", "analytics", "index.py")
+    spec = importlib.util.spec_from_file_location("shorty_lambda_analytics_test", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def click(request_id, user_agent=BROWSER):
+    return {"slug": "abcd", "request_id": request_id, "user_agent": user_agent}
+
+
+def test_filter_drops_duplicates_within_the_batch_and_recently_seen(analytics):
+    analytics._recent_clicks.set(analytics.click_key(click("seen")), True)
+    clicks = [click("a"), click("a"), click("seen"), click(None), click(None)]
+
+    kept = analytics.filter_clicks(clicks)
+
+    # Clicks without a request id have no idempotency key and are all kept.
+    assert [c["request_id"] for c in kept] == ["a", None, None]
+
+
+@pytest.mark.parametrize("mode, expected", [
+    ("drop", [("human", None)]),
+    ("tag", [("human", None), ("bot", True)]),
+    ("off", [("human", None), ("bot", None)]),
+])
+def test_bot_filter_modes(analytics, monkeypatch, mode, expected):
+    monkeypatch.setattr(analytics, "BOT_FILTER", mode)
+
+    kept = analytics.filter_clicks([click("human"), click("bot", user_agent="curl/8.4.0")])
+
+    assert [(c["request_id"], c.get("is_bot")) for c in kept] == expected
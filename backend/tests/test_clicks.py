@@ -0,0 +1,52 @@
+import json
+
+from utils.clicks import CLICK_SCHEMA_VERSION, build_click_record, decode_click, encode_click
+
+
+def api_event(headers=None):
+    return {
+        "headers": headers or {},
+        "requestContext": {
+            "timeEpoch": 1760000000000,
+            "requestId": "req-1",
+            "http": {"sourceIp": "203.0.113.7", "userAgent": "curl/8.0"},
+        },
+    }
+
+
+def test_round_trip_keeps_every_field():
+    record = build_click_record(
+        api_event({"Referer": "https://ref.example/", "cloudfront-viewer-country": "NL"}),
+        "abcd", {"id": 42, "url": "https://example.com/"},
+    )
+
+    assert record["url_id"] == "42" and record["referer"] == "https://ref.example/"
+    assert decode_click(encode_click(record)) == record
+
+
+def test_encoding_is_compact_and_versioned():
+    record = build_click_record(api_event(), "abcd", {"id": None, "url": "https://example.com/"})
+    detail = json.loads(encode_click(record))
+
+    assert detail["v"] == CLICK_SCHEMA_VERSION
+    assert "r" not in detail and "i" not in detail
+    assert " " not in encode_click(record)
+    assert decode_click(detail)["referer"] is None
+
+
+def test_unknown_keys_from_newer_writers_are_ignored():
+    record = decode_click({"v": CLICK_SCHEMA_VERSION + 1, "s": "abcd", "new": 1})
+
+    assert record["slug"] == "abcd"
+    assert "new" not in record
+
+
+def test_legacy_raw_event_is_still_decoded():
+    detail = {"slug": "abcd", "long_url": "https://example.com/", "event": api_event()}
+
+    record = decode_click(json.dumps(detail))
+
+    assert record["slug"] == "abcd"
+    assert record["url_id"] is None
+    assert record["source_ip"] == "203.0.113.7"
+    assert record["timestamp"] == 1760000000000
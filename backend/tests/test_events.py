@@ -0,0 +1,166 @@
+import pytest
+
+pytest.importorskip("boto3")
+
+from utils.events import ClickEmitter, LocalSink
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_emitter(sink, **kwargs):
+    return ClickEmitter(sink, "bus", "public-lambda", "public", **kwargs)
+
+
+def test_flush_sends_in_batches_of_ten():
+    sink = LocalSink()
+    emitter = make_emitter(sink)
+    for i in range(25):
+        emitter.emit({"n": i})
+
+    assert emitter.flush() == 0
+    assert sink.calls == 3
+    assert [entry["Detail"] for entry in sink.events] == [f'{{"n": {i}}}' for i in range(25)]
+    assert emitter.sent == 25
+
+
+def test_failed_entries_are_retried_in_order():
+    sink = LocalSink(fail_next=2)
+    emitter = make_emitter(sink)
+    for i in range(5):
+        emitter.emit(str(i))
+
+    assert emitter.flush() == 0
+    assert [entry["Detail"] for entry in sink.events] == ["2", "3", "4", "0", "1"]
+    assert emitter.retried == 2
+    assert emitter.sent == 5
+
+
+def test_gives_up_after_max_attempts():
+    sink = LocalSink(fail_next=3)
+    emitter = make_emitter(sink, max_attempts=3)
+    emitter.emit("lost")
+
+    # A batch that fails entirely ends the flush; each flush is one attempt.
+    assert emitter.flush() == 1
+    assert emitter.flush() == 1
+    assert emitter.flush() == 0
+    assert emitter.dropped == 1
+
+    emitter.emit("kept")
+    assert emitter.flush() == 0
+    assert [entry["Detail"] for entry in sink.events] == ["kept"]
+
+
+def test_sink_exception_keeps_entries_for_next_flush():
+    class BrokenSink:
+        def put_events(self, entries):
+            raise ConnectionError("down")
+
+    emitter = make_emitter(BrokenSink())
+    emitter.emit("a")
+    assert emitter.flush() == 1
+
+    emitter.sink = LocalSink()
+    assert emitter.flush() == 0
+    assert [entry["Detail"] for entry in emitter.sink.events] == ["a"]
+
+
+def test_flush_stops_at_timeout():
+    clock = FakeClock()
+
+    class SlowSink(LocalSink):
+        def put_events(self, entries):
+            clock.now += 0.15
+            return super().put_events(entries)
+
+    sink = SlowSink()
+    emitter = make_emitter(sink, clock=clock)
+    for i in range(30):
+        emitter.emit(str(i))
+
+    assert emitter.flush(timeout=0.2) == 10
+    assert sink.calls == 2
+    assert emitter.flush() == 0
+    assert len(sink.events) == 30
+
+
+def test_old_entries_expire_before_flush():
+    clock = FakeClock()
+    sink = LocalSink()
+    emitter = make_emitter(sink, max_age=60, clock=clock)
+    emitter.emit("stale")
+    clock.now = 50
+    emitter.emit("fresh")
+    clock.now = 70
+
+    assert emitter.flush() == 0
+    assert [entry["Detail"] for entry in sink.events] == ["fresh"]
+    assert emitter.expired == 1
+
+
+def test_full_queue_drops_oldest():
+    sink = LocalSink()
+    emitter = make_emitter(sink, max_queue=3)
+    for i in range(5):
+        emitter.emit(str(i))
+
+    emitter.flush()
+    assert [entry["Detail"] for entry in sink.events] == ["2", "3", "4"]
+    assert emitter.dropped == 2
+
+
+def test_flush_due_waits_for_a_full_batch_or_an_old_entry():
+    clock = FakeClock()
+    sink = LocalSink()
+    emitter = make_emitter(sink, flush_age=10, clock=clock)
+    for i in range(9):
+        emitter.emit(str(i))
+
+    assert emitter.flush_due() == 9
+    assert sink.calls == 0
+
+    emitter.emit("9")
+    assert emitter.flush_due() == 0
+    assert sink.calls == 1
+
+    emitter.emit("late")
+    clock.now = 9
+    assert emitter.flush_due() == 1
+    clock.now = 10
+    assert emitter.flush_due() == 0
+    assert sink.calls == 2
+
+
+def test_flush_does_not_start_a_call_that_could_outlive_the_deadline():
+    clock = FakeClock()
+
+    class StallingSink(LocalSink):
+        timeout = 0.1
+
+        def put_events(self, entries):
+            clock.now += self.timeout
+            raise TimeoutError("stalled")
+
+    sink = StallingSink()
+    emitter = make_emitter(sink, clock=clock)
+    emitter.emit("a")
+
+    assert emitter.flush(timeout=0.05) == 1
+    assert sink.calls == 0
+    assert emitter.flush(timeout=0.2) == 1
+    assert clock.now == pytest.approx(0.1)
+
+
+def test_event_bridge_sink_makes_a_single_bounded_attempt(monkeypatch):
+    from utils.events import EventBridgeSink
+
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    config = EventBridgeSink(timeout=0.2).client.meta.config
+    assert config.retries["total_max_attempts"] == 1
+    assert config.connect_timeout + config.read_timeout == pytest.approx(0.2)
@@ -0,0 +1,50 @@
+import pytest
+
+from utils.hll import HyperLogLog, merge_sketches, visitor_hash
+
+# Standard error of a precision-11 sketch is 1.04 / sqrt(2048), about 2.3%;
+# allow three of them.
+TOLERANCE = 3 * 1.04 / (2 ** 11) ** 0.5
+
+
+def sketch_of(start, stop):
+    sketch = HyperLogLog(precision=11)
+    for i in range(start, stop):
+        sketch.add(visitor_hash(f"10.0.{i // 256}.{i % 256}", f"agent-{i}", salt="test"))
+    return sketch
+
+
+@pytest.mark.parametrize("cardinality", [10, 100, 1_000, 10_000, 100_000])
+def test_estimate_within_error_bound(cardinality):
+    estimate = sketch_of(0, cardinality).count()
+    assert abs(estimate - cardinality) <= max(1, cardinality * TOLERANCE)
+
+
+def test_repeated_visitors_count_once():
+    sketch = sketch_of(0, 500)
+    for _ in range(5):
+        sketch.merge(sketch_of(0, 500))
+    assert sketch.count() == sketch_of(0, 500).count()
+
+
+def test_merge_is_union():
+    merged = merge_sketches([sketch_of(0, 6_000).to_bytes(), sketch_of(4_000, 10_000).to_bytes()])
+    assert abs(merged.count() - 10_000) <= 10_000 * TOLERANCE
+    assert merge_sketches([]) is None
+
+
+def test_round_trip_and_precision_checks():
+    sketch = sketch_of(0, 100)
+    restored = HyperLogLog.from_bytes(sketch.to_bytes())
+    assert restored.precision == 11 and restored.count() == sketch.count()
+
+    with pytest.raises(ValueError):
+        HyperLogLog(precision=11, registers=b"\0" * 10)
+    with pytest.raises(ValueError):
+        sketch.merge(HyperLogLog(precision=10))
+
+
+def test_visitor_hash_is_keyed():
+    assert visitor_hash("1.2.3.4", "ua", salt="a") == visitor_hash("1.2.3.4", "ua", salt="a")
+    assert visitor_hash("1.2.3.4", "ua", salt="a") != visitor_hash("1.2.3.4", "ua", salt="b")
+    assert 0 <= visitor_hash(None, None, salt="a") < 2 ** 64
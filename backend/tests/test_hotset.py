@@ -0,0 +1,79 @@
+import importlib.util
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils import hotset
+from utils.hotset import SlidingHeavyHitters, SpaceSaving, load_hot_set, publish_hot_set
+from utils.storage import LocalObjectStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_space_saving_keeps_heavy_hitters_within_capacity():
+    counter = SpaceSaving(capacity=3)
+    for key, count in [("a", 50), ("b", 30), ("c", 5), ("d", 1), ("e", 1)]:
+        counter.offer(key, count)
+
+    assert len(counter.counts) == 3
+    assert counter.counts["a"] == 50 and counter.counts["b"] == 30
+    # A newcomer inherits the evicted minimum as its error bound.
+    assert counter.counts["e"] - counter.errors["e"] == 1
+
+
+def test_sliding_window_forgets_old_slots():
+    clock = FakeClock()
+    hitters = SlidingHeavyHitters(capacity=10, window=60, slots=6, clock=clock)
+    hitters.offer("old", 100)
+    clock.now = 30
+    hitters.offer("new", 5)
+    hitters.offer("new", 5)
+
+    assert hitters.top(1) == [("old", 100)]
+    clock.now = 61
+    assert hitters.top(5) == [("new", 10)]
+
+
+def test_publish_merges_with_the_previous_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(hotset, "HOT_SET_WINDOW", 900)
+    monkeypatch.setattr(hotset, "HOT_SET_SIZE", 2)
+    store = LocalObjectStore(str(tmp_path))
+    now = datetime(2026, 10, 18, 12, 0)
+    records = {slug: {"id": f"id-{slug}", "url": f"https://example.com/{slug}"} for slug in "abcd"}
+
+    assert load_hot_set(store) is None
+    publish_hot_set(store, [("a", 10), ("b", 8)], records, now=now - timedelta(seconds=1000))
+    publish_hot_set(store, [("c", 7), ("d", 9)], records, now=now - timedelta(seconds=60))
+    snapshot = publish_hot_set(store, [("c", 3), ("gone", 50)], records, now=now)
+
+    # "a" and "b" aged out, "gone" has no record, "c" keeps its higher count.
+    assert [(entry["slug"], entry["count"]) for entry in snapshot["slugs"]] == [("d", 9), ("c", 7)]
+    assert snapshot["slugs"][1]["seen_at"] == now.isoformat()
+    assert load_hot_set(store) == snapshot
+
+
+def test_prefill_seeds_the_cache_and_rewinds_the_cursor(tmp_path, monkeypatch):
+    pytest.importorskip("boto3")
+    pytest.importorskip("asyncpg")
+    store = LocalObjectStore(str(tmp_path))
+    now = datetime(2026, 10, 18, 12, 0)
+    records = {"a": {"id": "id-a", "url": "https://example.com/a"}}
+    publish_hot_set(store, [("a", 10)], records, now=now - timedelta(seconds=120))
+    publish_hot_set(store, [], records, now=now)
+
+    monkeypatch.setenv("LOCAL_STORAGE_ROOT", str(tmp_path))
+    path = os.path.join(os.path.dirname(__file__), "..", "src", "lambda", "public", "index.py")
+    spec = importlib.util.spec_from_file_location("shorty_lambda_public_test", path)
+    public = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(public)
+
+    assert public._slug_cache.get("a") == {"id": "id-a", "url": "https://example.com/a"}
+    # The URL may come from a click a whole window before the entry was seen.
+    assert public._invalidation_cursor == now - timedelta(seconds=120 + hotset.HOT_SET_WINDOW)
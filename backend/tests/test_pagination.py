@@ -0,0 +1,95 @@
+import asyncio
+import base64
+import json
+import re
+import uuid
+from datetime import datetime
+
+import pytest
+
+from utils.pagination import decode_cursor, encode_cursor, paginate, parse_page_params
+
+
+def test_cursor_round_trip():
+    position = (datetime(2026, 10, 18, 12, 30, 5, 123456), uuid.uuid4())
+    cursor = encode_cursor(position)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == position
+
+
+def raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "", "not-base64!", "bnVsbA", "WzEsMiwzXQ", "WyJ4IiwgInkiXQ", "\u00e9",
+    raw_cursor([None, 5]),
+    raw_cursor([None, str(uuid.uuid4())]),
+    raw_cursor(["2026-01-01T00:00:00", None]),
+    raw_cursor(["2026-01-01T00:00:00", 5]),
+    raw_cursor({"a": 1}),
+])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+def test_parse_page_params():
+    position = (datetime(2026, 1, 1), uuid.uuid4())
+
+    assert parse_page_params(None) == (100, (None, None))
+    assert parse_page_params({"limit": "5", "cursor": encode_cursor(position)}) == (5, position)
+    for limit in ("0", "1001", "ten"):
+        with pytest.raises(ValueError):
+            parse_page_params({"limit": limit})
+
+
+def test_paginate_uses_extra_row_for_next_cursor():
+    rows = [{"id": uuid.uuid4(), "created_at": datetime(2026, 1, day)} for day in range(1, 5)]
+
+    page, cursor = paginate(rows, 3, "created_at")
+    assert page == rows[:3]
+    assert decode_cursor(cursor) == (rows[2]["created_at"], rows[2]["id"])
+    assert paginate(rows, 4, "created_at") == (rows, None)
+
+
+class RecordingFetch:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, query, *args):
+        self.calls.append((query, args))
+        return []
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    from utils.crud import url
+
+    fetch = RecordingFetch()
+    monkeypatch.setattr(url, "run_query_fetch", fetch)
+    return url, fetch
+
+
+def placeholders(query):
+    return {int(number) for number in re.findall(r"\$(\d+)", query)}
+
+
+@pytest.mark.parametrize("call", [
+    lambda url, after: url.list_short_urls("user", limit=10, after=after),
+    lambda url, after: url.get_url_visits_by_user("user", limit=10, after=after),
+])
+def test_first_and_next_pages_are_separate_statements(recorded, call):
+    url, fetch = recorded
+    after = (datetime(2026, 1, 1), uuid.uuid4())
+
+    asyncio.run(call(url, (None, None)))
+    asyncio.run(call(url, after))
+
+    (first, first_args), (following, following_args) = fetch.calls
+    assert not re.search(r"\$\d+(::\w+)? IS NULL", first + following)
+    assert ") >" not in first and ") >" in following
+    assert placeholders(first) == set(range(1, len(first_args) + 1))
+    assert placeholders(following) == set(range(1, len(following_args) + 1))
+    assert following_args[-2:] == after
@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+import importlib.util
+import os
+
+import pytest
+
+from utils import passwords
+
+
+@pytest.fixture(autouse=True)
+def cheap_params(monkeypatch):
+    monkeypatch.setattr(passwords, "PASSWORD_HASHER", "scrypt")
+    monkeypatch.setattr(passwords, "PASSWORD_SCRYPT_N", 1024)
+    monkeypatch.setattr(passwords, "PASSWORD_PBKDF2_ITERATIONS", 1000)
+
+
+@pytest.mark.parametrize("hasher", ["scrypt", "pbkdf2_sha256"])
+def test_hash_verify_round_trip(monkeypatch, hasher):
+    monkeypatch.setattr(passwords, "PASSWORD_HASHER", hasher)
+    stored = passwords.hash_password("correct horse")
+
+    assert stored.startswith(hasher + "$")
+    assert stored != passwords.hash_password("correct horse")
+    assert passwords.verify_password("correct horse", stored) == (True, False)
+    assert passwords.verify_password("wrong horse", stored) == (False, False)
+
+
+def test_legacy_sha256_matches_and_needs_rehash():
+    stored = hashlib.sha256(b"hunter2" + b"pepper").hexdigest()
+
+    assert passwords.verify_password("hunter2", stored, legacy_salt="pepper") == (True, True)
+    assert passwords.verify_password("hunter3", stored, legacy_salt="pepper")[0] is False
+
+
+def test_needs_rehash_after_a_parameter_change(monkeypatch):
+    scrypt_hash = passwords.hash_password("pw")
+    pbkdf2_hash = passwords.hash_password("pw", hasher="pbkdf2_sha256")
+    assert not passwords.needs_rehash(scrypt_hash)
+    assert passwords.needs_rehash(pbkdf2_hash)
+
+    monkeypatch.setattr(passwords, "PASSWORD_SCRYPT_N", 2048)
+    assert passwords.needs_rehash(scrypt_hash)
+    # The old hash still verifies with the parameters it was made with.
+    assert passwords.verify_password("pw", scrypt_hash) == (True, True)
+
+    monkeypatch.setattr(passwords, "PASSWORD_HASHER", "pbkdf2_sha256")
+    assert not passwords.needs_rehash(pbkdf2_hash)
+    monkeypatch.setattr(passwords, "PASSWORD_PBKDF2_ITERATIONS", 2000)
+    assert passwords.needs_rehash(pbkdf2_hash)
+
+
+def test_login_upgrades_a_legacy_hash(monkeypatch):
+    pytest.importorskip("asyncpg")
+    monkeypatch.setenv("JWT_SECRET", "test-secret")
+    path = os.path.join(os.path.dirname(__file__), "..", "src", "lambda", "auth", "index.py")
+    spec = importlib.util.spec_from_file_location("shorty_lambda_auth_test", path)
+    auth = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(auth)
+
+    user = {
+        "id": "user",
+        "email": "a@example.com",
+        "password_hash": hashlib.sha256(b"hunter2salt").hexdigest(),
+        "salt": "salt",
+    }
+    updates = []
+
+    async def get_user_by_email(email):
+        return user
+
+    async def update_password_hash(user_id, password_hash):
+        updates.append((user_id, password_hash))
+
+    async def generate_tokens(user):
+        return {}
+
+    monkeypatch.setattr(auth, "get_user_by_email", get_user_by_email)
+    monkeypatch.setattr(auth, "update_password_hash", update_password_hash)
+    monkeypatch.setattr(auth, "generate_tokens", generate_tokens)
+
+    response = asyncio.run(auth.handle_login({"email": user["email"], "password": "hunter2"}))
+
+    assert response["statusCode"] == 200
+    ((user_id, upgraded),) = updates
+    assert user_id == "user" and upgraded.startswith("scrypt$")
+    assert passwords.verify_password("hunter2", upgraded) == (True, False)
+
+    user["password_hash"] = upgraded
+    asyncio.run(auth.handle_login({"email": user["email"], "password": "hunter2"}))
+    assert len(updates) == 1
@@ -0,0 +1,107 @@
+import base64
+import gzip
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from utils import serialization
+from utils.serialization import accepted_encodings, compress_response, encode
+
+BODY = {
+    "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "at": datetime(2026, 10, 18, 12, 0, 5),
+    "day": date(2026, 10, 18),
+    "total": Decimal("1.50"),
+    "tags": ("a", "b"),
+    "raw": b"\x00\x01",
+    "name": "café",
+}
+EXPECTED = {
+    "id": "12345678-1234-5678-1234-567812345678",
+    "at": "2026-10-18T12:00:05",
+    "day": "2026-10-18",
+    "total": "1.50",
+    "tags": ["a", "b"],
+    "raw": "AAE=",
+    "name": "café",
+}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(serialization, "orjson", None)
+    return request.param
+
+
+def test_encode_is_compact_and_handles_db_types(backend):
+    text = encode(BODY)
+
+    assert json.loads(text) == EXPECTED
+    assert ": " not in text and ", " not in text
+    assert "café" in text
+
+
+def test_pretty_encoding_is_indented_and_sorted(backend):
+    text = encode({"b": 1, "a": 2}, pretty=True)
+
+    assert text.index('"a"') < text.index('"b"')
+    assert "\n  " in text
+
+
+def test_unknown_types_still_fail(backend):
+    with pytest.raises(TypeError):
+        encode({"value": object()})
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, set()),
+    ("gzip, deflate, br", {"gzip", "deflate", "br"}),
+    ("GZIP;q=0.5, br;q=0", {"gzip"}),
+    ("*;q=1, identity;q=bogus", {"*"}),
+])
+def test_accepted_encodings(header, expected):
+    assert accepted_encodings(header) == expected
+
+
+def response(body):
+    return {"statusCode": 200, "body": body, "headers": {"Content-Type": "application/json"}}
+
+
+def test_large_bodies_are_gzipped_when_accepted(monkeypatch):
+    monkeypatch.setattr(serialization, "brotli", None)
+    body = json.dumps([{"slug": f"s{i}", "url": "https://example.com/"} for i in range(100)])
+
+    compressed = compress_response(response(body), {"headers": {"Accept-Encoding": "gzip"}})
+
+    assert compressed["isBase64Encoded"]
+    assert compressed["headers"]["Content-Encoding"] == "gzip"
+    assert compressed["headers"]["Vary"] == "Accept-Encoding"
+    assert compressed["headers"]["Content-Type"] == "application/json"
+    assert gzip.decompress(base64.b64decode(compressed["body"])).decode("utf-8") == body
+
+
+def test_brotli_is_preferred_when_available(monkeypatch):
+    brotli = pytest.importorskip("brotli")
+    body = "x" * 4096
+
+    compressed = compress_response(response(body), {"headers": {"accept-encoding": "gzip, br"}})
+
+    assert compressed["headers"]["Content-Encoding"] == "br"
+    assert brotli.decompress(base64.b64decode(compressed["body"])).decode("utf-8") == body
+
+
+@pytest.mark.parametrize("body, headers", [
+    ("x" * 10, {"accept-encoding": "gzip"}),
+    ("x" * 4096, {}),
+    ("x" * 4096, {"accept-encoding": "gzip;q=0"}),
+])
+def test_small_or_unaccepted_bodies_are_left_alone(monkeypatch, body, headers):
+    monkeypatch.setattr(serialization, "brotli", None)
+
+    assert compress_response(response(body), {"headers": headers}) == response(body)
@@ -0,0 +1,111 @@
+import asyncio
+import importlib.util
+import json
+import os
+import uuid
+
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("asyncpg")
+
+from utils.urls import url_hash
+
+
+@pytest.fixture
+def shortener(monkeypatch):
+    path = os.path.join(os.path.dirname(__file__), "..", "src", "lambda", "shortener", "index.py")
+    spec = importlib.util.spec_from_file_location("shorty_lambda_shortener_test", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    async def next_slugs(count):
+        return [f"s{uuid.uuid4().hex[:6]}" for _ in range(count)]
+
+    monkeypatch.setattr(module._slug_allocator, "next_slugs", next_slugs)
+    return module
+
+
+class FakeLinks:
+    """create_short_url_records over an in-memory {url_hash: link} map."""
+
+    def __init__(self, dedupe, existing=()):
+        self.dedupe = dedupe
+        self.by_hash = {url_hash(url): {"id": str(uuid.uuid4()), "slug": slug} for slug, url in existing}
+        self.calls = []
+
+    async def __call__(self, items, user_id):
+        self.calls.append(items)
+        rows = []
+        for slug, url, item_hash in items:
+            if self.dedupe and item_hash in self.by_hash:
+                rows.append({"requested_slug": slug, **self.by_hash[item_hash], "existed": True})
+                continue
+            link = {"id": str(uuid.uuid4()), "slug": slug}
+            if self.dedupe:
+                self.by_hash[item_hash] = link
+            rows.append({"requested_slug": slug, **link, "existed": False})
+        return rows
+
+
+def run_batch(shortener, monkeypatch, links, urls):
+    async def wants_dedupe(user_id):
+        return links.dedupe
+
+    monkeypatch.setattr(shortener, "wants_dedupe", wants_dedupe)
+    monkeypatch.setattr(shortener, "create_short_url_records", links)
+    response = asyncio.run(shortener.handle_create_short_urls_batch({"urls": urls}, "user"))
+    return response["statusCode"], json.loads(response["body"])
+
+
+def test_batch_dedupes_against_existing_links_and_within_the_batch(shortener, monkeypatch):
+    links = FakeLinks(dedupe=True, existing=[("old", "https://example.com/a")])
+    status, body = run_batch(shortener, monkeypatch, links, [
+        "https://Example.com/a?utm_source=x",
+        "https://example.com/b",
+        "https://example.com:443/b",
+        "https://example.com:99999/",
+    ])
+
+    results = body["results"]
+    assert status == 207
+    assert results[0]["slug"] == "old" and results[0]["existed"]
+    assert not results[1]["existed"]
+    assert results[2] == dict(results[1], index=2, existed=True)
+    assert results[3] == {"index": 3, "error": "Invalid URL"}
+    # The repeated URL is sent once, with its hash.
+    (items,) = links.calls
+    assert [item[2] for item in items] == [url_hash("https://example.com/a"), url_hash("https://example.com/b")]
+
+
+def test_batch_without_dedupe_sends_no_hashes(shortener, monkeypatch):
+    links = FakeLinks(dedupe=False)
+    status, body = run_batch(shortener, monkeypatch, links, ["https://example.com/a"] * 2)
+
+    assert status == 201
+    assert len({result["slug"] for result in body["results"]}) == 2
+    assert all(item[2] is None for item in links.calls[0])
+
+
+def test_update_saves_the_new_urls_hash(shortener, monkeypatch):
+    calls = []
+
+    async def wants_dedupe(user_id):
+        return True
+
+    async def update_short_url(slug, user_id, **kwargs):
+        calls.append(kwargs)
+        return {"status": "updated", "record": {"slug": slug}}
+
+    monkeypatch.setattr(shortener, "wants_dedupe", wants_dedupe)
+    monkeypatch.setattr(shortener, "update_short_url", update_short_url)
+    event = {
+        "requestContext": {"http": {"method": "PUT", "path": "/shorten"}},
+        "token_payload": {"sub": "user"},
+        "body": json.dumps({"slug": "abc", "updated_url": "https://Example.com/new"}),
+    }
+
+    response = asyncio.run(shortener.async_handler(event, None))
+
+    assert response["statusCode"] == 200
+    assert calls[0]["new_url_hash"] == url_hash("https://example.com/new")
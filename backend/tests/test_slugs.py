@@ -0,0 +1,55 @@
+import pytest
+
+from utils import slugs
+from utils.config import MAX_LENGTH, MIN_LENGTH
+from utils.slugs import BASE, encode_base62, permute, slug_for_id
+
+KEY = b"k" * 32
+
+
+@pytest.fixture(autouse=True)
+def slug_key(monkeypatch):
+    monkeypatch.setattr(slugs, "_key", KEY)
+
+
+@pytest.mark.parametrize("space", [1, 2, 61, 62, 1000, BASE ** 2, 5000])
+def test_permute_is_a_bijection(space):
+    assert sorted(permute(number, space, KEY) for number in range(space)) == list(range(space))
+
+
+def test_permute_depends_on_key():
+    space = BASE ** 2
+    first = [permute(number, space, KEY) for number in range(50)]
+    second = [permute(number, space, b"other-key") for number in range(50)]
+    assert first != second
+    assert first != sorted(first)
+
+
+def test_encode_base62_pads_to_length():
+    assert encode_base62(0, 4) == "aaaa"
+    assert encode_base62(BASE ** 4 - 1, 4) == "9999"
+
+
+def test_length_boundaries():
+    last_short = BASE ** MIN_LENGTH - 1
+    assert len(slug_for_id(0)) == MIN_LENGTH
+    assert len(slug_for_id(last_short)) == MIN_LENGTH
+    assert len(slug_for_id(last_short + 1)) == MIN_LENGTH + 1
+
+    last_id = sum(BASE ** length for length in range(MIN_LENGTH, MAX_LENGTH + 1)) - 1
+    assert len(slug_for_id(last_id)) == MAX_LENGTH
+    with pytest.raises(ValueError, match="exhausted"):
+        slug_for_id(last_id + 1)
+
+
+def test_consecutive_ids_give_distinct_slugs():
+    issued = [slug_for_id(number) for number in range(10_000)]
+    assert len(set(issued)) == len(issued)
+    assert all(set(slug) <= set(slugs.VALID_CHARS) for slug in issued)
+
+
+def test_missing_key_is_an_error(monkeypatch):
+    monkeypatch.setattr(slugs, "_key", None)
+    monkeypatch.setattr(slugs, "SLUG_KEY", None)
+    with pytest.raises(ValueError, match="SLUG_KEY"):
+        slug_for_id(0)
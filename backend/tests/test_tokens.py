@@ -0,0 +1,98 @@
+import json
+import time
+
+import pytest
+
+jwt = pytest.importorskip("jwt")
+
+from utils import tokens
+from utils.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(tokens, "_verified_tokens", TTLCache(16, ttl=0, clock=clock))
+    monkeypatch.setattr(tokens, "_signing_key", None)
+    monkeypatch.setattr(tokens, "_verification_keys", None)
+    monkeypatch.setattr(tokens, "JWT_SECRET", "test-secret-with-at-least-32-bytes")
+    monkeypatch.setattr(tokens, "JWT_ALGORITHM", "HS256")
+    return clock
+
+
+@pytest.fixture
+def decode_calls(monkeypatch):
+    calls = []
+    decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(jwt, "decode", counting_decode)
+    return calls
+
+
+def test_verified_tokens_are_cached_until_they_expire(clock, decode_calls):
+    token = tokens.sign_jwt_token({"sub": "user", "exp": int(time.time()) + 60})
+
+    payload, error = tokens.verify_jwt_token(token)
+    assert error is None and payload["sub"] == "user"
+    payload["sub"] = "mutated"
+    assert tokens.verify_jwt_token(token)[0]["sub"] == "user"
+    assert len(decode_calls) == 1
+
+    clock.now += 61
+    tokens.verify_jwt_token(token)
+    assert len(decode_calls) == 2
+
+
+def test_failures_are_not_cached(clock, decode_calls):
+    expired = tokens.sign_jwt_token({"sub": "user", "exp": int(time.time()) - 10})
+    forged = jwt.encode({"sub": "user", "exp": int(time.time()) + 60}, "another-secret-with-at-least-32-bytes", algorithm="HS256")
+
+    for _ in range(2):
+        assert tokens.verify_jwt_token(expired) == (None, "Token has expired")
+        assert tokens.verify_jwt_token(forged) == (None, "Invalid token")
+    assert len(decode_calls) == 4
+    assert len(tokens._verified_tokens) == 0
+
+
+def test_asymmetric_keys_are_picked_by_kid(clock, monkeypatch, tmp_path):
+    pytest.importorskip("cryptography")
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519
+
+    def write_key(name):
+        private_key = ed25519.Ed25519PrivateKey.generate()
+        path = tmp_path / f"{name}.pem"
+        path.write_bytes(private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+        jwk = json.loads(jwt.algorithms.OKPAlgorithm.to_jwk(private_key.public_key()))
+        return path, dict(jwk, kid=name)
+
+    current_path, current_jwk = write_key("current")
+    _, retired_jwk = write_key("retired")
+    jwks_path = tmp_path / "jwks.json"
+    jwks_path.write_text(json.dumps({"keys": [retired_jwk, current_jwk]}))
+    monkeypatch.setattr(tokens, "JWT_ALGORITHM", "EdDSA")
+    monkeypatch.setattr(tokens, "JWT_KEY_ID", "current")
+    monkeypatch.setattr(tokens, "JWT_PRIVATE_KEY_FILE", str(current_path))
+    monkeypatch.setattr(tokens, "JWT_JWKS_FILE", str(jwks_path))
+
+    token = tokens.sign_jwt_token({"sub": "user", "exp": int(time.time()) + 60})
+
+    assert jwt.get_unverified_header(token)["kid"] == "current"
+    assert tokens.verify_jwt_token(token)[0]["sub"] == "user"
+
+    unknown = jwt.encode({"sub": "user"}, tokens.get_signing_key(), algorithm="EdDSA", headers={"kid": "gone"})
+    assert tokens.verify_jwt_token(unknown) == (None, "Invalid token")
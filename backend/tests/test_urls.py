@@ -0,0 +1,30 @@
+import pytest
+
+from utils.urls import canonicalize_url, url_hash
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://Example.COM", "https://example.com/"),
+    ("  https://example.com/a  ", "https://example.com/a"),
+    ("https://example.com:443/a", "https://example.com/a"),
+    ("http://example.com:80/a", "http://example.com/a"),
+    ("https://example.com:8443/a", "https://example.com:8443/a"),
+    ("https://User:Pw@Example.com/", "https://User:Pw@example.com/"),
+    ("https://example.com/a?utm_source=x&b=2&fbclid=y&a=1", "https://example.com/a?b=2&a=1"),
+    ("https://example.com/a?UTM_Medium=x", "https://example.com/a"),
+    ("https://example.com/a?empty=", "https://example.com/a?empty="),
+    ("https://example.com/a#frag", "https://example.com/a#frag"),
+    ("https://example.com/Path", "https://example.com/Path"),
+])
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url) == expected
+
+
+def test_equivalent_urls_share_a_hash():
+    assert url_hash("https://Example.com:443?utm_campaign=z") == url_hash("https://example.com/")
+    assert url_hash("https://example.com/a") != url_hash("https://example.com/b")
+
+
+def test_invalid_port_raises_value_error():
+    with pytest.raises(ValueError):
+        url_hash("https://example.com:99999/")
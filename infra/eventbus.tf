@@ -12,19 +12,111 @@ resource "aws_cloudwatch_event_rule" "trigger-event-rule" {
   depends_on = [aws_cloudwatch_event_bus.default-bus]
 }
 
+# Clicks are buffered in SQS so the analytics Lambda consumes them in batches.
+resource "aws_sqs_queue" "analytics-clicks-dlq" {
+  name                      = "analytics-clicks-dlq"
+  message_retention_seconds = 1209600
+}
+
+resource "aws_sqs_queue" "analytics-clicks" {
+  name                       = "analytics-clicks"
+  visibility_timeout_seconds = 180
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.analytics-clicks-dlq.arn
+    maxReceiveCount     = 5
+  })
+}
+
+resource "aws_sqs_queue_policy" "analytics-clicks" {
+  queue_url = aws_sqs_queue.analytics-clicks.id
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect    = "Allow"
+      Principal = { Service = "events.amazonaws.com" }
+      Action    = "sqs:SendMessage"
+      Resource  = aws_sqs_queue.analytics-clicks.arn
+      Condition = {
+        ArnEquals = { "aws:SourceArn" = aws_cloudwatch_event_rule.trigger-event-rule.arn }
+      }
+    }]
+  })
+}
+
 resource "aws_cloudwatch_event_target" "analytics_target" {
   rule           = aws_cloudwatch_event_rule.trigger-event-rule.name
-  target_id      = "analytics_lambda"
-  arn            = module.analytic_lambda.lambda_arn
+  target_id      = "analytics_queue"
+  arn            = aws_sqs_queue.analytics-clicks.arn
   event_bus_name = aws_cloudwatch_event_bus.default-bus.name
   depends_on     = [aws_cloudwatch_event_rule.trigger-event-rule]
 }
 
-resource "aws_lambda_permission" "allow_eventbridge" {
-  statement_id  = "AllowExecutionFromEventBridge"
+resource "aws_lambda_event_source_mapping" "analytics_clicks" {
+  event_source_arn                   = aws_sqs_queue.analytics-clicks.arn
+  function_name                      = module.analytic_lambda.function_name
+  batch_size                         = 500
+  maximum_batching_window_in_seconds = 10
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
+# Visit export jobs queued by the shortener, run one at a time by the export
+# Lambda. The visibility timeout covers its 900 s timeout.
+resource "aws_sqs_queue" "export-jobs-dlq" {
+  name                      = "export-jobs-dlq"
+  message_retention_seconds = 1209600
+}
+
+resource "aws_sqs_queue" "export-jobs" {
+  name                       = "export-jobs"
+  visibility_timeout_seconds = 960
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.export-jobs-dlq.arn
+    maxReceiveCount     = 4
+  })
+}
+
+resource "aws_lambda_event_source_mapping" "export_jobs" {
+  event_source_arn        = aws_sqs_queue.export-jobs.arn
+  function_name           = module.export_lambda.function_name
+  batch_size              = 1
+  function_response_types = ["ReportBatchItemFailures"]
+}
+
+resource "aws_cloudwatch_event_rule" "compaction-schedule" {
+  name                = "click-compaction"
+  schedule_expression = "rate(1 hour)"
+}
+
+resource "aws_cloudwatch_event_target" "compaction_target" {
+  rule      = aws_cloudwatch_event_rule.compaction-schedule.name
+  target_id = "compaction_lambda"
+  arn       = module.compaction_lambda.lambda_arn
+}
+
+resource "aws_lambda_permission" "allow_compaction_schedule" {
+  statement_id  = "AllowExecutionFromSchedule"
   action        = "lambda:InvokeFunction"
-  function_name = module.analytic_lambda.function_name
+  function_name = module.compaction_lambda.function_name
   principal     = "events.amazonaws.com"
-  source_arn    = aws_cloudwatch_event_rule.trigger-event-rule.arn
-  depends_on    = [aws_cloudwatch_event_target.analytics_target]
-}
\ No newline at end of file
+  source_arn    = aws_cloudwatch_event_rule.compaction-schedule.arn
+}
+
+resource "aws_cloudwatch_event_rule" "maintenance-schedule" {
+  name                = "db-maintenance"
+  # Hourly so tombstoned links and the archive backlog drain in small steps.
+  schedule_expression = "rate(1 hour)"
+}
+
+resource "aws_cloudwatch_event_target" "maintenance_target" {
+  rule      = aws_cloudwatch_event_rule.maintenance-schedule.name
+  target_id = "maintenance_lambda"
+  arn       = module.maintenance_lambda.lambda_arn
+}
+
+resource "aws_lambda_permission" "allow_maintenance_schedule" {
+  statement_id  = "AllowExecutionFromSchedule"
+  action        = "lambda:InvokeFunction"
+  function_name = module.maintenance_lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.maintenance-schedule.arn
+}
@@ -37,6 +37,13 @@ module "auth_lambda" {
   security_group_ids = [aws_security_group.lambda.id]
 }
 
+# Key for the id -> slug permutation (backend/src/utils/slugs.py). Generated
+# once and kept in state; never commit a value for it.
+resource "random_password" "slug_key" {
+  length  = 48
+  special = false
+}
+
 module "shortener_lambda" {
   source      = "./modules/aws_lambda"
   handler     = "index.handler"
@@ -53,6 +60,17 @@ module "shortener_lambda" {
       ]
       Resource = "*"
     },
+    {
+      # Presigned download links for finished exports.
+      Effect   = "Allow"
+      Action   = ["s3:GetObject"]
+      Resource = "${aws_s3_bucket.shortener-analytics.arn}/exports/*"
+    },
+    {
+      Effect   = "Allow"
+      Action   = ["sqs:SendMessage"]
+      Resource = aws_sqs_queue.export-jobs.arn
+    },
     {
         Effect = "Allow",
         Action = [
@@ -71,6 +89,9 @@ module "shortener_lambda" {
     DB_NAME     = "shortener"
     EVENT_BUS_NAME = aws_cloudwatch_event_bus.default-bus.name
     JWT_SECRET = "supersecret"
+    SLUG_KEY    = random_password.slug_key.result
+    BUCKET_NAME = aws_s3_bucket.shortener-analytics.bucket
+    EXPORT_QUEUE_URL = aws_sqs_queue.export-jobs.id
   }
   vpc_id             = aws_vpc.main.id
   subnet_ids         = [aws_subnet.private-1b.id]
@@ -95,6 +116,11 @@ module "public_lambda" {
         "events:PutEvents",
       ]
       Resource = "*"
+    },
+    {
+      Effect   = "Allow"
+      Action   = ["s3:GetObject"]
+      Resource = "${aws_s3_bucket.shortener-analytics.arn}/hot/slugs.json"
     }]
   })
   environment_variables = {
@@ -104,6 +130,7 @@ module "public_lambda" {
     DB_PASSWORD = "supersecretpassword"
     DB_NAME     = "shortener"
     EVENT_BUS_NAME = aws_cloudwatch_event_bus.default-bus.name
+    BUCKET_NAME = aws_s3_bucket.shortener-analytics.bucket
   }
   vpc_id             = aws_vpc.main.id
   subnet_ids         = [aws_subnet.private-1b.id]
@@ -115,6 +142,8 @@ module "analytic_lambda" {
   source      = "./modules/aws_lambda"
   handler     = "index.handler"
   lambda_name = "analytics"
+  memory_size = 512
+  timeout     = 30
   lambda_iam_policy_json = jsonencode({
     Version = "2012-10-17"
     Statement = [{
@@ -124,11 +153,135 @@ module "analytic_lambda" {
         "logs:CreateLogStream",
         "logs:PutLogEvents",
         "s3:*",
+        "sqs:ReceiveMessage",
+        "sqs:DeleteMessage",
+        "sqs:GetQueueAttributes",
+        "ec2:CreateNetworkInterface",
+        "ec2:DescribeNetworkInterfaces",
+        "ec2:DeleteNetworkInterface",
+      ]
+      Resource = "*"
+    }]
+  })
+  environment_variables = {
+    DB_HOST     = "shortener-db.crwwc0880566.us-east-1.rds.amazonaws.com"
+    DB_PORT     = "5432"
+    DB_USER     = "postgres"
+    DB_PASSWORD = "supersecretpassword"
+    DB_NAME     = "shortener"
+    BUCKET_NAME = aws_s3_bucket.shortener-analytics.bucket
+  }
+  vpc_id             = aws_vpc.main.id
+  subnet_ids         = [aws_subnet.private-1b.id]
+  security_group_ids = [aws_security_group.lambda.id]
+}
+
+module "compaction_lambda" {
+  source      = "./modules/aws_lambda"
+  handler     = "index.handler"
+  lambda_name = "compaction"
+  memory_size = 1024
+  timeout     = 900
+  lambda_iam_policy_json = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect = "Allow"
+      Action = [
+        "logs:CreateLogGroup",
+        "logs:CreateLogStream",
+        "logs:PutLogEvents",
+        "s3:ListBucket",
+        "s3:GetObject",
+        "s3:PutObject",
+        "s3:DeleteObject",
+      ]
+      Resource = "*"
+    }]
+  })
+  environment_variables = {
+    BUCKET_NAME    = aws_s3_bucket.shortener-analytics.bucket
+    DELETE_SOURCES = "true"
+  }
+}
+
+module "maintenance_lambda" {
+  source      = "./modules/aws_lambda"
+  handler     = "index.handler"
+  lambda_name = "maintenance"
+  memory_size = 512
+  timeout     = 300
+  lambda_iam_policy_json = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect = "Allow"
+      Action = [
+        "logs:CreateLogGroup",
+        "logs:CreateLogStream",
+        "logs:PutLogEvents",
+        "ec2:CreateNetworkInterface",
+        "ec2:DescribeNetworkInterfaces",
+        "ec2:DeleteNetworkInterface",
+      ]
+      Resource = "*"
+    },
+    {
+      Effect   = "Allow"
+      Action   = ["s3:PutObject"]
+      Resource = "${aws_s3_bucket.shortener-analytics.arn}/visits/archive/*"
+    }]
+  })
+  environment_variables = {
+    DB_HOST     = "shortener-db.crwwc0880566.us-east-1.rds.amazonaws.com"
+    DB_PORT     = "5432"
+    DB_USER     = "postgres"
+    DB_PASSWORD = "supersecretpassword"
+    DB_NAME     = "shortener"
+    VISIT_PARTITIONS_AHEAD = "3"
+    VISIT_RETENTION_MONTHS = "13"
+    VISIT_ARCHIVE_AFTER_DAYS = "180"
+    BUCKET_NAME = aws_s3_bucket.shortener-analytics.bucket
+  }
+  vpc_id             = aws_vpc.main.id
+  subnet_ids         = [aws_subnet.private-1b.id]
+  security_group_ids = [aws_security_group.lambda.id]
+}
+
+module "export_lambda" {
+  source      = "./modules/aws_lambda"
+  handler     = "index.handler"
+  lambda_name = "export"
+  memory_size = 512
+  timeout     = 900
+  lambda_iam_policy_json = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect = "Allow"
+      Action = [
+        "logs:CreateLogGroup",
+        "logs:CreateLogStream",
+        "logs:PutLogEvents",
         "ec2:CreateNetworkInterface",
         "ec2:DescribeNetworkInterfaces",
         "ec2:DeleteNetworkInterface",
       ]
       Resource = "*"
+    },
+    {
+      Effect = "Allow"
+      Action = [
+        "sqs:ReceiveMessage",
+        "sqs:DeleteMessage",
+        "sqs:GetQueueAttributes",
+      ]
+      Resource = aws_sqs_queue.export-jobs.arn
+    },
+    {
+      Effect = "Allow"
+      Action = [
+        "s3:PutObject",
+        "s3:AbortMultipartUpload",
+      ]
+      Resource = "${aws_s3_bucket.shortener-analytics.arn}/exports/*"
     }]
   })
   environment_variables = {
@@ -32,8 +32,8 @@ resource "aws_lambda_function" "lambda_function" {
 
   architectures = ["x86_64"]
   source_code_hash = data.archive_file.zip_generator.output_sha
-  memory_size = 128
-  timeout     = 10
+  memory_size = var.memory_size
+  timeout     = var.timeout
 
   environment {
     variables = var.environment_variables
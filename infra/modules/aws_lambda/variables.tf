@@ -55,3 +55,15 @@ variable "security_group_ids" {
   type        = list(string)
   default     = []
 }
+
+variable "memory_size" {
+  description = "The amount of memory in MB available to the lambda function"
+  type        = number
+  default     = 128
+}
+
+variable "timeout" {
+  description = "The timeout in seconds for the lambda function"
+  type        = number
+  default     = 10
+}
@@ -4,4 +4,25 @@ resource "aws_s3_bucket" "shortener-analytics" {
   tags = {
     Name        = "shortener-analytics"
   }
-}
\ No newline at end of file
+}
+
+resource "aws_s3_bucket_lifecycle_configuration" "shortener-analytics" {
+  bucket = aws_s3_bucket.shortener-analytics.id
+
+  rule {
+    id     = "expire-exports"
+    status = "Enabled"
+
+    filter {
+      prefix = "exports/"
+    }
+
+    expiration {
+      days = 7
+    }
+
+    abort_incomplete_multipart_upload {
+      days_after_initiation = 1
+    }
+  }
+}